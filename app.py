@@ -1,13 +1,41 @@
 #!/usr/bin/env python3
 
-import io
+import contextvars
+import functools
+import hmac
 import json
 import traceback
 import os
 import logging
-from flask import Flask, render_template, jsonify, send_file, request
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from flask import Flask, Response, g, render_template, jsonify, send_file, request
 from kubernetes import client, config
-from weasyprint import HTML, CSS
+from collections import OrderedDict
+from capacity import RESOURCES as CAPACITY_RESOURCES, CapacityIndex
+from inventory_cache import DerivedViews, InventoryCache
+from inventory_diff import DIFF_KINDS, diff_inventories, iter_diff
+from inventory_export import EXPORT_FORMATS, iter_csv, iter_xlsx
+from inventory_records import (ClusterRecord, NodeMetadataRecord, NodeRecord, WorkloadMetadataRecord, WorkloadRecord,
+                               json_default)
+from inventory_stream import iter_json, iter_ndjson
+from inventory_table import InventoryTableView
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from pdf_cache import PdfCache, report_key
+from pdf_jobs import DONE, JobQueueFull, PdfJobManager
+from pdf_report import TEMPLATES_DIR, render_report_pdf, take_render_timings
+from request_trace import (ProfileStore, RequestTrace, SlowRequestLog, current_trace, end_trace, run_profiled,
+                           start_trace)
+from snapshot_store import SnapshotStore
+from wire_format import compact_inventory, compress, inventory_etag, negotiate_encoding
+from workload_graph import GRAPH_KINDS, WorkloadGraph
+from k8s_client_pool import ApiClientPool, take_deserialize_seconds
+from k8s_informer import InventoryInformer, WorkloadGraphInformer
+from k8s_paging import DEFAULT_PAGE_SIZE, list_all, list_pages
+from k8s_raw import api_timestamp, field, raw_list
 
 app = Flask(__name__)
 
@@ -18,164 +46,990 @@ app = Flask(__name__)
 kubeconfig_path = os.environ.get('KUBECONFIG', '/home/ezrad/.kube/one-config.yaml')
 logging.debug(f"Using KUBECONFIG: {kubeconfig_path}")
 
+# Inventory cache settings (seconds / number of contexts)
+INVENTORY_CACHE_TTL = int(os.environ.get('INVENTORY_CACHE_TTL', '60'))
+INVENTORY_CACHE_STALE_TTL = int(os.environ.get('INVENTORY_CACHE_STALE_TTL', '300'))
+INVENTORY_CACHE_MAX_ENTRIES = int(os.environ.get('INVENTORY_CACHE_MAX_ENTRIES', '16'))
 
-def add_page_number(canvas, doc):
-    from reportlab.lib.units import mm  # Ensure this import
-    page_num = canvas.getPageNumber()
-    text = f"Page {page_num}"
-    canvas.setFont('Helvetica', 9)
-    canvas.drawRightString(200 * mm, 15 * mm, text)
+# 'cache' reloads the inventory when the cache entry expires,
+# 'informer' keeps it up to date in the background with watch streams
+INVENTORY_MODE = os.environ.get('INVENTORY_MODE', 'cache')
+INFORMER_SYNC_TIMEOUT = int(os.environ.get('INFORMER_SYNC_TIMEOUT', '60'))
+INFORMER_WATCH_TIMEOUT = int(os.environ.get('INFORMER_WATCH_TIMEOUT', '300'))
 
+# resource_type query parameter -> inventory kinds to fetch
+ALL_KINDS = ("deployments", "statefulsets", "nodes")
+RESOURCE_TYPE_KINDS = {
+    '': ALL_KINDS,
+    'deployment': ("deployments",),
+    'statefulset': ("statefulsets",),
+    'node': ("nodes",)
+}
 
-@app.route('/generate_pdf', methods=['GET'])
-def generate_pdf():
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Number of objects requested per page from the Kubernetes API
+K8S_PAGE_SIZE = int(os.environ.get('K8S_PAGE_SIZE', str(DEFAULT_PAGE_SIZE)))
+
+# Seconds a Kubernetes list request may take before it fails, so that an
+# unresponsive API server cannot hold a worker (and the cache load lock) forever
+K8S_REQUEST_TIMEOUT = float(os.environ.get('K8S_REQUEST_TIMEOUT', '30'))
+
+# 'raw' builds records straight from the list responses' JSON, 'models' from
+# the client's models. The informer always uses models for its watch events
+K8S_DECODE = os.environ.get('K8S_DECODE', 'raw')
+
+# Prometheus metrics, served on /metrics. Stage timings are labelled with the
+# context ('' for the current one, "fleet" for multi-cluster requests and
+# "unknown" for names that are not in the kubeconfig, see metric_context()) and
+# the resource kind ('' for stages that handle a whole inventory or report)
+HTTP_REQUESTS = REGISTRY.counter(
+    "k8s_inventory_http_requests_total", "HTTP requests handled.", ["endpoint", "method", "status"])
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "k8s_inventory_http_request_duration_seconds", "HTTP request duration.", ["endpoint", "method"])
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "k8s_inventory_http_requests_in_flight", "HTTP requests being handled.", ["endpoint"])
+STAGE_DURATION = REGISTRY.histogram(
+    "k8s_inventory_stage_duration_seconds",
+    "Time spent per stage: kubeconfig, api_request, deserialize, transform, filter, serialize, compress, "
+    "pdf_queue, pdf_template, pdf_layout, pdf_write, pdf_merge.",
+    ["stage", "context", "kind"])
+K8S_LIST_CALLS = REGISTRY.counter(
+    "k8s_inventory_k8s_list_calls_total", "Kubernetes list calls (one per page).", ["context", "kind", "outcome"])
+K8S_LIST_OBJECTS = REGISTRY.counter(
+    "k8s_inventory_k8s_list_objects_total", "Objects returned by Kubernetes list calls.", ["context", "kind"])
+K8S_LIST_IN_FLIGHT = REGISTRY.gauge(
+    "k8s_inventory_k8s_list_calls_in_flight", "Kubernetes list calls waiting for a response.", ["context", "kind"])
+
+
+# Requests taking longer than SLOW_REQUEST_SECONDS (0 disables the log) are
+# logged with their stage breakdown, kept for /debug/slow_requests and, when
+# SLOW_REQUEST_LOG is set, appended to that file as JSON lines
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '5'))
+SLOW_REQUEST_LOG = os.environ.get('SLOW_REQUEST_LOG', '')
+slow_requests = SlowRequestLog(SLOW_REQUEST_SECONDS, SLOW_REQUEST_LOG or None)
+
+# Requests carrying ?profile=<PROFILE_TOKEN> or an X-Profile-Token header run
+# under cProfile, together with the kind and cluster loads they hand to thread
+# pools; the statistics are saved in PROFILE_DIR and served by
+# /debug/profiles/<id>. Profiling is disabled when PROFILE_TOKEN is not set.
+# The /debug endpoints require the same token.
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'k8s-inventory-profiles'))
+profile_store = ProfileStore(PROFILE_DIR) if PROFILE_TOKEN else None
+
+
+def metric_context(context):
+    # Only kubeconfig contexts become label values, so that query strings
+    # cannot create new series
+    if not context:
+        return ''
+    if context in api_client_pool.contexts():
+        return context
+    return 'fleet' if context == '*' or ',' in context else 'unknown'
+
+
+def observe_stage(stage, seconds, context=None, kind=''):
+    STAGE_DURATION.observe(seconds, stage=stage, context=metric_context(context), kind=kind)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_stage(stage, seconds, context, kind)
+
+
+@contextmanager
+def stage_timer(stage, context=None, kind=''):
+    start = time.perf_counter()
     try:
-        context = request.args.get('context', default=None, type=str)
-        resource_type = request.args.get('resource_type', default='', type=str).lower()
-        namespace = request.args.get('namespace', default='', type=str)
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, context, kind)
 
-        inventory = load_k8s_inventory(context=context)
 
-        # Filter data
-        filtered_inventory = {
-            "deployments": [],
-            "statefulsets": [],
-            "nodes": []
-        }
+def observe_client_build(context, seconds):
+    observe_stage("kubeconfig", seconds, context)
 
-        if resource_type in ['deployment', '']:
 
-            filtered_inventory['deployments'] = [
-                dep for dep in inventory['deployments']
-                if namespace == '' or dep['namespace'] == namespace
-            ]
+# One ApiClient (and urllib3 connection pool) per context, reused across requests
+K8S_CONNECTION_POOL_MAXSIZE = int(os.environ.get('K8S_CONNECTION_POOL_MAXSIZE', '8'))
+api_client_pool = ApiClientPool(kubeconfig_path, connection_pool_maxsize=K8S_CONNECTION_POOL_MAXSIZE,
+                                on_build=observe_client_build)
 
-        if resource_type in ['statefulset', '']:
-            filtered_inventory['statefulsets'] = [
-                sts for sts in inventory['statefulsets']
-                if namespace == '' or sts['namespace'] == namespace
-            ]
+# Resource kinds are fetched in parallel on a bounded thread pool
+INVENTORY_FETCH_WORKERS = int(os.environ.get('INVENTORY_FETCH_WORKERS', '6'))
+fetch_executor = ThreadPoolExecutor(max_workers=INVENTORY_FETCH_WORKERS, thread_name_prefix='inventory-fetch')
 
-        if resource_type in ['node', '']:
-            filtered_inventory['nodes'] = inventory['nodes']  # Nodes do not have namespaces
+# Multi-cluster requests (context=* or context=a,b) load clusters in parallel,
+# each with its own timeout in seconds. Clusters still waiting for a worker
+# when FLEET_TIMEOUT seconds have passed are reported as timed out
+FLEET_WORKERS = int(os.environ.get('FLEET_WORKERS', '16'))
+FLEET_CLUSTER_TIMEOUT = float(os.environ.get('FLEET_CLUSTER_TIMEOUT', '30'))
+FLEET_TIMEOUT = float(os.environ.get('FLEET_TIMEOUT', str(2 * FLEET_CLUSTER_TIMEOUT)))
+fleet_executor = ThreadPoolExecutor(max_workers=FLEET_WORKERS, thread_name_prefix='fleet')
 
-        logging.debug(f"Filtered inventory: {json.dumps(filtered_inventory, indent=2)}")
+# When SNAPSHOT_DB is set, every full inventory load is also saved as a
+# snapshot in that SQLite database
+SNAPSHOT_DB = os.environ.get('SNAPSHOT_DB', '')
+snapshot_store = SnapshotStore(SNAPSHOT_DB) if SNAPSHOT_DB else None
+snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot')
 
-        # Define headers and keys
-        headers = {
-            "deployments": ["Name", "Namespace", "Replicas", "Available Replicas", "Creation Timestamp", "Labels"],
-            "statefulsets": ["Name", "Namespace", "Replicas", "Available Replicas", "Creation Timestamp", "Labels"],
-            "nodes": ["Name", "Status", "Conditions"]
-        }
+# Inventory files that /diff can read with file:<name>
+INVENTORY_FILES_DIR = os.environ.get('INVENTORY_FILES_DIR', os.path.dirname(os.path.abspath(__file__)))
 
-        keys = {
-            "deployments": ["name", "namespace", "replicas", "available_replicas", "creation_timestamp", "labels"],
-            "statefulsets": ["name", "namespace", "replicas", "available_replicas", "creation_timestamp", "labels"],
-            "nodes": ["name", "status", "conditions"]
-        }
+# PDF reports are rendered by a bounded pool of worker processes; jobs running
+# longer than PDF_JOB_TIMEOUT seconds are killed and finished jobs are kept for
+# PDF_RESULT_TTL seconds
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', str(min(2, os.cpu_count() or 1))))
+PDF_JOB_TIMEOUT = int(os.environ.get('PDF_JOB_TIMEOUT', '300'))
+PDF_RESULT_TTL = int(os.environ.get('PDF_RESULT_TTL', '600'))
+PDF_MAX_JOBS = int(os.environ.get('PDF_MAX_JOBS', '100'))
+
+# Rendered reports are cached on disk by a hash of the template and its data
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'k8s-inventory-pdf'))
+PDF_CACHE_MAX_MB = int(os.environ.get('PDF_CACHE_MAX_MB', '256'))
+REPORT_TEMPLATE = 'report.html'
+
+# Reports with more rows than this are laid out in slices of this many rows
+# and merged, which bounds the memory WeasyPrint needs (0 disables slicing)
+PDF_CHUNK_ROWS = int(os.environ.get('PDF_CHUNK_ROWS', '2000'))
+pdf_cache = PdfCache(PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_MB * 1024 * 1024)
+
+
+def pdf_job_stages(job):
+    # (stage, seconds) of a finished job, as measured by the worker
+    stages = [("pdf_queue", job.started_at - job.submitted_at)]
+    stages += [(f"pdf_{stage}", seconds) for stage, seconds in (job.stats or {}).items()]
+    return stages
+
+
+def cache_rendered_pdf(job, pdf):
+    # Runs in the dispatcher thread: the requesting trace is updated by the request
+    for stage, seconds in pdf_job_stages(job):
+        STAGE_DURATION.observe(seconds, stage=stage, context='', kind='')
+    pdf_cache.put(job.key, pdf)
+
+
+pdf_jobs = PdfJobManager(
+    render_report_pdf,
+    max_workers=PDF_WORKERS,
+    timeout=PDF_JOB_TIMEOUT,
+    result_ttl=PDF_RESULT_TTL,
+    max_jobs=PDF_MAX_JOBS,
+    start_method=os.environ.get('PDF_START_METHOD', 'spawn'),
+    on_done=cache_rendered_pdf,
+    stats=take_render_timings
+)
+
+REGISTRY.callback(
+    "k8s_inventory_pdf_jobs", "PDF jobs tracked, per status.", ["status"],
+    lambda: {(status,): count for status, count in pdf_jobs.status_counts().items()}
+)
+
+
+# Columns of the PDF report and of the CSV/XLSX exports, per resource
+REPORT_HEADERS = {
+    "deployments": ["Name", "Namespace", "Replicas", "Available Replicas", "Creation Timestamp", "Labels"],
+    "statefulsets": ["Name", "Namespace", "Replicas", "Available Replicas", "Creation Timestamp", "Labels"],
+    "nodes": ["Name", "Status", "Conditions"]
+}
+
+REPORT_KEYS = {
+    "deployments": ["name", "namespace", "replicas", "available_replicas", "creation_timestamp", "labels"],
+    "statefulsets": ["name", "namespace", "replicas", "available_replicas", "creation_timestamp", "labels"],
+    "nodes": ["name", "status", "conditions"]
+}
 
-        # Prepare data for the template
-        template_data = {
-            "inventory": filtered_inventory,
-            "headers": headers,
-            "keys": keys
-        }
 
-        # Render HTML template
-        rendered_html = render_template('report.html', **template_data)
+def report_columns(fleet=False):
+    """Return ``(headers, keys)``; multi-cluster reports start every table with the cluster name."""
+    if not fleet:
+        return REPORT_HEADERS, REPORT_KEYS
+    headers = {resource: ["Cluster"] + columns for resource, columns in REPORT_HEADERS.items()}
+    keys = {resource: ["cluster"] + columns for resource, columns in REPORT_KEYS.items()}
+    return headers, keys
 
-        # Generate PDF with WeasyPrint
-        pdf_file = HTML(string=rendered_html, base_url=request.base_url).write_pdf()
 
-        # Create in-memory buffer
-        buffer = io.BytesIO(pdf_file)
+def build_report_data(args):
+    """Return ``(template_data, age)`` for the report requested by ``args``."""
+    context = args.get('context', default=None, type=str)
+    resource_type = args.get('resource_type', default='', type=str).lower()
+    namespace = args.get('namespace', default='', type=str)
+    label_selector = args.get('label_selector', default='', type=str)
+    field_selector = args.get('field_selector', default='', type=str)
 
-        # Return PDF as response
-        return send_file(buffer, as_attachment=True, download_name="k8s_inventory.pdf", mimetype='application/pdf')
+    inventory, age, fleet = get_requested_inventory(context, resource_type, namespace, label_selector, field_selector)
+    filtered_inventory = filter_inventory(inventory, resource_type, namespace)
 
+    headers, keys = report_columns(fleet)
+
+    # Prepare data for the template
+    template_data = {
+        "inventory": filtered_inventory,
+        "headers": headers,
+        "keys": keys
+    }
+    return template_data, age
+
+
+def submit_report(args):
+    """Return ``(job, age)``; a report already in the PDF cache is not rendered again."""
+    template_data, age = build_report_data(args)
+    key = report_key(os.path.join(TEMPLATES_DIR, REPORT_TEMPLATE), template_data, PDF_CHUNK_ROWS)
+    if key in pdf_cache:
+        return pdf_jobs.add_done(key=key), age
+    return pdf_jobs.submit(REPORT_TEMPLATE, template_data, request.base_url, PDF_CHUNK_ROWS, key=key), age
+
+
+def pdf_response(job):
+    # Finished jobs only hold the cache key: the PDF is always served from the
+    # cache, and the content key is a strong ETag
+    pdf = pdf_cache.open(job.key)
+    if pdf is None:
+        response = jsonify({"error": "The PDF is no longer cached, submit the report again"})
+        response.status_code = 410
+        return response
+    size = os.fstat(pdf.fileno()).st_size
+
+    response = send_file(pdf, as_attachment=True, download_name="k8s_inventory.pdf", mimetype='application/pdf',
+                         etag=job.key, conditional=True)
+    if response.status_code == 200:
+        response.content_length = size
+    return response
+
+
+@app.route('/generate_pdf', methods=['GET'])
+def generate_pdf():
+    # Synchronous variant of /pdf_jobs: the rendering still runs in the
+    # process pool, the request waits for it. Unchanged reports come
+    # straight from the PDF cache.
+    try:
+        job, age = submit_report(request.args)
+        job.wait(PDF_JOB_TIMEOUT + 5)
+        trace = current_trace()
+        if trace is not None and job.started_at is not None:
+            for stage, seconds in pdf_job_stages(job):
+                trace.add_stage(stage, seconds)
+        if job.status != DONE:
+            pdf_jobs.cancel(job.id)
+            return jsonify({"error": job.error or "PDF generation did not finish", "job_id": job.id}), 500
+
+        response = pdf_response(job)
+        response.headers['Age'] = str(int(age))
+        pdf_jobs.remove(job.id)
+        return response
+
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         logging.error(f"Error generating PDF: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
-def load_k8s_inventory(context=None):
+@app.route('/pdf_jobs', methods=['POST'])
+def create_pdf_job():
+    # Same parameters as /generate_pdf, in the query string or a form body
     try:
-        # Load kubeconfig with the specified context if provided
-        if context:
-            config.load_kube_config(config_file=kubeconfig_path, context=context)
-            logging.debug(f"Kubernetes configuration loaded with context: {context}")
-        else:
-            config.load_kube_config(config_file=kubeconfig_path)
-            logging.debug("Kubernetes configuration loaded with default context.")
-
-        # Create API clients
-        v1 = client.CoreV1Api()
-        apps_v1 = client.AppsV1Api()
-
-        # Get Deployments
-        deployments = apps_v1.list_deployment_for_all_namespaces(watch=False).items
-        deployments_data = []
-        for dep in deployments:
-            deployments_data.append({
-                "name": dep.metadata.name,
-                "namespace": dep.metadata.namespace,
-                "replicas": dep.spec.replicas,
-                "available_replicas": dep.status.available_replicas or 0,
-                "creation_timestamp": dep.metadata.creation_timestamp.isoformat(),
-                "labels": dep.metadata.labels
-            })
+        job, age = submit_report(request.values)
+        body = job.to_dict()
+        body["status_url"] = f"/pdf_jobs/{job.id}"
+        body["download_url"] = f"/pdf_jobs/{job.id}/pdf"
+        body["age_seconds"] = int(age)
+        return jsonify(body), 202, {"Location": body["status_url"]}
 
-        # Get StatefulSets
-        statefulsets = apps_v1.list_stateful_set_for_all_namespaces(watch=False).items
-        statefulsets_data = []
-        for sts in statefulsets:
-            statefulsets_data.append({
-                "name": sts.metadata.name,
-                "namespace": sts.metadata.namespace,
-                "replicas": sts.spec.replicas,
-                "available_replicas": sts.status.ready_replicas or 0,
-                "creation_timestamp": sts.metadata.creation_timestamp.isoformat(),
-                "labels": sts.metadata.labels
-            })
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logging.error(f"Error submitting PDF job: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/pdf_jobs/<job_id>', methods=['GET'])
+def get_pdf_job(job_id):
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired PDF job"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/pdf_jobs/<job_id>/pdf', methods=['GET'])
+def download_pdf_job(job_id):
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired PDF job"}), 404
+    if job.status != DONE:
+        # Still running, or failed/cancelled: the body says which
+        return jsonify(job.to_dict()), 409
+    return pdf_response(job)
+
+
+@app.route('/pdf_jobs/<job_id>', methods=['DELETE'])
+def cancel_pdf_job(job_id):
+    job = pdf_jobs.remove(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired PDF job"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/export', methods=['GET'])
+def export_inventory():
+    # Same parameters as /generate_pdf, plus format=csv|xlsx
+    try:
+        export_format = request.args.get('format', default='csv', type=str).lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unknown export format: {export_format}"}), 400
+
+        template_data, age = build_report_data(request.args)
+        exporter = iter_csv if export_format == 'csv' else iter_xlsx
+        chunks = exporter(template_data["inventory"], template_data["headers"], template_data["keys"])
 
-        # Get Nodes
-        nodes = v1.list_node(watch=False).items
-        nodes_data = []
-        for node in nodes:
-            conditions = []
-            if node.status.conditions:
-                for condition in node.status.conditions:
-                    conditions.append({
-                        'type': condition.type,
-                        'status': condition.status,
-                        'last_heartbeat_time': condition.last_heartbeat_time.isoformat() if condition.last_heartbeat_time else None,
-                        'last_transition_time': condition.last_transition_time.isoformat() if condition.last_transition_time else None,
-                        'reason': condition.reason,
-                        'message': condition.message
-                    })
-
-            nodes_data.append({
-                "name": node.metadata.name,
-                "labels": node.metadata.labels,
-                "annotations": node.metadata.annotations,
-                "conditions": conditions,
-                "capacity": node.status.capacity,
-                "allocatable": node.status.allocatable,
-                "creation_timestamp": node.metadata.creation_timestamp.isoformat()
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        return Response(chunks, mimetype=mimetype, headers={
+            "Content-Disposition": f"attachment; filename=k8s_inventory.{extension}",
+            "Age": str(int(age))
+        })
+
+    except ImportError as e:
+        logging.error(f"Export format unavailable: {e}")
+        return jsonify({"error": f"{export_format} export is not available: {e}"}), 501
+    except Exception as e:
+        logging.error(f"Error exporting inventory: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+def deployment_to_dict(dep):
+    return WorkloadRecord(
+        name=dep.metadata.name,
+        namespace=dep.metadata.namespace,
+        replicas=dep.spec.replicas,
+        available_replicas=dep.status.available_replicas or 0,
+        creation_timestamp=dep.metadata.creation_timestamp.isoformat(),
+        labels=dep.metadata.labels
+    )
+
+
+def statefulset_to_dict(sts):
+    return WorkloadRecord(
+        name=sts.metadata.name,
+        namespace=sts.metadata.namespace,
+        replicas=sts.spec.replicas,
+        available_replicas=sts.status.ready_replicas or 0,
+        creation_timestamp=sts.metadata.creation_timestamp.isoformat(),
+        labels=sts.metadata.labels
+    )
+
+
+def node_conditions_to_list(node):
+    conditions = []
+    if node.status.conditions:
+        for condition in node.status.conditions:
+            conditions.append({
+                'type': condition.type,
+                'status': condition.status,
+                'last_heartbeat_time': condition.last_heartbeat_time.isoformat() if condition.last_heartbeat_time else None,
+                'last_transition_time': condition.last_transition_time.isoformat() if condition.last_transition_time else None,
+                'reason': condition.reason,
+                'message': condition.message
             })
+    return conditions
+
+
+def node_to_dict(node):
+    return NodeRecord(
+        name=node.metadata.name,
+        labels=node.metadata.labels,
+        annotations=node.metadata.annotations,
+        conditions=node_conditions_to_list(node),
+        capacity=node.status.capacity,
+        allocatable=node.status.allocatable,
+        creation_timestamp=node.metadata.creation_timestamp.isoformat()
+    )
+
+
+def deployment_from_raw(dep):
+    metadata = dep['metadata']
+    return WorkloadRecord(
+        name=metadata['name'],
+        namespace=metadata.get('namespace'),
+        replicas=field(dep, 'spec', 'replicas'),
+        available_replicas=field(dep, 'status', 'availableReplicas') or 0,
+        creation_timestamp=api_timestamp(metadata['creationTimestamp']),
+        labels=metadata.get('labels')
+    )
+
+
+def statefulset_from_raw(sts):
+    metadata = sts['metadata']
+    return WorkloadRecord(
+        name=metadata['name'],
+        namespace=metadata.get('namespace'),
+        replicas=field(sts, 'spec', 'replicas'),
+        available_replicas=field(sts, 'status', 'readyReplicas') or 0,
+        creation_timestamp=api_timestamp(metadata['creationTimestamp']),
+        labels=metadata.get('labels')
+    )
+
 
-        return {
-            "deployments": deployments_data,
-            "statefulsets": statefulsets_data,
-            "nodes": nodes_data
+def node_conditions_from_raw(node):
+    return [
+        {
+            'type': condition.get('type'),
+            'status': condition.get('status'),
+            'last_heartbeat_time': api_timestamp(condition.get('lastHeartbeatTime')),
+            'last_transition_time': api_timestamp(condition.get('lastTransitionTime')),
+            'reason': condition.get('reason'),
+            'message': condition.get('message')
         }
+        for condition in field(node, 'status', 'conditions') or ()
+    ]
+
+
+def node_from_raw(node):
+    metadata = node['metadata']
+    return NodeRecord(
+        name=metadata['name'],
+        labels=metadata.get('labels'),
+        annotations=metadata.get('annotations'),
+        conditions=node_conditions_from_raw(node),
+        capacity=field(node, 'status', 'capacity'),
+        allocatable=field(node, 'status', 'allocatable'),
+        creation_timestamp=api_timestamp(metadata['creationTimestamp'])
+    )
+
+
+# Metadata-only records, from PartialObjectMetadata items or from full records
+def workload_metadata(metadata):
+    return WorkloadMetadataRecord(
+        name=metadata['name'],
+        namespace=metadata.get('namespace'),
+        creation_timestamp=api_timestamp(metadata.get('creationTimestamp')),
+        labels=metadata.get('labels')
+    )
+
+
+def node_metadata(metadata):
+    return NodeMetadataRecord(
+        name=metadata['name'],
+        labels=metadata.get('labels'),
+        annotations=metadata.get('annotations'),
+        creation_timestamp=api_timestamp(metadata.get('creationTimestamp'))
+    )
+
+
+def workload_metadata_record(record):
+    return WorkloadMetadataRecord(
+        name=record['name'],
+        namespace=record['namespace'],
+        creation_timestamp=record['creation_timestamp'],
+        labels=record['labels']
+    )
+
+
+def node_metadata_record(record):
+    return NodeMetadataRecord(
+        name=record['name'],
+        labels=record['labels'],
+        annotations=record['annotations'],
+        creation_timestamp=record['creation_timestamp']
+    )
+
+
+# Model record builder -> the same record built from the raw JSON of the object
+RAW_TRANSFORMS = {
+    deployment_to_dict: deployment_from_raw,
+    statefulset_to_dict: statefulset_from_raw,
+    node_to_dict: node_from_raw
+}
+
+# Model record builder -> the metadata-only record of a PartialObjectMetadata item
+METADATA_TRANSFORMS = {
+    deployment_to_dict: lambda obj: workload_metadata(obj['metadata']),
+    statefulset_to_dict: lambda obj: workload_metadata(obj['metadata']),
+    node_to_dict: lambda obj: node_metadata(obj['metadata'])
+}
+
+METADATA_RECORDS = {
+    "deployments": workload_metadata_record,
+    "statefulsets": workload_metadata_record,
+    "nodes": node_metadata_record
+}
+
+
+def metadata_inventory(inventory):
+    """The inventory with metadata-only records, as a metadata-only load would return it."""
+    return {
+        **inventory,
+        **{kind: [to_metadata(record) for record in inventory[kind]] for kind, to_metadata in METADATA_RECORDS.items()}
+    }
+
+
+def node_ready_status(conditions):
+    status = "Unknown"
+    for condition in conditions:
+        if condition['type'] == "Ready":
+            status = condition['status']
+    return status
+
+
+def timed_list(list_fn, context, kind):
+    """
+    Wrap a Kubernetes list function to record every call: the HTTP round-trip
+    and the deserialization (into models, or JSON decoding for raw lists) are
+    timed separately.
+    """
+    labels = {"context": metric_context(context), "kind": kind}
+
+    def call(**kwargs):
+        take_deserialize_seconds()
+        start = time.perf_counter()
+        try:
+            with K8S_LIST_IN_FLIGHT.track_in_progress(**labels):
+                page = list_fn(**kwargs)
+        except Exception:
+            K8S_LIST_CALLS.inc(outcome="error", **labels)
+            raise
+        elapsed = time.perf_counter() - start
+        deserialize = take_deserialize_seconds()
+        observe_stage("api_request", elapsed - deserialize, context, kind)
+        observe_stage("deserialize", deserialize, context, kind)
+        K8S_LIST_CALLS.inc(outcome="ok", **labels)
+        K8S_LIST_OBJECTS.inc(len(page.items), **labels)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_objects(kind, len(page.items))
+        return page
+
+    return call
+
+
+def fetch_kind(list_fn, transform, context=None, kind='', metadata_only=False, **kwargs):
+    # Returns (records, list resourceVersion, elapsed seconds) for one resource kind
+    start = time.perf_counter()
+    if metadata_only:
+        list_fn, transform = raw_list(list_fn, metadata_only=True), METADATA_TRANSFORMS[transform]
+    elif K8S_DECODE == 'raw':
+        list_fn, transform = raw_list(list_fn), RAW_TRANSFORMS[transform]
+    records = []
+    resource_version = None
+    for page in list_pages(timed_list(list_fn, context, kind), K8S_PAGE_SIZE, _request_timeout=K8S_REQUEST_TIMEOUT,
+                           **kwargs):
+        with stage_timer("transform", context, kind):
+            records.extend(transform(obj) for obj in page.items)
+        resource_version = page.metadata.resource_version
+    return records, resource_version, time.perf_counter() - start
+
+
+def load_k8s_inventory(context=None, concurrent=True, namespace='', kinds=ALL_KINDS,
+                       label_selector='', field_selector='', metadata_only=False):
+    try:
+        # Create API clients on the pooled ApiClient for this context
+        api_client = api_client_pool.get(context)
+        v1 = client.CoreV1Api(api_client)
+        apps_v1 = client.AppsV1Api(api_client)
+
+        # Filters are applied by the API server: namespaced list calls when a
+        # namespace is given, selectors passed through, excluded kinds skipped
+        selectors = {}
+        if label_selector:
+            selectors['label_selector'] = label_selector
+        if field_selector:
+            selectors['field_selector'] = field_selector
+        if namespace:
+            calls = {
+                "deployments": (apps_v1.list_namespaced_deployment, deployment_to_dict, {"namespace": namespace}),
+                "statefulsets": (apps_v1.list_namespaced_stateful_set, statefulset_to_dict, {"namespace": namespace})
+            }
+        else:
+            calls = {
+                "deployments": (apps_v1.list_deployment_for_all_namespaces, deployment_to_dict, {}),
+                "statefulsets": (apps_v1.list_stateful_set_for_all_namespaces, statefulset_to_dict, {})
+            }
+        calls["nodes"] = (v1.list_node, node_to_dict, {})  # Nodes do not have namespaces
+        calls = {kind: call for kind, call in calls.items() if kind in kinds}
+
+        start = time.perf_counter()
+        if concurrent:
+            futures = {
+                # Each call runs in a copy of the request's context, which carries its trace
+                # and, for profiled requests, its profile
+                kind: fetch_executor.submit(contextvars.copy_context().run, run_profiled, fetch_kind, list_fn, transform,
+                                            context, kind, metadata_only, **kwargs, **selectors)
+                for kind, (list_fn, transform, kwargs) in calls.items()
+            }
+            fetch = lambda kind: futures[kind].result()
+        else:
+            fetch = lambda kind: fetch_kind(calls[kind][0], calls[kind][1], context, kind, metadata_only,
+                                            **calls[kind][2], **selectors)
+
+        # A failing kind is reported in "errors" without discarding the others
+        inventory = {kind: [] for kind in ALL_KINDS}
+        errors = {}
+        timings = {}
+        resource_versions = {}
+        for kind in calls:
+            try:
+                inventory[kind], resource_versions[kind], timings[kind] = fetch(kind)
+            except Exception as e:
+                logging.error(f"Error loading {kind} for context {context}: {e}")
+                errors[kind] = str(e)
+        timings["total"] = time.perf_counter() - start
+
+        if calls and len(errors) == len(calls):
+            raise RuntimeError(f"Failed to load any resource kind: {errors}")
+
+        logging.info(
+            f"Inventory for context {context} loaded in {timings['total']:.3f}s "
+            f"({', '.join(f'{kind} {timings[kind]:.3f}s' for kind in calls if kind in timings)})"
+        )
+        inventory["errors"] = errors
+        inventory["timings"] = timings
+        inventory["resource_versions"] = resource_versions
+        return inventory
     except Exception as e:
         logging.error(f"Error loading Kubernetes data: {e}")
         traceback.print_exc()
         raise
 
 
+def save_snapshot(context, inventory, kinds):
+    # Kinds that failed to load are left out, so their objects are not
+    # recorded as deleted
+    kinds = [kind for kind in kinds if kind not in inventory.get("errors", {})]
+    try:
+        cluster = context or config.list_kube_config_contexts(config_file=kubeconfig_path)[1]['name']
+        snapshot_id = snapshot_store.save_inventory(inventory, cluster, kinds, source='web')
+        logging.debug(f"Saved snapshot {snapshot_id} of {cluster}")
+    except Exception as e:
+        logging.error(f"Error saving inventory snapshot: {e}")
+        traceback.print_exc()
+
+
+def load_cached_inventory(key):
+    # Cache keys are (context, namespace, kinds, label_selector, field_selector, metadata_only)
+    context, namespace, kinds, label_selector, field_selector, metadata_only = key
+    inventory = load_k8s_inventory(
+        context=context, namespace=namespace, kinds=kinds, label_selector=label_selector, field_selector=field_selector,
+        metadata_only=metadata_only
+    )
+    if snapshot_store is not None and not (namespace or label_selector or field_selector or metadata_only):
+        # Only complete inventories are snapshots; saved off the request path
+        snapshot_executor.submit(save_snapshot, context, inventory, kinds)
+    return inventory
+
+
+inventory_cache = InventoryCache(
+    load_cached_inventory,
+    ttl=INVENTORY_CACHE_TTL,
+    stale_ttl=INVENTORY_CACHE_STALE_TTL,
+    max_entries=INVENTORY_CACHE_MAX_ENTRIES
+)
+
+REGISTRY.callback(
+    "k8s_inventory_cache_requests_total", "Inventory and PDF cache lookups, per result.", ["cache", "result"],
+    lambda: {
+        ("inventory", "hit"): inventory_cache.hits,
+        ("inventory", "stale"): inventory_cache.stale_hits,
+        ("inventory", "miss"): inventory_cache.misses,
+        ("pdf", "hit"): pdf_cache.hits,
+        ("pdf", "miss"): pdf_cache.misses
+    },
+    type="counter"
+)
+
+
+informers = {}
+informers_lock = threading.Lock()
+
+
+def get_informer(context):
+    with informers_lock:
+        api_client = api_client_pool.get(context)
+        informer = informers.get(context)
+        if informer is not None and informer.generation != api_client_pool.generation:
+            # The kubeconfig changed: restart the informer on the new client
+            informer.stop()
+            informer = None
+        if informer is None:
+            v1 = client.CoreV1Api(api_client)
+            apps_v1 = client.AppsV1Api(api_client)
+            informer = InventoryInformer(context, {
+                "deployments": (apps_v1.list_deployment_for_all_namespaces, deployment_to_dict),
+                "statefulsets": (apps_v1.list_stateful_set_for_all_namespaces, statefulset_to_dict),
+                "nodes": (v1.list_node, node_to_dict)
+            }, watch_timeout=INFORMER_WATCH_TIMEOUT, page_size=K8S_PAGE_SIZE, generation=api_client_pool.generation)
+            informer.start()
+            informers[context] = informer
+            logging.debug(f"Started informer for context: {context}")
+
+    if not informer.wait_for_sync(INFORMER_SYNC_TIMEOUT):
+        raise TimeoutError(f"Informer for context {context} did not sync within {INFORMER_SYNC_TIMEOUT}s")
+    return informer
+
+
+# Metadata-only copies of full inventories, per context
+metadata_views = DerivedViews(metadata_inventory, max_entries=INVENTORY_CACHE_MAX_ENTRIES)
+
+
+def get_inventory_for_context(context, namespace='', kinds=ALL_KINDS, label_selector='', field_selector='',
+                              metadata_only=False):
+    # Returns (inventory, age in seconds). The inventory may hold more than was
+    # asked for, so callers still run filter_inventory() on it. Metadata-only
+    # requests are answered from a full inventory when there is one.
+    if not label_selector and not field_selector:
+        full = None
+        if INVENTORY_MODE == 'informer':
+            informer = get_informer(context)
+            full = informer.inventory(), informer.age() or 0.0
+        else:
+            # A fresh full inventory answers any namespace/kind filter without API calls
+            full = inventory_cache.peek((context, '', ALL_KINDS, '', '', False))
+        if full is not None:
+            inventory, age = full
+            return (metadata_views.get(context, inventory) if metadata_only else inventory), age
+    return inventory_cache.get((context, namespace, tuple(kinds), label_selector, field_selector, metadata_only))
+
+
+def resolve_contexts(context):
+    # Returns the list of contexts for a multi-cluster request, None otherwise
+    if context == '*':
+        contexts, _ = config.list_kube_config_contexts(config_file=kubeconfig_path)
+        return [c['name'] for c in contexts]
+    if context and ',' in context:
+        return [c.strip() for c in context.split(',') if c.strip()]
+    return None
+
+
+# Merged fleet inventories per request, reused while every cluster hands out
+# the same inventory, so that views derived from them (table, capacity) are too
+fleet_inventories = OrderedDict()
+fleet_inventories_lock = threading.Lock()
+
+
+def load_fleet_inventory(contexts, **query):
+    started = {context: threading.Event() for context in contexts}
+    start_times = {}
+
+    def load(context):
+        start_times[context] = time.monotonic()
+        started[context].set()
+        return get_inventory_for_context(context, **query)
+
+    deadline = time.monotonic() + FLEET_TIMEOUT
+    futures = {context: fleet_executor.submit(contextvars.copy_context().run, run_profiled, load, context) for context in contexts}
+
+    inventories = {}
+    errors = {}
+    ages = []
+    for context, future in futures.items():
+        # The timeout starts when the cluster is actually picked up by a worker,
+        # so clusters queued behind a full pool are not penalised, up to the
+        # deadline of the whole request
+        if not started[context].wait(max(0, deadline - time.monotonic())):
+            future.cancel()
+            errors[context] = f"Timed out after {FLEET_TIMEOUT:g}s waiting for a worker"
+            logging.error(f"Error loading context {context}: {errors[context]}")
+            continue
+        cluster_deadline = start_times[context] + FLEET_CLUSTER_TIMEOUT
+        done, _ = wait((future,), timeout=max(0, min(cluster_deadline, deadline) - time.monotonic()))
+        if not done:
+            # The load keeps running and will still fill the cache
+            if cluster_deadline <= deadline:
+                errors[context] = f"Timed out after {FLEET_CLUSTER_TIMEOUT:g}s"
+            else:
+                errors[context] = f"Fleet request timed out after {FLEET_TIMEOUT:g}s"
+        elif future.exception() is not None:
+            errors[context] = str(future.exception())
+        if context in errors:
+            logging.error(f"Error loading context {context}: {errors[context]}")
+            continue
+        inventories[context], age = future.result()
+        ages.append(age)
+
+    if len(ages) == 0:
+        raise RuntimeError(f"Failed to load any cluster: {errors}")
+
+    key = (tuple(contexts), tuple(sorted(query.items())))
+    sources = tuple(inventories.get(context) for context in contexts)
+    cluster_errors = dict(errors)
+    with fleet_inventories_lock:
+        entry = fleet_inventories.get(key)
+        if entry is not None and entry[1] == cluster_errors and all(a is b for a, b in zip(entry[0], sources)):
+            fleet_inventories.move_to_end(key)
+            return entry[2], max(ages)
+
+    merged = {"deployments": [], "statefulsets": [], "nodes": []}
+    resource_versions = {}
+    for context, inventory in inventories.items():
+        for kind in merged:
+            merged[kind].extend(ClusterRecord(record, context) for record in inventory[kind])
+        for kind, message in inventory.get("errors", {}).items():
+            errors[f"{context}/{kind}"] = message
+        for kind, resource_version in inventory.get("resource_versions", {}).items():
+            resource_versions[f"{context}/{kind}"] = resource_version
+    merged["errors"] = errors
+    merged["resource_versions"] = resource_versions
+
+    with fleet_inventories_lock:
+        # The entry keeps the member inventories, so their identities stay unique
+        fleet_inventories[key] = (sources, cluster_errors, merged)
+        fleet_inventories.move_to_end(key)
+        while len(fleet_inventories) > INVENTORY_CACHE_MAX_ENTRIES:
+            fleet_inventories.popitem(last=False)
+    return merged, max(ages)
+
+
+def get_requested_inventory(context, resource_type='', namespace='', label_selector='', field_selector='',
+                            metadata_only=False):
+    # Returns (inventory, age in seconds, True for multi-cluster requests)
+    query = {
+        "namespace": namespace,
+        "kinds": RESOURCE_TYPE_KINDS.get(resource_type, ()),
+        "label_selector": label_selector,
+        "field_selector": field_selector,
+        "metadata_only": metadata_only
+    }
+    contexts = resolve_contexts(context)
+    if contexts is not None:
+        inventory, age = load_fleet_inventory(contexts, **query)
+        return inventory, age, True
+    inventory, age = get_inventory_for_context(context, **query)
+    return inventory, age, False
+
+
+def filter_inventory(inventory, resource_type='', namespace=''):
+    filtered_inventory = {
+        "deployments": [],
+        "statefulsets": [],
+        "nodes": []
+    }
+
+    if resource_type in ['deployment', '']:
+        filtered_inventory['deployments'] = [
+            dep for dep in inventory['deployments']
+            if namespace == '' or dep['namespace'] == namespace
+        ]
+
+    if resource_type in ['statefulset', '']:
+        filtered_inventory['statefulsets'] = [
+            sts for sts in inventory['statefulsets']
+            if namespace == '' or sts['namespace'] == namespace
+        ]
+
+    if resource_type in ['node', '']:
+        filtered_inventory['nodes'] = inventory['nodes']  # Nodes do not have namespaces
+
+    records = {kind: len(items) for kind, items in filtered_inventory.items()}
+    trace = current_trace()
+    if trace is not None:
+        trace.set_records(records)
+    logging.debug(f"Filtered inventory: {records}")
+    return filtered_inventory
+
+
+def profiling_requested():
+    token = request.args.get('profile') or request.headers.get('X-Profile-Token')
+    if profile_store is None or token is None:
+        return False
+    # Compared as bytes: compare_digest() raises TypeError for non-ASCII strings
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+@app.before_request
+def start_request_metrics():
+    # Unknown paths share one label, so that scanners cannot grow the series
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    # The profiling token is not kept with the request arguments
+    args = {key: value for key, value in request.args.items() if key != 'profile'}
+    g.trace_token = start_trace(RequestTrace(request.method, request.path, args))
+    HTTP_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+
+@app.before_request
+def start_profiling():
+    # Streamed bodies are produced after the view returns and are not profiled
+    if profiling_requested():
+        g.profiler = profile_store.start()
+        if g.profiler is None:
+            logging.warning(f"Not profiling {request.path}: another request is being profiled")
+        else:
+            current_trace().profile = g.profiler
+
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.after_request
+def finish_profiling(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # Loads still running for this request (e.g. a timed out cluster) stop being profiled
+        current_trace().profile = None
+        profile_id = profile_store.stop(profiler)
+        response.headers['X-Profile-Id'] = profile_id
+        logging.info(f"Profiled {request.path} as {profile_id}")
+    elif profiling_requested():
+        response.headers['X-Profile-Id'] = 'busy'
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'metrics_endpoint' not in g:
+        return
+    endpoint = g.metrics_endpoint
+    duration = time.perf_counter() - g.metrics_start
+    status = g.get('metrics_status', 500)
+    HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+    HTTP_REQUEST_DURATION.observe(duration, endpoint=endpoint, method=request.method)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # The view raised before after_request could save the profile
+        current_trace().profile = None
+        profile_store.stop(profiler)
+    trace = current_trace()
+    end_trace(g.trace_token)
+    if trace is not None and endpoint != '/metrics':
+        slow_requests.record(trace, status, duration)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.exposition(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/debug/slow_requests', methods=['GET'])
+def get_slow_requests():
+    # The log shows request arguments: same guard as the profiles
+    if not profiling_requested():
+        return jsonify({"error": "Profiling is disabled or the profile token is missing"}), 403
+    return jsonify({"threshold_seconds": SLOW_REQUEST_SECONDS, "requests": slow_requests.entries()})
+
+
+@app.route('/debug/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    # Same guard as profiling itself; ?format=prof downloads the raw pstats file
+    if not profiling_requested():
+        return jsonify({"error": "Profiling is disabled or the profile token is missing"}), 403
+    try:
+        if request.args.get('format') == 'prof':
+            return send_file(profile_store.path(profile_id), mimetype='application/octet-stream',
+                             as_attachment=True, download_name=f"{profile_id}.prof")
+        sort = request.args.get('sort', default='cumulative', type=str)
+        limit = request.args.get('limit', default=50, type=int)
+        return Response(profile_store.report(profile_id, sort, limit), mimetype='text/plain')
+    except FileNotFoundError:
+        return jsonify({"error": "Unknown or expired profile"}), 404
+    except KeyError as e:
+        return jsonify({"error": f"Unknown sort key: {e}"}), 400
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -187,40 +1041,194 @@ def get_inventory():
         context = request.args.get('context', default=None, type=str)
         resource_type = request.args.get('resource_type', default='', type=str).lower()
         namespace = request.args.get('namespace', default='', type=str)
+        label_selector = request.args.get('label_selector', default='', type=str)
+        field_selector = request.args.get('field_selector', default='', type=str)
 
-        inventory = load_k8s_inventory(context=context)
-
-        # Filter data
-        filtered_inventory = {
-            "deployments": [],
-            "statefulsets": [],
-            "nodes": []
-        }
+        stream = request.args.get('stream', default='', type=str).lower()
+        wire_format = request.args.get('format', default='', type=str).lower()
+        # fields=metadata: names, namespaces, labels and timestamps only, listed
+        # as PartialObjectMetadata without the objects' spec and status
+        fields = request.args.get('fields', default='', type=str).lower()
 
-        if resource_type in ['deployment', '']:
-            filtered_inventory['deployments'] = [
-                dep for dep in inventory['deployments']
-                if namespace == '' or dep['namespace'] == namespace
-            ]
+        inventory, age, _ = get_requested_inventory(context, resource_type, namespace, label_selector, field_selector,
+                                                    metadata_only=fields == 'metadata')
 
-        if resource_type in ['statefulset', '']:
-            filtered_inventory['statefulsets'] = [
-                sts for sts in inventory['statefulsets']
-                if namespace == '' or sts['namespace'] == namespace
-            ]
+        # Chunked responses: records are encoded while the body is being sent
+        if stream in ('ndjson', 'json'):
+            filtered_inventory = filter_inventory(inventory, resource_type, namespace)
+            if stream == 'ndjson':
+                response = Response(iter_ndjson(filtered_inventory, ALL_KINDS, default=json_default), mimetype='application/x-ndjson')
+            else:
+                extra = {"errors": inventory.get("errors", {}), "age_seconds": round(age, 1)}
+                response = Response(iter_json(filtered_inventory, ALL_KINDS, extra, default=json_default), mimetype='application/json')
+            response.headers['Age'] = str(int(age))
+            return response
 
-        if resource_type in ['node', '']:
-            filtered_inventory['nodes'] = inventory['nodes']  # Nodes do not have namespaces
+        # The ETag only depends on the lists' resourceVersions and on the
+        # request options, so unchanged data is answered before filtering
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        etag = None
+        if not inventory.get("errors"):
+            etag = inventory_etag(
+                inventory.get("resource_versions"),
+                context, resource_type, namespace, label_selector, field_selector, fields, wire_format, encoding
+            )
+        # The regular format carries age_seconds, which changes between
+        # identical inventories, so only the compact format gets a strong ETag
+        weak = wire_format != 'compact'
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=weak)
+            response.headers['Age'] = str(int(age))
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
 
-        logging.debug(f"Filtered inventory: {json.dumps(filtered_inventory, indent=2)}")
+        with stage_timer("filter", context):
+            filtered_inventory = filter_inventory(inventory, resource_type, namespace)
+        with stage_timer("serialize", context):
+            if wire_format == 'compact':
+                payload = compact_inventory(filtered_inventory, ALL_KINDS)
+                payload["errors"] = inventory.get("errors", {})
+            else:
+                payload = {
+                    **filtered_inventory,
+                    "errors": inventory.get("errors", {}),
+                    "age_seconds": round(age, 1)
+                }
+            body = json.dumps(payload, separators=(',', ':'), default=json_default).encode()
 
-        return jsonify(filtered_inventory)
+        response = Response(mimetype='application/json')
+        if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+            with stage_timer("compress", context):
+                body = compress(body, encoding)
+            response.headers['Content-Encoding'] = encoding
+        response.set_data(body)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Age'] = str(int(age))
+        if etag is not None:
+            response.set_etag(etag, weak=weak)
+        return response
     except Exception as e:
         logging.error(f"Error loading data: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+table_views = OrderedDict()
+table_views_lock = threading.Lock()
+TABLE_VIEWS_MAX_ENTRIES = INVENTORY_CACHE_MAX_ENTRIES
+
+
+def get_table_view(context, inventory):
+    # Views are rebuilt only when the cache or informer hands out a new inventory
+    with table_views_lock:
+        view = table_views.get(context)
+        if view is not None and view.is_view_of(inventory):
+            table_views.move_to_end(context)
+            return view
+    view = InventoryTableView(inventory)
+    with table_views_lock:
+        table_views[context] = view
+        table_views.move_to_end(context)
+        while len(table_views) > TABLE_VIEWS_MAX_ENTRIES:
+            table_views.popitem(last=False)
+    return view
+
+
+@app.route('/data/table', methods=['GET'])
+def get_inventory_table():
+    # DataTables server-side processing: only one page of rows is returned
+    try:
+        context = request.args.get('context', default=None, type=str)
+        resource_type = request.args.get('resource_type', default='', type=str).lower()
+        namespace = request.args.get('namespace', default='', type=str)
+        draw = request.args.get('draw', default=0, type=int)
+        start = request.args.get('start', default=0, type=int)
+        length = request.args.get('length', default=10, type=int)
+        order_column = request.args.get('order[0][column]', default=1, type=int)
+        descending = request.args.get('order[0][dir]', default='asc', type=str) == 'desc'
+        search = request.args.get('search[value]', default='', type=str)
+
+        inventory, age, _ = get_requested_inventory(context)
+        view = get_table_view(context, inventory)
+        records_filtered, rows = view.query(
+            start=max(start, 0),
+            length=length,
+            order_column=order_column,
+            descending=descending,
+            search=search,
+            resource_type=resource_type,
+            namespace=namespace
+        )
+
+        response = jsonify({
+            "draw": draw,
+            "recordsTotal": len(view.rows),
+            "recordsFiltered": records_filtered,
+            "data": [['-' if value is None else value for value in row] for row in rows],
+            "namespaces": view.namespaces,
+            "errors": inventory.get("errors", {}),
+            "age_seconds": round(age, 1)
+        })
+        response.headers['Age'] = str(int(age))
+        return response
+    except Exception as e:
+        logging.error(f"Error loading table data: {e}")
+        traceback.print_exc()
+        return jsonify({"draw": request.args.get('draw', default=0, type=int), "error": str(e)}), 500
+
+
+def resolve_diff_source(source, kinds):
+    """
+    Inventory for one side of /diff: "live:<context>" (the current inventory,
+    any context accepted by /data), "snapshot:<context>[@<ISO time>]" or
+    "file:<name>" for a JSON or NDJSON inventory in INVENTORY_FILES_DIR.
+    """
+    scheme, _, value = source.partition(':')
+    if scheme == 'live':
+        inventory, _, _ = get_requested_inventory(value or None)
+        return inventory
+    if scheme == 'snapshot':
+        if snapshot_store is None:
+            raise ValueError("Snapshot store not configured (SNAPSHOT_DB)")
+        context, _, at = value.partition('@')
+        inventory = snapshot_store.inventory_at(context, kinds, at or None)
+        if inventory is None:
+            raise ValueError(f"No snapshot of {context!r} at {at or 'now'}")
+        return inventory
+    if scheme == 'file':
+        name = os.path.basename(value)
+        if name != value or not name.endswith(('.json', '.ndjson')):
+            raise ValueError(f"Invalid inventory file: {value!r}")
+        path = os.path.join(INVENTORY_FILES_DIR, name)
+        if not os.path.isfile(path):
+            raise ValueError(f"Inventory file not found: {name}")
+        # Read as a stream by the diff engine
+        return path
+    raise ValueError(f"Unknown diff source: {source!r}")
+
+
+@app.route('/diff', methods=['GET'])
+def get_diff():
+    # /diff?old=<source>&new=<source>[&kinds=deployments,nodes][&stream=ndjson]
+    try:
+        kinds = tuple(request.args.get('kinds', default=','.join(DIFF_KINDS), type=str).split(','))
+        old = resolve_diff_source(request.args.get('old', default='file:k8s_inventory.json', type=str), kinds)
+        new = resolve_diff_source(request.args.get('new', default='live:', type=str), kinds)
+
+        if request.args.get('stream') == 'ndjson':
+            chunks = (json.dumps(entry) + '\n' for entry in iter_diff(old, new, kinds))
+            return Response(chunks, mimetype='application/x-ndjson')
+        return jsonify(diff_inventories(old, new, kinds))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error computing inventory diff: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/test_report')
 def test_report():
     # Dati di esempio
@@ -308,46 +1316,83 @@ def get_contexts():
         return jsonify({"error": "Failed to retrieve Kubernetes contexts."}), 500
 
 
+@app.route('/api/snapshots', methods=['GET'])
+def get_snapshots():
+    if snapshot_store is None:
+        return jsonify({"error": "Snapshot store not configured (SNAPSHOT_DB)"}), 404
+    try:
+        context = request.args.get('context', default='', type=str)
+        limit = request.args.get('limit', default=100, type=int)
+        return jsonify(snapshot_store.snapshots(context, limit))
+    except Exception as e:
+        logging.error(f"Error listing snapshots: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/snapshots/objects', methods=['GET'])
+def get_snapshot_objects():
+    # Objects of one kind as of a point in time (at=ISO 8601, default now) or a snapshot id
+    if snapshot_store is None:
+        return jsonify({"error": "Snapshot store not configured (SNAPSHOT_DB)"}), 404
+    try:
+        context = request.args.get('context', default='', type=str)
+        kind = request.args.get('kind', default='deployments', type=str)
+        namespace = request.args.get('namespace', default=None, type=str)
+        at = request.args.get('at', default=None, type=str)
+        snapshot_id = request.args.get('snapshot_id', default=None, type=int)
+        if snapshot_id is None:
+            snapshot = snapshot_store.snapshot_at(context, at)
+            if snapshot is None:
+                return jsonify({"error": f"No snapshot of {context!r} at {at or 'now'}"}), 404
+            snapshot_id = snapshot["id"]
+        items = snapshot_store.objects(context, kind, namespace=namespace, snapshot_id=snapshot_id)
+        return jsonify({"snapshot_id": snapshot_id, "kind": kind, "items": items})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error reading snapshot objects: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/nodes', methods=['GET'])
 def get_nodes():
     try:
         context = request.args.get('context', default=None, type=str)
         logging.debug("Received call to /api/nodes")
-        
-        if context:
-            config.load_kube_config(config_file=kubeconfig_path, context=context)
-            logging.debug(f"Kubernetes configuration loaded with context: {context}")
-        else:
-            config.load_kube_config(config_file=kubeconfig_path)
-            logging.debug("Kubernetes configuration loaded with default context.")
 
-        v1 = client.CoreV1Api()
+        if INVENTORY_MODE == 'informer':
+            inventory, _ = get_inventory_for_context(context)
+            return jsonify([
+                {
+                    'name': node['name'],
+                    'status': node_ready_status(node['conditions']),
+                    'conditions': node['conditions']
+                }
+                for node in inventory['nodes']
+            ])
+
+        v1 = client.CoreV1Api(api_client_pool.get(context))
         logging.debug("CoreV1Api instance created.")
 
-        nodes = v1.list_node(timeout_seconds=10)
-        logging.debug(f"Number of nodes retrieved: {len(nodes.items)}")
-
-        node_info = []
-        for node in nodes.items:
-            status = "Unknown"
-            conditions = []
-            if node.status.conditions:
-                for condition in node.status.conditions:
-                    conditions.append({
-                        'type': condition.type,
-                        'status': condition.status,
-                        'last_heartbeat_time': condition.last_heartbeat_time.isoformat() if condition.last_heartbeat_time else None,
-                        'last_transition_time': condition.last_transition_time.isoformat() if condition.last_transition_time else None,
-                        'reason': condition.reason,
-                        'message': condition.message
-                    })
-                    if condition.type == "Ready":
-                        status = condition.status
-            node_info.append({
-                'name': node.metadata.name,
-                'status': status,
+        def node_summary(name, conditions):
+            return {
+                'name': name,
+                'status': node_ready_status(conditions),
                 'conditions': conditions
-            })
+            }
+
+        if K8S_DECODE == 'raw':
+            list_fn = raw_list(v1.list_node)
+            transform = lambda node: node_summary(node['metadata']['name'], node_conditions_from_raw(node))
+        else:
+            list_fn = v1.list_node
+            transform = lambda node: node_summary(node.metadata.name, node_conditions_to_list(node))
+
+        node_info = list_all(timed_list(list_fn, context, "nodes"), transform, K8S_PAGE_SIZE, timeout_seconds=10,
+                             _request_timeout=K8S_REQUEST_TIMEOUT)
+        logging.debug(f"Number of nodes retrieved: {len(node_info)}")
         logging.debug(f"Nodes: {node_info}")
         return jsonify(node_info)
     except client.rest.ApiException as e:
@@ -358,6 +1403,140 @@ def get_nodes():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# Capacity indexes of node lists, per context
+capacity_views = DerivedViews(CapacityIndex, max_entries=INVENTORY_CACHE_MAX_ENTRIES)
+
+
+@app.route('/api/capacity', methods=['GET'])
+def get_capacity():
+    # Capacity and allocatable totals of the nodes (cpu in cores, memory and
+    # ephemeral-storage in bytes), per value of ?group_by= when given: zone,
+    # region, instance-type, os, arch, role, cluster or any node label key
+    try:
+        context = request.args.get('context', default=None, type=str)
+        group_by = request.args.get('group_by', default='', type=str)
+
+        inventory, age, _ = get_requested_inventory(context, 'node')
+        with stage_timer("capacity", context, "nodes"):
+            index = capacity_views.get(context, inventory['nodes'])
+            result = {"units": CAPACITY_RESOURCES, **index.totals()}
+            if group_by:
+                result["group_by"] = group_by
+                result["groups"] = index.group_by(group_by)
+
+        result["invalid_quantities"] = index.invalid
+        result["errors"] = inventory.get("errors", {})
+        result["age_seconds"] = round(age, 1)
+        response = jsonify(result)
+        response.headers['Age'] = str(int(age))
+        return response
+    except Exception as e:
+        logging.error(f"Error computing capacity: {e}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# Owner-reference graphs of Deployments, ReplicaSets and Pods, one per
+# context, each kept up to date by a WorkloadGraphInformer: listed once, then
+# followed with watch streams for as long as the app runs
+workload_graphs = {}
+workload_graphs_lock = threading.Lock()
+
+
+def get_workload_graph(context):
+    # Returns (graph, age in seconds). Building the client validates the
+    # context, so unknown contexts never start an informer; the lock makes sure
+    # that one informer per context syncs its graph
+    with workload_graphs_lock:
+        api_client = api_client_pool.get(context)
+        informer = workload_graphs.get(context)
+        if informer is not None and informer.generation != api_client_pool.generation:
+            # The kubeconfig changed: start over on the new client
+            informer.stop()
+            informer = None
+        if informer is None:
+            apps_v1 = client.AppsV1Api(api_client)
+            v1 = client.CoreV1Api(api_client)
+            list_fns = {
+                "deployments": apps_v1.list_deployment_for_all_namespaces,
+                "replicasets": apps_v1.list_replica_set_for_all_namespaces,
+                "pods": v1.list_pod_for_all_namespaces
+            }
+            informer = WorkloadGraphInformer(context, WorkloadGraph(), {
+                kind: (list_fn, functools.partial(timed_list(raw_list(list_fn), context, kind),
+                                                  _request_timeout=K8S_REQUEST_TIMEOUT))
+                for kind, list_fn in list_fns.items()
+            }, watch_timeout=INFORMER_WATCH_TIMEOUT, page_size=K8S_PAGE_SIZE, generation=api_client_pool.generation)
+            informer.start()
+            workload_graphs[context] = informer
+            logging.debug(f"Started workload graph informer for context: {context}")
+
+    if not informer.wait_for_sync(INFORMER_SYNC_TIMEOUT):
+        raise TimeoutError(f"Workload graph for context {context} did not sync within {INFORMER_SYNC_TIMEOUT}s")
+    # A kind that fails keeps its previous objects and is reported in "errors"
+    errors = informer.graph.errors()
+    if len(errors) == len(GRAPH_KINDS):
+        raise RuntimeError(f"Failed to list any workload kind: {errors}")
+    return informer.graph, informer.age() or 0.0
+
+
+def unknown_context(context):
+    # The workload graph's 404 for contexts that are not in the kubeconfig
+    if context and context not in api_client_pool.contexts():
+        return jsonify({"error": f"Unknown context {context!r}"}), 404
+    return None
+
+
+@app.route('/api/workloads', methods=['GET'])
+def get_workloads():
+    # Per-Deployment rollups: current and stale ReplicaSets, pod phases
+    try:
+        context = request.args.get('context', default=None, type=str)
+        namespace = request.args.get('namespace', default='', type=str)
+        if resolve_contexts(context) is not None:
+            return jsonify({"error": "The workload graph is available for one context at a time"}), 400
+        not_found = unknown_context(context)
+        if not_found is not None:
+            return not_found
+
+        graph, age = get_workload_graph(context)
+        response = jsonify({
+            "deployments": graph.rollups(namespace),
+            "counts": graph.counts(),
+            "errors": graph.errors(),
+            "age_seconds": round(age, 1)
+        })
+        response.headers['Age'] = str(int(age))
+        return response
+    except Exception as e:
+        logging.error(f"Error loading the workload graph: {e}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/workloads/<namespace>/<name>', methods=['GET'])
+def get_workload(namespace, name):
+    try:
+        context = request.args.get('context', default=None, type=str)
+        if resolve_contexts(context) is not None:
+            return jsonify({"error": "The workload graph is available for one context at a time"}), 400
+        not_found = unknown_context(context)
+        if not_found is not None:
+            return not_found
+
+        graph, age = get_workload_graph(context)
+        rollup = graph.rollup(namespace, name)
+        if rollup is None:
+            return jsonify({"error": f"Deployment {namespace}/{name} not found"}), 404
+        response = jsonify({**rollup, "errors": graph.errors(), "age_seconds": round(age, 1)})
+        response.headers['Age'] = str(int(age))
+        return response
+    except Exception as e:
+        logging.error(f"Error loading the workload graph: {e}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True)
 
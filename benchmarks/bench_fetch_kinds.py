@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+Compare sequential and concurrent per-kind fetching in load_k8s_inventory().
+
+By default the benchmark runs against fake_apiserver.py seeded with
+k8s_inventory.json. Use --latency to simulate a remote API server. Pass
+--kubeconfig/--context to measure a real cluster instead.
+
+    python benchmarks/bench_fetch_kinds.py --latency 0.2 --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_apiserver  # noqa: E402
+
+
+def measure(load, runs, concurrent):
+    samples = []
+    for _ in range(runs):
+        inventory = load(concurrent=concurrent)
+        samples.append(inventory["timings"])
+    kinds = [k for k in samples[0] if k != "total"]
+    return {kind: statistics.median(s[kind] for s in samples) for kind in kinds + ["total"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.1, help="fake API server latency per list request")
+    parser.add_argument('--inventory', default=os.path.join(ROOT, 'k8s_inventory.json'))
+    parser.add_argument('--kubeconfig', help="benchmark a real cluster instead of the fake API server")
+    parser.add_argument('--context')
+    args = parser.parse_args()
+
+    if args.kubeconfig:
+        os.environ['KUBECONFIG'] = args.kubeconfig
+    else:
+        cluster = fake_apiserver.FakeCluster(latency=args.latency)
+        with open(args.inventory) as f:
+            cluster.load_inventory(json.load(f))
+        server = fake_apiserver.serve(cluster)
+        kubeconfig = os.path.join(tempfile.mkdtemp(), 'kubeconfig.yaml')
+        fake_apiserver.write_kubeconfig(kubeconfig, f"http://127.0.0.1:{server.server_address[1]}")
+        os.environ['KUBECONFIG'] = kubeconfig
+
+    import app  # reads KUBECONFIG at import time
+
+    def load(concurrent):
+        return app.load_k8s_inventory(context=args.context, concurrent=concurrent)
+
+    load(concurrent=True)  # warm up the ApiClient and connection pool
+    sequential = measure(load, args.runs, concurrent=False)
+    concurrent = measure(load, args.runs, concurrent=True)
+
+    print(f"{'stage':<14}{'sequential':>12}{'concurrent':>12}")
+    for stage in sequential:
+        print(f"{stage:<14}{sequential[stage]:>11.3f}s{concurrent[stage]:>11.3f}s")
+    print(f"wall-clock speedup: {sequential['total'] / concurrent['total']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+"""
+CPU time and memory of building inventory records from list responses
+through the client's models versus straight from the raw JSON (K8S_DECODE).
+
+A synthetic cluster of --size objects (synthetic_cluster.py) is turned into
+the list response pages the fake API server would send, --page-size objects
+per page. Each variant decodes every page and builds the web app's records:
+
+- models: ApiClient.deserialize() into V1DeploymentList & co., then
+  deployment_to_dict() / statefulset_to_dict() / node_to_dict();
+- raw: json.loads(), then the *_from_raw() builders;
+- metadata: PartialObjectMetadataList pages (/data?fields=metadata), which
+  hold only the objects' metadata, decoded into metadata-only records.
+
+CPU time is the best of --repeat runs; peak memory (tracemalloc) is measured
+in a separate run and includes the page being decoded. The records of models
+and raw must serialize to the same JSON, and the metadata records to the same
+JSON as their metadata-only projection.
+
+    python benchmarks/bench_raw_decode.py --size 10k
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kubernetes import client  # noqa: E402
+
+import app  # noqa: E402
+from fake_apiserver import OBJECT_BUILDERS  # noqa: E402
+from inventory_records import json_default  # noqa: E402
+from synthetic_cluster import generate_cluster  # noqa: E402
+
+KINDS = {
+    # kind: (list model, model record builder)
+    "deployments": ("V1DeploymentList", app.deployment_to_dict),
+    "statefulsets": ("V1StatefulSetList", app.statefulset_to_dict),
+    "nodes": ("V1NodeList", app.node_to_dict)
+}
+
+
+def response_pages(inventory, page_size, metadata_only=False):
+    """{kind: [page bytes]} as served by the API server."""
+    pages = {}
+    for kind in KINDS:
+        objects = [OBJECT_BUILDERS[kind](record) for record in inventory[kind]]
+        if metadata_only:
+            objects = [{"kind": "PartialObjectMetadata", "metadata": obj["metadata"]} for obj in objects]
+        pages[kind] = [
+            json.dumps({"metadata": {"resourceVersion": "1"}, "items": objects[start:start + page_size]}).encode()
+            for start in range(0, len(objects), page_size)
+        ]
+    return pages
+
+
+def decode_models(pages):
+    api_client = client.ApiClient()
+    records = {}
+    for kind, (model, transform) in KINDS.items():
+        records[kind] = []
+        for data in pages[kind]:
+            page = api_client.deserialize(data.decode('utf-8'), model, 'application/json')
+            records[kind].extend(transform(obj) for obj in page.items)
+    return records
+
+
+def decode_raw(pages):
+    records = {}
+    for kind, (_, transform) in KINDS.items():
+        raw_transform = app.RAW_TRANSFORMS[transform]
+        records[kind] = []
+        for data in pages[kind]:
+            records[kind].extend(raw_transform(obj) for obj in json.loads(data)["items"])
+    return records
+
+
+def decode_metadata(pages):
+    records = {}
+    for kind, (_, transform) in KINDS.items():
+        metadata_transform = app.METADATA_TRANSFORMS[transform]
+        records[kind] = []
+        for data in pages[kind]:
+            records[kind].extend(metadata_transform(obj) for obj in json.loads(data)["items"])
+    return records
+
+
+VARIANTS = {"models": decode_models, "raw": decode_raw, "metadata": decode_metadata}
+
+
+def cpu_seconds(decode, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.process_time()
+        decode(pages)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_mib(decode, pages):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        records = decode(pages)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del records
+    return peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='10k', help="cluster size (1k, 10k, 100k or a number)")
+    parser.add_argument('--page-size', type=int, default=500, help="objects per list response page")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per variant")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    inventory = generate_cluster(args.size, seed=args.seed)
+    variant_pages = {"models": response_pages(inventory, args.page_size)}
+    variant_pages["raw"] = variant_pages["models"]
+    variant_pages["metadata"] = response_pages(inventory, args.page_size, metadata_only=True)
+    objects = sum(len(inventory[kind]) for kind in KINDS)
+    for name in ("models", "metadata"):
+        pages = variant_pages[name]
+        response_mib = sum(len(data) for kind_pages in pages.values() for data in kind_pages) / 2 ** 20
+        print(f"{name:<8} {objects} objects in {sum(map(len, pages.values()))} pages, {response_mib:.1f} MiB of JSON")
+
+    records = {name: decode(variant_pages[name]) for name, decode in VARIANTS.items()}
+    outputs = {name: json.dumps(value, default=json_default) for name, value in records.items()}
+    if outputs["models"] != outputs["raw"]:
+        raise SystemExit("The records of models and raw differ")
+    if outputs["metadata"] != json.dumps(app.metadata_inventory(records["models"]), default=json_default):
+        raise SystemExit("The metadata records differ from the metadata of the full records")
+    del records, outputs
+
+    results = {}
+    for name, decode in VARIANTS.items():
+        pages = variant_pages[name]
+        results[name] = (cpu_seconds(decode, pages, args.repeat), peak_mib(decode, pages))
+        cpu, peak = results[name]
+        print(f"{name:<8} cpu {cpu:8.3f}s  {objects / cpu:>10.0f} objects/s  peak {peak:8.1f} MiB")
+
+    models_cpu, models_peak = results["models"]
+    for name in ("raw", "metadata"):
+        cpu, peak = results[name]
+        print(f"{name}: {models_cpu / cpu:.1f}x faster, peak memory {peak / models_peak:.0%} of models")
+
+
+if __name__ == "__main__":
+    main()
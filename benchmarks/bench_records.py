@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+Memory of an inventory held as plain dicts versus the compact record types.
+
+A synthetic inventory of --objects objects (deployments and statefulsets over
+--namespaces namespaces, plus nodes) is generated as JSON and parsed, as the
+API client would, so every record starts with its own copies of the strings.
+Each variant then builds its records from the parsed objects, drops them and
+reports the memory still held (tracemalloc), the build time and the time to
+serialize the result back to JSON, which must be identical for both.
+
+    python benchmarks/bench_records.py --objects 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inventory_records import NodeRecord, WorkloadRecord, json_default  # noqa: E402
+
+TEAMS = ["payments", "search", "checkout", "identity", "platform", "data", "ml", "web"]
+TIERS = ["frontend", "backend", "cache", "db", "worker"]
+ENVIRONMENTS = ["prod", "staging", "dev"]
+
+
+def synthetic_document(objects, namespaces, seed=0):
+    rng = random.Random(seed)
+    nodes = max(1, objects // 50)
+    namespace_names = [f"team-{TEAMS[i % len(TEAMS)]}-{i}" for i in range(namespaces)]
+    inventory = {"deployments": [], "statefulsets": [], "nodes": []}
+    for i in range(objects - nodes):
+        kind = "statefulsets" if i % 5 == 0 else "deployments"
+        name = f"app-{i}"
+        replicas = rng.choice([1, 2, 3, 5])
+        inventory[kind].append({
+            "name": name,
+            "namespace": rng.choice(namespace_names),
+            "replicas": replicas,
+            "available_replicas": replicas,
+            "creation_timestamp": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00+00:00",
+            "labels": {
+                "app": name,
+                "app.kubernetes.io/part-of": rng.choice(TEAMS),
+                "app.kubernetes.io/component": rng.choice(TIERS),
+                "app.kubernetes.io/managed-by": "helm",
+                "environment": rng.choice(ENVIRONMENTS),
+                "team": rng.choice(TEAMS)
+            }
+        })
+    for i in range(nodes):
+        zone = f"eu-west-1{'abc'[i % 3]}"
+        inventory["nodes"].append({
+            "name": f"node-{i}",
+            "labels": {
+                "kubernetes.io/hostname": f"node-{i}",
+                "kubernetes.io/os": "linux",
+                "kubernetes.io/arch": "amd64",
+                "node.kubernetes.io/instance-type": "m5.xlarge",
+                "topology.kubernetes.io/zone": zone
+            },
+            "annotations": {"node.alpha.kubernetes.io/ttl": "0"},
+            "conditions": [
+                {"type": condition, "status": "False" if condition != "Ready" else "True",
+                 "last_heartbeat_time": "2024-10-01T10:00:00+00:00",
+                 "last_transition_time": "2024-09-01T10:00:00+00:00",
+                 "reason": f"Kubelet{condition}", "message": "kubelet is posting ready status"}
+                for condition in ("MemoryPressure", "DiskPressure", "PIDPressure", "Ready")
+            ],
+            "capacity": {"cpu": "4", "memory": "16069348Ki", "pods": "110"},
+            "allocatable": {"cpu": "3920m", "memory": "14873316Ki", "pods": "110"},
+            "creation_timestamp": "2024-09-01T10:00:00+00:00"
+        })
+    return json.dumps(inventory)
+
+
+def as_dicts(parsed):
+    # Like the *_to_dict() transforms: a new dict sharing the parsed values
+    return {kind: [dict(record) for record in records] for kind, records in parsed.items()}
+
+
+def as_records(parsed):
+    return {
+        kind: [(NodeRecord if kind == "nodes" else WorkloadRecord).from_dict(record) for record in records]
+        for kind, records in parsed.items()
+    }
+
+
+def measure(document, build):
+    # Memory and times are measured in separate runs: tracing slows allocations down
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    inventory = build(json.loads(document))
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del inventory
+
+    parsed = json.loads(document)
+    start = time.perf_counter()
+    inventory = build(parsed)
+    elapsed = time.perf_counter() - start
+    del parsed
+
+    start = time.perf_counter()
+    body = json.dumps(inventory, separators=(',', ':'), default=json_default)
+    serialize = time.perf_counter() - start
+    return retained, elapsed, serialize, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, default=100000)
+    parser.add_argument('--namespaces', type=int, default=200)
+    args = parser.parse_args()
+
+    document = synthetic_document(args.objects, args.namespaces)
+    print(f"objects: {args.objects}, JSON document: {len(document):,} bytes")
+    print(f"{'records':<10}{'retained':>14}{'per object':>13}{'build':>10}{'serialize':>12}")
+    results = {}
+    for name, build in (("dict", as_dicts), ("compact", as_records)):
+        retained, elapsed, serialize, body = measure(document, build)
+        results[name] = (retained, body)
+        print(f"{name:<10}{retained / 2 ** 20:>11.1f} MiB{retained / args.objects:>11.0f} B"
+              f"{elapsed * 1000:>8.0f}ms{serialize * 1000:>10.0f}ms")
+    if results["dict"][1] != results["compact"][1]:
+        raise SystemExit("compact records serialize to a different JSON document")
+    print(f"compact/dict memory: {results['compact'][0] / results['dict'][0]:.2%}")
+
+
+if __name__ == "__main__":
+    main()
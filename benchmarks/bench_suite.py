@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end benchmarks against synthetic clusters.
+
+For every --sizes entry a fake API server (fake_apiserver.py --synthetic) is
+started with a generated cluster of that many objects, then every target is
+measured in a fresh process:
+
+- the web endpoints (/data, /api/nodes, /generate_pdf): the first request
+  (cold, loads the cluster), --requests sequential requests (latency),
+  then --requests requests from --concurrency clients (throughput);
+- the k8s_inventory.py CLI, writing a JSON file and an NDJSON stream,
+  --runs times.
+
+Peak memory is the maximum resident set size of the app or CLI process.
+Failed targets (e.g. /generate_pdf without WeasyPrint's system libraries)
+are recorded with their error and the suite goes on.
+Results are printed and written as JSON to --output; --baseline compares
+them with an earlier results file.
+
+    python benchmarks/bench_suite.py --sizes 1k,10k --output results.json
+    python benchmarks/bench_suite.py --sizes 1k,10k --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic_cluster import kind_counts, parse_size  # noqa: E402
+
+ENDPOINTS = ("/data", "/api/nodes", "/generate_pdf")
+CLI_TARGETS = {
+    "cli": [],
+    "cli --stream ndjson": ["--stream", "ndjson"]
+}
+
+# Runs the app in a child process and prints the port it listens on
+APP_SERVER = """
+from werkzeug.serving import make_server
+import app
+server = make_server('127.0.0.1', 0, app.app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+"""
+
+
+def start_process(args, env, ready, quiet=False):
+    """Start ``args`` and wait for its first stdout line; ``ready`` parses it."""
+    process = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+                               stderr=subprocess.DEVNULL if quiet else None)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError(f"{args[1]} exited with status {process.returncode} before it was ready")
+    # Keep draining stdout so the child never blocks on a full pipe
+    threading.Thread(target=process.stdout.read, daemon=True).start()
+    return process, ready(line)
+
+
+def stop_process(process):
+    """Terminate ``process`` and return its peak resident set size in MiB."""
+    process.terminate()
+    _, _, usage = os.wait4(process.pid, 0)
+    process.returncode = 0
+    return max_rss_mib(usage)
+
+
+def max_rss_mib(usage):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss * scale / 2 ** 20, 1)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(samples):
+    return {
+        "p50": round(statistics.median(samples), 4),
+        "p95": round(percentile(samples, 0.95), 4),
+        "max": round(max(samples), 4),
+        "mean": round(statistics.fmean(samples), 4)
+    }
+
+
+def fetch(url, timeout):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            size = len(response.read())
+    except urllib.error.HTTPError as e:
+        body = e.read().decode(errors='replace')
+        raise RuntimeError(f"HTTP {e.code}: {body[:200]}") from None
+    return time.perf_counter() - start, size
+
+
+def bench_endpoint(path, env, args):
+    env = dict(env, PDF_CACHE_DIR=tempfile.mkdtemp(prefix='bench-pdf-'))
+    process, port = start_process([sys.executable, '-c', APP_SERVER], env, int, quiet=not args.verbose)
+    url = f"http://127.0.0.1:{port}{path}"
+    result = {"target": path}
+    try:
+        cold, size = fetch(url, args.timeout)
+        result["cold_seconds"] = round(cold, 4)
+        result["response_bytes"] = size
+
+        latencies = [fetch(url, args.timeout)[0] for _ in range(args.requests)]
+        result["latency_seconds"] = latency_summary(latencies)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda _: fetch(url, args.timeout), range(args.requests)))
+        result["throughput_rps"] = round(args.requests / (time.perf_counter() - start), 2)
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        result["peak_rss_mib"] = stop_process(process)
+        shutil.rmtree(env["PDF_CACHE_DIR"], ignore_errors=True)
+    return result
+
+
+def bench_cli(name, extra_args, env, args, objects):
+    output = os.path.join(tempfile.mkdtemp(prefix='bench-cli-'), 'inventory.json')
+    command = [sys.executable, os.path.join(ROOT, 'k8s_inventory.py'), '--output', output] + extra_args
+    durations, peaks = [], []
+    result = {"target": name}
+    try:
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                                       stderr=None if args.verbose else subprocess.DEVNULL)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            durations.append(time.perf_counter() - start)
+            if process.returncode:
+                raise RuntimeError(f"k8s_inventory.py exited with status {process.returncode}")
+            peaks.append(max_rss_mib(usage))
+        result["latency_seconds"] = latency_summary(durations)
+        result["throughput_objects_per_second"] = round(objects / statistics.median(durations), 1)
+        result["response_bytes"] = os.path.getsize(output)
+        result["peak_rss_mib"] = max(peaks)
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        shutil.rmtree(os.path.dirname(output), ignore_errors=True)
+    return result
+
+
+def bench_size(size, args):
+    objects = parse_size(size)
+    workdir = tempfile.mkdtemp(prefix='bench-cluster-')
+    kubeconfig = os.path.join(workdir, 'kubeconfig.yaml')
+    fake_args = [sys.executable, os.path.join(ROOT, 'fake_apiserver.py'), '--port', '0',
+                 '--synthetic', str(objects), '--kubeconfig', kubeconfig]
+    if args.latency:
+        fake_args += ['--latency', str(args.latency)]
+    fake, _ = start_process(fake_args, os.environ.copy(), str.strip)
+    env = dict(os.environ, KUBECONFIG=kubeconfig, INVENTORY_MODE='cache')
+    results = []
+    try:
+        for target in args.targets:
+            print(f"[{size}] {target} ...", file=sys.stderr)
+            if target in CLI_TARGETS:
+                result = bench_cli(target, CLI_TARGETS[target], env, args, objects)
+            else:
+                result = bench_endpoint(target, env, args)
+            results.append({"size": size, "objects": objects, **result})
+    finally:
+        fake.terminate()
+        fake.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {(r["size"], r["target"]): r for r in (baseline or {}).get("results", [])}
+    print(f"{'size':<6}{'target':<22}{'cold':>9}{'p50':>9}{'p95':>9}{'thrpt':>10}{'peak MiB':>10}  change")
+    for r in results:
+        if "error" in r:
+            print(f"{r['size']:<6}{r['target']:<22}  error: {r['error']}")
+            continue
+        latency = r["latency_seconds"]
+        cold = f"{r['cold_seconds']:.3f}" if "cold_seconds" in r else '-'
+        throughput = r.get("throughput_rps") or r.get("throughput_objects_per_second")
+        change = ''
+        old = previous.get((r["size"], r["target"]))
+        if old and "latency_seconds" in old:
+            change = (f"p50 {latency['p50'] / old['latency_seconds']['p50'] - 1:+.0%}, "
+                      f"peak {r['peak_rss_mib'] / old['peak_rss_mib'] - 1:+.0%}")
+        print(f"{r['size']:<6}{r['target']:<22}{cold:>9}{latency['p50']:>9.3f}{latency['p95']:>9.3f}"
+              f"{throughput:>10}{r['peak_rss_mib']:>10}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1k,10k', help="comma-separated cluster sizes (1k, 10k, 100k or numbers)")
+    parser.add_argument('--targets', default=','.join(ENDPOINTS + tuple(CLI_TARGETS)),
+                        help="comma-separated endpoints and CLI targets")
+    parser.add_argument('--requests', type=int, default=20, help="requests per endpoint for latency and throughput")
+    parser.add_argument('--concurrency', type=int, default=4, help="concurrent clients for throughput")
+    parser.add_argument('--runs', type=int, default=3, help="CLI runs per size")
+    parser.add_argument('--latency', type=float, default=0.0, help="fake API server latency per list request")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds to wait for one request")
+    parser.add_argument('--verbose', action='store_true', help="show the logs of the app and the CLI")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help="earlier results file to compare with")
+    args = parser.parse_args()
+    args.targets = args.targets.split(',')
+
+    results = []
+    for size in args.sizes.split(','):
+        results.extend(bench_size(size, args))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "options": {key: value for key, value in vars(args).items()
+                        if key not in ('output', 'baseline', 'verbose')},
+            "kinds": {size: kind_counts(parse_size(size)) for size in args.sizes.split(',')}
+        },
+        "results": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
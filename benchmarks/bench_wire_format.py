@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Compare the regular /data JSON payload with the compact format.
+
+The inventory is k8s_inventory.json repeated --scale times (with unique
+names). For each format the benchmark reports the payload size, raw and
+compressed, and the time a client needs to decode it: "compact" expands it
+back into records, "columnar" is a client that reads the arrays directly.
+
+    python benchmarks/bench_wire_format.py --scale 100
+"""
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wire_format import brotli, compact_inventory, expand_compact  # noqa: E402
+
+KINDS = ("deployments", "statefulsets", "nodes")
+
+
+def load_inventory(path, scale):
+    with open(path) as f:
+        source = json.load(f)
+    inventory = {kind: [] for kind in KINDS}
+    for copy in range(scale):
+        for kind in KINDS:
+            for record in source.get(kind, []):
+                record = dict(record, name=f"{record['name']}-{copy}")
+                if kind == "nodes" and "conditions" not in record:
+                    # The CLI stores node conditions under "status"
+                    record["conditions"] = record.pop("status", [])
+                inventory[kind].append(record)
+    return inventory
+
+
+def best_of(runs, fn):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inventory', default=os.path.join(ROOT, 'k8s_inventory.json'))
+    parser.add_argument('--scale', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    inventory = load_inventory(args.inventory, args.scale)
+    regular = json.dumps(inventory, separators=(',', ':')).encode()
+    compact = json.dumps(compact_inventory(inventory, KINDS), separators=(',', ':')).encode()
+
+    print(f"records: {sum(len(inventory[k]) for k in KINDS)}")
+    print(f"{'format':<10}{'raw':>12}{'gzip':>12}{'brotli':>12}{'parse best':>13}{'parse p50':>12}")
+    for name, body, decode in (
+        ("regular", regular, lambda: json.loads(regular)),
+        ("compact", compact, lambda: expand_compact(json.loads(compact))),
+        ("columnar", compact, lambda: json.loads(compact)),
+    ):
+        gz = len(gzip.compress(body, compresslevel=6))
+        br = len(brotli.compress(body, quality=5)) if brotli is not None else None
+        best, median = best_of(args.runs, decode)
+        br_text = f"{br:>12,}" if br is not None else f"{'n/a':>12}"
+        print(f"{name:<10}{len(body):>12,}{gz:>12,}{br_text}{best * 1000:>11.1f}ms{median * 1000:>10.1f}ms")
+    print(f"compact/regular raw size: {len(compact) / len(regular):.2%}")
+
+
+if __name__ == "__main__":
+    main()
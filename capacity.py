@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Cluster capacity: node capacity and allocatable totals, optionally grouped
+by a node label.
+
+Quantity strings ("3920m", "16069348Ki", "110") are parsed once each by a
+memoized parser: a fleet has thousands of nodes but only a handful of
+distinct quantities. A ``CapacityIndex`` keeps one ``array('d')`` per
+resource and side, in node order. Grouping by a label sorts the node order by
+group once, so that every group is a contiguous slice; totals are then sums
+of array slices (math.fsum), without a Python-level loop over the nodes.
+
+    index = CapacityIndex(inventory["nodes"])
+    index.totals()                # {"capacity": {"cpu": 48.0, ...}, "allocatable": {...}}
+    index.group_by("zone")        # [{"key": "eu-west-1a", "nodes": 4, ...}, ...]
+"""
+
+import math
+import re
+import threading
+from array import array
+from functools import lru_cache
+
+# Resources that are summed, with the unit of their totals
+RESOURCES = {
+    "cpu": "cores",
+    "memory": "bytes",
+    "pods": "pods",
+    "ephemeral-storage": "bytes"
+}
+
+SIDES = ("capacity", "allocatable")
+
+# Short names for the usual grouping labels; "role" comes from the
+# node-role.kubernetes.io/<role> label keys
+LABEL_ALIASES = {
+    "zone": "topology.kubernetes.io/zone",
+    "region": "topology.kubernetes.io/region",
+    "instance-type": "node.kubernetes.io/instance-type",
+    "os": "kubernetes.io/os",
+    "arch": "kubernetes.io/arch"
+}
+ROLE_LABEL_PREFIX = "node-role.kubernetes.io/"
+
+# Nodes without the grouping label
+NO_VALUE = None
+
+_SUFFIXES = {
+    "": 1,
+    "n": 1e-9, "u": 1e-6, "m": 1e-3,
+    "k": 1e3, "M": 1e6, "G": 1e9, "T": 1e12, "P": 1e15, "E": 1e18,
+    "Ki": 2 ** 10, "Mi": 2 ** 20, "Gi": 2 ** 30, "Ti": 2 ** 40, "Pi": 2 ** 50, "Ei": 2 ** 60
+}
+_QUANTITY = re.compile(r'^([+-]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+))(?:[eE]([+-]?[0-9]+)|([KMGTPE]i|[numkMGTPE])?)$')
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(quantity):
+    """
+    The value of a Kubernetes resource quantity in base units (cores, bytes):
+    "3920m" -> 3.92, "16Ki" -> 16384.0, "1e3" -> 1000.0. Raises ValueError for
+    anything else.
+    """
+    match = _QUANTITY.match(quantity.strip())
+    if match is None:
+        raise ValueError(f"Invalid quantity: {quantity!r}")
+    number, exponent, suffix = match.groups()
+    if exponent is not None:
+        return float(number) * 10 ** int(exponent)
+    return float(number) * _SUFFIXES[suffix or ""]
+
+
+def _total(resource, values):
+    # CPU to the millicore, the other resources in whole units
+    total = math.fsum(values)
+    return round(total, 3) if resource == "cpu" else int(round(total))
+
+
+def label_key(label):
+    """The label a group_by value refers to (aliases resolved)."""
+    return LABEL_ALIASES.get(label, label)
+
+
+def node_role(labels):
+    roles = sorted(key[len(ROLE_LABEL_PREFIX):] for key in labels or () if key.startswith(ROLE_LABEL_PREFIX))
+    return ','.join(roles) if roles else NO_VALUE
+
+
+class CapacityIndex:
+    """
+    Capacity and allocatable quantities of a list of node records (web or CLI
+    records, with an optional "cluster" field), as numeric arrays. Missing
+    resources count as 0; unparseable quantities also count as 0 and are
+    counted in ``invalid``.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.invalid = 0
+        self.values = {side: {resource: array('d') for resource in RESOURCES} for side in SIDES}
+        for node in nodes:
+            for side in SIDES:
+                quantities = node.get(side) or {}
+                for resource, values in self.values[side].items():
+                    values.append(self._parse(quantities.get(resource)))
+        self._lock = threading.Lock()
+        self._groupings = {}
+
+    def _parse(self, quantity):
+        if quantity is None:
+            return 0.0
+        try:
+            return parse_quantity(str(quantity))
+        except ValueError:
+            self.invalid += 1
+            return 0.0
+
+    def totals(self):
+        return {
+            "nodes": len(self.nodes),
+            **{side: {resource: _total(resource, values) for resource, values in self.values[side].items()} for side in SIDES}
+        }
+
+    def _group_values(self, label):
+        if label == "role":
+            return [node_role(node.get('labels')) for node in self.nodes]
+        if label == "cluster":
+            return [node.get('cluster', NO_VALUE) for node in self.nodes]
+        key = label_key(label)
+        return [(node.get('labels') or {}).get(key, NO_VALUE) for node in self.nodes]
+
+    def _grouping(self, label):
+        # (group keys, slice bounds, per-side/resource arrays in group order), built once per label
+        with self._lock:
+            grouping = self._groupings.get(label)
+        if grouping is not None:
+            return grouping
+        keys = self._group_values(label)
+        # Nodes without the label sort last
+        order = sorted(range(len(keys)), key=lambda i: (keys[i] is NO_VALUE, keys[i] or ''))
+        groups, bounds = [], []
+        for position, i in enumerate(order):
+            if not groups or keys[i] != groups[-1]:
+                groups.append(keys[i])
+                bounds.append(position)
+        bounds.append(len(order))
+        ordered = {
+            side: {resource: array('d', map(values.__getitem__, order)) for resource, values in self.values[side].items()}
+            for side in SIDES
+        }
+        grouping = (groups, bounds, ordered)
+        with self._lock:
+            self._groupings[label] = grouping
+        return grouping
+
+    def group_by(self, label):
+        """Totals per value of ``label`` (an alias, a label key, "role" or "cluster")."""
+        groups, bounds, ordered = self._grouping(label)
+        return [
+            {
+                "key": key,
+                "nodes": end - start,
+                **{
+                    side: {resource: _total(resource, values[start:end]) for resource, values in ordered[side].items()}
+                    for side in SIDES
+                }
+            }
+            for key, start, end in zip(groups, bounds, bounds[1:])
+        ]
@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+
+"""
+Minimal fake Kubernetes API server for local development.
+
+Serves list and watch requests for Deployments, ReplicaSets, StatefulSets,
+Pods, Nodes and Namespaces from an in-memory store, both cluster-wide and per
+namespace. A JSON script of timed events can be replayed into the store,
+so that watch clients (see k8s_informer.py) receive scripted ADDED, MODIFIED
+and DELETED events. A COMPACT step discards the event history, and watches
+from an older resourceVersion then receive 410 Gone. --synthetic seeds a
+generated cluster of the given size instead (see synthetic_cluster.py).
+Lists requested with "Accept: application/json;as=PartialObjectMetadataList;..."
+return only the objects' metadata, as the real API server does.
+--workload-tree links every Deployment to its ReplicaSets (by name, creating
+one when there is none) and gives each ReplicaSet its Pods, with owner
+references and revision annotations (see workload_graph.py).
+
+    python fake_apiserver.py --inventory k8s_inventory.json \\
+        --script events.json --kubeconfig /tmp/fake-kubeconfig.yaml
+    KUBECONFIG=/tmp/fake-kubeconfig.yaml INVENTORY_MODE=informer python app.py
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from synthetic_cluster import generate_cluster
+
+# path -> (resource, list kind, apiVersion, object kind)
+RESOURCES = {
+    '/apis/apps/v1/deployments': ('deployments', 'DeploymentList', 'apps/v1', 'Deployment'),
+    '/apis/apps/v1/replicasets': ('replicasets', 'ReplicaSetList', 'apps/v1', 'ReplicaSet'),
+    '/apis/apps/v1/statefulsets': ('statefulsets', 'StatefulSetList', 'apps/v1', 'StatefulSet'),
+    '/api/v1/nodes': ('nodes', 'NodeList', 'v1', 'Node'),
+    '/api/v1/pods': ('pods', 'PodList', 'v1', 'Pod'),
+    '/api/v1/namespaces': ('namespaces', 'NamespaceList', 'v1', 'Namespace'),
+}
+
+# /apis/apps/v1/namespaces/<namespace>/deployments -> /apis/apps/v1/deployments
+NAMESPACED_PATH = re.compile(r'^(?P<prefix>/apis?/.+?)/namespaces/(?P<namespace>[^/]+)/(?P<resource>[^/]+)$')
+
+
+def _timestamp(value):
+    # Inventory files store isoformat() timestamps, the API server uses RFC 3339
+    if value and value.endswith('+00:00'):
+        return value[:-len('+00:00')] + 'Z'
+    return value
+
+
+def _pod_spec_fields(record):
+    # selector and template are required by newer (validating) client models
+    labels = record.get('labels') or {'app': record['name']}
+    return {
+        'selector': {'matchLabels': labels},
+        'template': {
+            'metadata': {'labels': labels},
+            'spec': {'containers': [{'name': record['name'], 'image': 'registry.local/app:latest'}]},
+        },
+    }
+
+
+def deployment_object(record):
+    return {
+        'metadata': {
+            'name': record['name'],
+            'namespace': record['namespace'],
+            'labels': record.get('labels'),
+            'creationTimestamp': _timestamp(record.get('creation_timestamp')),
+        },
+        'spec': {'replicas': record.get('replicas'), **_pod_spec_fields(record)},
+        'status': {'replicas': record.get('replicas') or 0, 'availableReplicas': record.get('available_replicas')},
+    }
+
+
+def statefulset_object(record):
+    return {
+        'metadata': {
+            'name': record['name'],
+            'namespace': record['namespace'],
+            'labels': record.get('labels'),
+            'creationTimestamp': _timestamp(record.get('creation_timestamp')),
+        },
+        'spec': {'replicas': record.get('replicas'), 'serviceName': record['name'], **_pod_spec_fields(record)},
+        'status': {'replicas': record.get('replicas'), 'readyReplicas': record.get('available_replicas')},
+    }
+
+
+def node_object(record):
+    # The CLI stores node conditions under "status", the web app under "conditions"
+    conditions = record.get('conditions') or record.get('status') or []
+    return {
+        'metadata': {
+            'name': record['name'],
+            'labels': record.get('labels'),
+            'annotations': record.get('annotations'),
+            'creationTimestamp': _timestamp(record.get('creation_timestamp')),
+        },
+        'status': {
+            'capacity': record.get('capacity'),
+            'allocatable': record.get('allocatable'),
+            'conditions': [
+                {
+                    'type': c.get('type'),
+                    'status': c.get('status'),
+                    'reason': c.get('reason'),
+                    'message': c.get('message'),
+                    'lastHeartbeatTime': _timestamp(c.get('last_heartbeat_time')),
+                    'lastTransitionTime': _timestamp(c.get('last_transition_time')),
+                }
+                for c in conditions
+            ],
+        },
+    }
+
+
+OBJECT_BUILDERS = {
+    'deployments': deployment_object,
+    'replicasets': deployment_object,
+    'statefulsets': statefulset_object,
+    'nodes': node_object,
+}
+
+
+def _parse_selector(selector):
+    # Only equality requirements (a=b, a==b, a!=b) are supported
+    requirements = []
+    for term in filter(None, (t.strip() for t in (selector or '').split(','))):
+        if '!=' in term:
+            key, value = term.split('!=', 1)
+            requirements.append((key.strip(), value.strip(), False))
+        else:
+            key, value = term.replace('==', '=').split('=', 1)
+            requirements.append((key.strip(), value.strip(), True))
+    return requirements
+
+
+def matches(obj, label_selector=None, field_selector=None):
+    metadata = obj.get('metadata', {})
+    labels = metadata.get('labels') or {}
+    for key, value, equal in _parse_selector(label_selector):
+        if (labels.get(key) == value) != equal:
+            return False
+    fields = {'metadata.name': metadata.get('name'), 'metadata.namespace': metadata.get('namespace')}
+    for key, value, equal in _parse_selector(field_selector):
+        if (fields.get(key) == value) != equal:
+            return False
+    return True
+
+
+def _owner_reference(api_version, kind, owner):
+    return {
+        'apiVersion': api_version,
+        'kind': kind,
+        'name': owner['metadata']['name'],
+        'uid': owner['metadata']['uid'],
+        'controller': True,
+        'blockOwnerDeletion': True,
+    }
+
+
+class FakeCluster:
+    def __init__(self, latency=0.0, forbid_cluster_wide=()):
+        # Seconds added to every list request, to mimic a remote API server
+        self.latency = latency
+        # Resources whose cluster-wide list answers 403, to mimic restricted RBAC
+        self.forbid_cluster_wide = set(forbid_cluster_wide)
+        self._cond = threading.Condition()
+        self.resource_version = 1
+        self.objects = {resource: {} for resource, _, _, _ in RESOURCES.values()}
+        self.events = {resource: [] for resource in self.objects}
+        self.compacted = 0
+        # Sorted object keys per resource, rebuilt after a change: paginating a
+        # large list must not sort it again for every page
+        self._sorted_keys = {}
+
+    def load_inventory(self, inventory):
+        for resource, build in OBJECT_BUILDERS.items():
+            for record in inventory.get(resource, []):
+                self.apply(resource, 'ADDED', build(record))
+
+    def apply(self, resource, event_type, obj):
+        with self._cond:
+            self._store(resource, event_type, obj)
+            self.events[resource].append((self.resource_version, event_type, obj))
+            self._cond.notify_all()
+
+    def update(self, resource, obj):
+        """
+        Store ``obj`` without a watch event, as if the event had been lost:
+        watches only see the change after they relist, e.g. after compact().
+        """
+        with self._cond:
+            self._store(resource, 'MODIFIED', obj)
+
+    def _store(self, resource, event_type, obj):
+        # Called with self._cond held
+        self.resource_version += 1
+        metadata = obj.setdefault('metadata', {})
+        metadata['resourceVersion'] = str(self.resource_version)
+        if not metadata.get('creationTimestamp'):
+            metadata['creationTimestamp'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        key = (metadata.get('namespace'), metadata['name'])
+        metadata.setdefault('uid', str(uuid.uuid5(uuid.NAMESPACE_URL, f"{resource}/{key[0]}/{key[1]}")))
+        if key[0] and (None, key[0]) not in self.objects['namespaces']:
+            self.objects['namespaces'][(None, key[0])] = {
+                'metadata': {'name': key[0], 'resourceVersion': str(self.resource_version)}
+            }
+        if event_type == 'DELETED':
+            self.objects[resource].pop(key, None)
+        else:
+            self.objects[resource][key] = obj
+        self._sorted_keys.pop(resource, None)
+
+    def link_workloads(self):
+        """
+        Give every Deployment its ReplicaSets and every ReplicaSet with
+        replicas its Pods, as the Deployment controller would. Existing
+        ReplicaSets "<deployment>-<hash>" are adopted; the newest one is the
+        current revision.
+        """
+        with self._cond:
+            deployments = dict(self.objects['deployments'])
+            replicasets = dict(self.objects['replicasets'])
+        owned = {}
+        for (namespace, name), rs in replicasets.items():
+            owner = name.rsplit('-', 1)[0]
+            if (namespace, owner) in deployments:
+                owned.setdefault((namespace, owner), []).append(rs)
+
+        for key, deployment in deployments.items():
+            rs_list = owned.get(key)
+            if not rs_list:
+                rs_list = [self._new_replicaset(deployment)]
+            rs_list.sort(key=lambda rs: rs['metadata'].get('creationTimestamp') or '')
+            for revision, rs in enumerate(rs_list, 1):
+                rs['metadata']['ownerReferences'] = [_owner_reference('apps/v1', 'Deployment', deployment)]
+                rs['metadata'].setdefault('annotations', {})['deployment.kubernetes.io/revision'] = str(revision)
+                self.apply('replicasets', 'MODIFIED' if rs['metadata'].get('uid') else 'ADDED', rs)
+                self._add_pods(rs)
+            deployment['metadata'].setdefault('annotations', {})['deployment.kubernetes.io/revision'] = str(len(rs_list))
+            self.apply('deployments', 'MODIFIED', deployment)
+
+    @staticmethod
+    def _new_replicaset(deployment):
+        metadata = deployment['metadata']
+        template_hash = hashlib.sha1(metadata['name'].encode()).hexdigest()[:10]
+        return {
+            'metadata': {
+                'name': f"{metadata['name']}-{template_hash}",
+                'namespace': metadata['namespace'],
+                'labels': {**(metadata.get('labels') or {}), 'pod-template-hash': template_hash},
+                'creationTimestamp': metadata.get('creationTimestamp'),
+            },
+            'spec': {'replicas': deployment['spec'].get('replicas')},
+            'status': {
+                'replicas': deployment['status'].get('replicas'),
+                'readyReplicas': deployment['status'].get('availableReplicas'),
+                'availableReplicas': deployment['status'].get('availableReplicas'),
+            },
+        }
+
+    def _add_pods(self, rs):
+        # Available replicas are Running pods, the others Pending
+        metadata = rs['metadata']
+        available = rs['status'].get('availableReplicas') or 0
+        for index in range(rs['spec'].get('replicas') or 0):
+            suffix = hashlib.sha1(f"{metadata['name']}/{index}".encode()).hexdigest()[:5]
+            self.apply('pods', 'ADDED', {
+                'metadata': {
+                    'name': f"{metadata['name']}-{suffix}",
+                    'namespace': metadata['namespace'],
+                    'labels': metadata.get('labels'),
+                    'creationTimestamp': metadata.get('creationTimestamp'),
+                    'ownerReferences': [_owner_reference('apps/v1', 'ReplicaSet', rs)],
+                },
+                'spec': {'containers': [{'name': 'app', 'image': 'registry.local/app:latest'}]},
+                'status': {'phase': 'Running' if index < available else 'Pending'},
+            })
+
+    def compact(self):
+        with self._cond:
+            self.compacted = self.resource_version
+            for events in self.events.values():
+                events.clear()
+            self._cond.notify_all()
+
+    def list(self, resource, namespace=None, label_selector=None, field_selector=None):
+        with self._cond:
+            objects = self.objects[resource]
+            keys = self._sorted_keys.get(resource)
+            if keys is None:
+                keys = self._sorted_keys[resource] = sorted(objects, key=str)
+            if namespace is not None:
+                keys = [key for key in keys if key[0] == namespace]
+            items = [objects[key] for key in keys]
+            if label_selector or field_selector:
+                items = [obj for obj in items if matches(obj, label_selector, field_selector)]
+            return items, str(self.resource_version)
+
+    def wait_events(self, resource, since, timeout, namespace=None):
+        """Return events newer than ``since``, or None if ``since`` was compacted."""
+        def newer():
+            return [
+                e for e in self.events[resource]
+                if e[0] > since and (namespace is None or e[2]['metadata'].get('namespace') == namespace)
+            ]
+
+        with self._cond:
+            if since < self.compacted:
+                return None
+            events = newer()
+            if not events and timeout > 0:
+                self._cond.wait(timeout)
+                if since < self.compacted:
+                    return None
+                events = newer()
+            return events
+
+    def play(self, script):
+        for step in script:
+            time.sleep(step.get('delay', 0))
+            if step['type'] == 'COMPACT':
+                self.compact()
+            else:
+                self.apply(step['resource'], step['type'], step['object'])
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    cluster = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path, namespace = url.path, None
+        match = NAMESPACED_PATH.match(path)
+        if match:
+            path = f"{match.group('prefix')}/{match.group('resource')}"
+            namespace = match.group('namespace')
+
+        spec = RESOURCES.get(path)
+        if spec is None:
+            self._send_json(404, {'kind': 'Status', 'status': 'Failure', 'reason': 'NotFound', 'code': 404})
+            return
+        if namespace is None and spec[0] in self.cluster.forbid_cluster_wide:
+            self._send_json(403, {'kind': 'Status', 'status': 'Failure', 'reason': 'Forbidden', 'code': 403})
+            return
+        if query.get('watch') in ('true', '1'):
+            self._watch(spec, query, namespace)
+        else:
+            self._list(spec, query, namespace)
+
+    def _list(self, spec, query, namespace=None):
+        resource, list_kind, api_version, kind = spec
+        if self.cluster.latency:
+            time.sleep(self.cluster.latency)
+        items, resource_version = self.cluster.list(
+            resource, namespace, query.get('labelSelector'), query.get('fieldSelector')
+        )
+        metadata = {'resourceVersion': resource_version}
+
+        # Continue tokens are plain offsets into the list
+        offset = int(query.get('continue') or 0)
+        limit = int(query.get('limit') or 0)
+        if offset or limit:
+            end = offset + limit if limit else len(items)
+            if end < len(items):
+                metadata['continue'] = str(end)
+                metadata['remainingItemCount'] = len(items) - end
+            items = items[offset:end]
+
+        if 'as=PartialObjectMetadataList' in (self.headers.get('Accept') or ''):
+            self._send_json(200, {
+                'kind': 'PartialObjectMetadataList',
+                'apiVersion': 'meta.k8s.io/v1',
+                'metadata': metadata,
+                'items': [
+                    {'kind': 'PartialObjectMetadata', 'apiVersion': 'meta.k8s.io/v1', 'metadata': obj['metadata']}
+                    for obj in items
+                ],
+            })
+            return
+
+        self._send_json(200, {
+            'kind': list_kind,
+            'apiVersion': api_version,
+            'metadata': metadata,
+            'items': items,
+        })
+
+    def _watch(self, spec, query, namespace=None):
+        resource, _, api_version, kind = spec
+        since = int(query.get('resourceVersion') or 0)
+        deadline = time.monotonic() + int(query.get('timeoutSeconds') or 60)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            events = self.cluster.wait_events(resource, since, remaining, namespace)
+            if events is None:
+                self._send_chunk({'type': 'ERROR', 'object': {
+                    'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure',
+                    'message': f'too old resource version: {since}', 'reason': 'Expired', 'code': 410,
+                }})
+                break
+            for resource_version, event_type, obj in events:
+                self._send_chunk({'type': event_type, 'object': {'kind': kind, 'apiVersion': api_version, **obj}})
+                since = resource_version
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _send_chunk(self, event):
+        data = json.dumps(event).encode() + b'\n'
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def write_kubeconfig(path, server, context='fake'):
+    # JSON is valid YAML, so the kubernetes client can read it as a kubeconfig
+    kubeconfig = {
+        'apiVersion': 'v1',
+        'kind': 'Config',
+        'clusters': [{'name': context, 'cluster': {'server': server}}],
+        'users': [{'name': context, 'user': {'token': 'fake'}}],
+        'contexts': [{'name': context, 'context': {'cluster': context, 'user': context}}],
+        'current-context': context,
+    }
+    with open(path, 'w') as f:
+        json.dump(kubeconfig, f, indent=2)
+
+
+def serve(cluster, host='127.0.0.1', port=0):
+    """Start the server in a background thread and return it."""
+    handler = type('BoundFakeApiHandler', (FakeApiHandler,), {'cluster': cluster})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Kubernetes API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--inventory', help="inventory JSON used to seed the objects")
+    parser.add_argument('--synthetic', metavar='SIZE',
+                        help="seed a synthetic cluster of SIZE objects (1k, 10k, 100k or a number)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of --synthetic")
+    parser.add_argument('--workload-tree', action='store_true',
+                        help="link Deployments, ReplicaSets and generated Pods with owner references")
+    parser.add_argument('--script', help="JSON list of timed events to replay")
+    parser.add_argument('--kubeconfig', help="write a kubeconfig pointing at this server")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every list request")
+    parser.add_argument('--forbid-cluster-wide', nargs='*', default=[], metavar='RESOURCE',
+                        help="resources whose cluster-wide list answers 403 Forbidden")
+    args = parser.parse_args()
+
+    cluster = FakeCluster(latency=args.latency, forbid_cluster_wide=args.forbid_cluster_wide)
+    if args.inventory:
+        with open(args.inventory) as f:
+            cluster.load_inventory(json.load(f))
+    if args.synthetic:
+        cluster.load_inventory(generate_cluster(args.synthetic, seed=args.seed))
+    if args.workload_tree:
+        cluster.link_workloads()
+
+    server = serve(cluster, args.host, args.port)
+    address = f"http://{args.host}:{server.server_address[1]}"
+    if args.kubeconfig:
+        write_kubeconfig(args.kubeconfig, address)
+    print(f"Fake API server listening on {address}", flush=True)
+
+    if args.script:
+        with open(args.script) as f:
+            cluster.play(json.load(f))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
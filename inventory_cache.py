@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class _CacheEntry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class InventoryCache:
+    """
+    In-process cache for inventories, keyed by Kubernetes context.
+
+    Entries younger than ``ttl`` seconds are returned as they are. Entries older
+    than ``ttl`` but younger than ``ttl + stale_ttl`` are returned immediately
+    while a background thread reloads them (stale-while-revalidate). Anything
+    older is reloaded synchronously. At most ``max_entries`` keys are kept and
+    the least recently used one is evicted first.
+    """
+
+    def __init__(self, loader, ttl=60, stale_ttl=300, max_entries=16):
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._refreshing = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return ``(value, age_seconds)`` for ``key``, loading it if needed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = time.monotonic() - entry.fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return entry.value, age
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._schedule_refresh(key)
+                    return entry.value, age
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given key; the others wait and reuse its result
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    age = time.monotonic() - entry.fetched_at
+                    if age < self.ttl:
+                        return entry.value, age
+            try:
+                value = self._loader(key)
+            except BaseException:
+                # Keys that fail to load (unknown contexts, bad selectors) keep
+                # no lock behind; threads already waiting on it still load
+                with self._lock:
+                    if key not in self._entries and self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+                raise
+            self._store(key, value)
+        return value, 0.0
+
+    def peek(self, key):
+        """Return ``(value, age_seconds)`` if ``key`` is cached and fresh, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry.fetched_at
+            if age >= self.ttl:
+                return None
+            self.hits += 1
+            return entry.value, age
+
+    def invalidate(self, key=None):
+        """Drop ``key`` from the cache, or every entry when ``key`` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._load_locks.pop(evicted, None)
+                logging.debug(f"Inventory cache evicted {evicted!r}")
+
+    def _schedule_refresh(self, key):
+        # Called with self._lock held
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        thread = threading.Thread(target=self._refresh, args=(key,), daemon=True)
+        thread.start()
+
+    def _refresh(self, key):
+        try:
+            value = self._loader(key)
+            self._store(key, value)
+            logging.debug(f"Inventory cache refreshed {key!r}")
+        except Exception as e:
+            # Keep serving the stale entry; the next request past the stale
+            # window will reload synchronously and surface the error.
+            logging.error(f"Background refresh failed for {key!r}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+class DerivedViews:
+    """
+    Values derived from inventories (a projection, an index), kept per key and
+    rebuilt by ``build(inventory)`` only when the cache or informer hands out
+    a different inventory object for that key. At most ``max_entries`` keys
+    are kept, least recently used first out.
+    """
+
+    def __init__(self, build, max_entries=16):
+        self._build = build
+        self.max_entries = max_entries
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, inventory):
+        with self._lock:
+            entry = self._views.get(key)
+            if entry is not None and entry[0] is inventory:
+                self._views.move_to_end(key)
+                return entry[1]
+        view = self._build(inventory)
+        with self._lock:
+            self._views[key] = (inventory, view)
+            self._views.move_to_end(key)
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+        return view
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+"""
+Differences between two inventories.
+
+The old side is indexed by (kind, namespace, name), keeping only the fields
+that are compared; the new side is streamed against that index, so the diff is
+linear in the number of objects and the new side is never held in memory.
+Inventories can be dicts of record lists, iterables of ``(kind, record)``, or
+files: the JSON written by the CLI and /data, or the NDJSON/array streams of
+records tagged with "kind".
+"""
+
+import itertools
+import json
+
+DIFF_KINDS = ("deployments", "statefulsets", "nodes")
+
+# Fields compared between the two sides; labels and conditions are compared
+# key by key, the others as plain values
+SCALAR_FIELDS = ("replicas", "available_replicas", "creation_timestamp")
+
+READ_SIZE = 64 * 1024
+
+
+def _conditions(record):
+    # The web app keeps node conditions under "conditions", the CLI under "status"
+    conditions = record.get('conditions')
+    if conditions is None and isinstance(record.get('status'), list):
+        conditions = record['status']
+    return {c.get('type'): c.get('status') for c in conditions or []}
+
+
+def _fingerprint(record):
+    # The API omits availableReplicas when it is 0; the CLI keeps the None
+    values = tuple(
+        record.get(field) or 0 if field == 'available_replicas' else record.get(field)
+        for field in SCALAR_FIELDS
+    )
+    return (
+        values,
+        record.get('labels') or {},
+        _conditions(record)
+    )
+
+
+def _mapping_changes(old, new):
+    changes = {}
+    added = {key: value for key, value in new.items() if key not in old}
+    removed = {key: value for key, value in old.items() if key not in new}
+    changed = {key: [old[key], value] for key, value in new.items() if key in old and old[key] != value}
+    if added:
+        changes["added"] = added
+    if removed:
+        changes["removed"] = removed
+    if changed:
+        changes["changed"] = changed
+    return changes
+
+
+def compare(old, new):
+    """Field-level changes between two fingerprints; empty if they are equal."""
+    if old == new:
+        return {}
+    changes = {}
+    for field, old_value, new_value in zip(SCALAR_FIELDS, old[0], new[0]):
+        if old_value != new_value:
+            changes[field] = [old_value, new_value]
+    for field, old_value, new_value in (("labels", old[1], new[1]), ("conditions", old[2], new[2])):
+        field_changes = _mapping_changes(old_value, new_value)
+        if field_changes:
+            changes[field] = field_changes
+    return changes
+
+
+def iter_json_inventory(f):
+    """
+    Yield ``(kind, record)`` from a JSON inventory file (an object of record
+    arrays) read incrementally, without loading the whole document. Values
+    that are not arrays, such as "errors", are skipped.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = f.read(READ_SIZE)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def next_char():
+        # Skip whitespace and return the next significant character
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                raise ValueError("Unexpected end of JSON inventory")
+            fill()
+
+    def expect(char):
+        nonlocal position
+        if next_char() != char:
+            raise ValueError(f"Expected {char!r} at offset {position} of JSON inventory")
+        position += 1
+
+    def value():
+        nonlocal position
+        next_char()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # A number may continue in the next chunk
+                fill()
+                continue
+            position = end
+            return result
+
+    expect('{')
+    if next_char() == '}':
+        return
+    while True:
+        key = value()
+        expect(':')
+        if next_char() == '[':
+            position += 1
+            if next_char() == ']':
+                position += 1
+            else:
+                while True:
+                    record = value()
+                    if isinstance(record, dict):
+                        yield key, record
+                    if next_char() == ',':
+                        position += 1
+                        continue
+                    expect(']')
+                    break
+        else:
+            value()
+        if next_char() == ',':
+            position += 1
+            continue
+        expect('}')
+        return
+
+
+def iter_tagged_records(f):
+    """Yield ``(kind, record)`` from NDJSON or a JSON array of records tagged with "kind"."""
+    first = f.read(1)
+    while first and first in ' \t\r\n':
+        first = f.read(1)
+    if first == '[':
+        # Array stream written by the CLI: one record per line
+        for line in f:
+            line = line.strip().rstrip(',')
+            if line and line != ']':
+                record = json.loads(line)
+                yield record.pop('kind'), record
+        return
+    for line in itertools.chain([first + f.readline()], f):
+        if line.strip():
+            record = json.loads(line)
+            yield record.pop('kind'), record
+
+
+def iter_inventory_file(path):
+    """Yield ``(kind, record)`` from any inventory file written by the CLI or /data."""
+    with open(path) as f:
+        head = f.read(4096)
+        f.seek(0)
+        stripped = head.lstrip()
+        # Tagged records start with their "kind" (see inventory_stream)
+        if stripped.startswith('{') and not stripped.startswith('{"kind"'):
+            yield from iter_json_inventory(f)
+        else:
+            yield from iter_tagged_records(f)
+
+
+def iter_records(source, kinds=DIFF_KINDS):
+    """Yield ``(kind, record)`` of ``kinds`` from a dict inventory, a file path or an iterable."""
+    if isinstance(source, str):
+        records = iter_inventory_file(source)
+    elif isinstance(source, dict):
+        records = ((kind, record) for kind in kinds for record in source.get(kind) or [])
+    else:
+        records = source
+    for kind, record in records:
+        if kind in kinds:
+            yield kind, record
+
+
+def _key(kind, record):
+    # Multi-cluster inventories tag every record with its cluster
+    return record.get('cluster') or '', kind, record.get('namespace') or '', record.get('name')
+
+
+def _entry(change, key, **extra):
+    entry = {"change": change, "kind": key[1], "namespace": key[2] or None, "name": key[3], **extra}
+    if key[0]:
+        entry["cluster"] = key[0]
+    return entry
+
+
+def iter_diff(old, new, kinds=DIFF_KINDS):
+    """
+    Yield one entry per added, removed or changed object. Added and changed
+    objects are reported while ``new`` is streamed, removed ones at the end.
+    """
+    index = {_key(kind, record): _fingerprint(record) for kind, record in iter_records(old, kinds)}
+    for kind, record in iter_records(new, kinds):
+        key = _key(kind, record)
+        old_fingerprint = index.pop(key, None)
+        if old_fingerprint is None:
+            yield _entry("added", key)
+            continue
+        changes = compare(old_fingerprint, _fingerprint(record))
+        if changes:
+            yield _entry("changed", key, changes=changes)
+    for key in index:
+        yield _entry("removed", key)
+
+
+def diff_inventories(old, new, kinds=DIFF_KINDS):
+    """Return ``{"summary", "added", "removed", "changed"}`` for two inventories."""
+    result = {"added": [], "removed": [], "changed": []}
+    for entry in iter_diff(old, new, kinds):
+        result[entry["change"]].append(entry)
+    result = {"summary": {change: len(entries) for change, entries in result.items()}, **result}
+    return result
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+CSV and XLSX exports of an inventory, using the report column definitions
+(``headers`` and ``keys`` per resource, as in the PDF report).
+"""
+
+import csv
+import io
+import os
+import tempfile
+
+from inventory_stream import CHUNK_SIZE
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx")
+}
+
+RESOURCE_NAMES = {
+    "deployments": "Deployment",
+    "statefulsets": "StatefulSet",
+    "nodes": "Node"
+}
+
+
+def flatten_value(record, key):
+    """Cell value for ``record[key]``: mappings and conditions become one string."""
+    value = record.get(key)
+    if key == 'status' and value is None and 'conditions' in record:
+        # Node records only carry their conditions; the status is the Ready one
+        value = next((c.get('status') for c in record['conditions'] or [] if c.get('type') == 'Ready'), 'Unknown')
+    if value is None:
+        return ''
+    if key == 'conditions':
+        return '; '.join(f"{c.get('type')}={c.get('status')}" for c in value)
+    if isinstance(value, dict):
+        return '; '.join(f"{k}={v}" for k, v in value.items())
+    return value
+
+
+def _sections(inventory):
+    # Resources with at least one object; every resource if there are none,
+    # so an empty export still has its column headers
+    return [resource for resource, items in inventory.items() if items] or list(inventory)
+
+
+def _csv_columns(inventory, headers, keys):
+    # One table for every resource: a resource column, then the union of the
+    # report columns in order of first appearance
+    columns = {}
+    for resource in _sections(inventory):
+        for header, key in zip(headers[resource], keys[resource]):
+            columns.setdefault(key, header)
+    return list(columns), list(columns.values())
+
+
+def iter_csv(inventory, headers, keys):
+    """Yield the inventory as CSV text chunks, one row per resource object."""
+    column_keys, column_headers = _csv_columns(inventory, headers, keys)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Resource Type"] + column_headers)
+    for resource in _sections(inventory):
+        resource_name = RESOURCE_NAMES.get(resource, resource)
+        own_keys = set(keys[resource])
+        for item in inventory[resource] or []:
+            writer.writerow([resource_name] + [flatten_value(item, key) if key in own_keys else ''
+                                               for key in column_keys])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_xlsx(inventory, headers, keys):
+    """
+    Return an iterator over an XLSX workbook with one sheet per resource, in
+    byte chunks. Raises ImportError right away if xlsxwriter is missing.
+
+    xlsxwriter runs in constant_memory mode, flushing every row to disk as it
+    is written; the finished file is then streamed and removed.
+    """
+    import xlsxwriter
+    return _xlsx_chunks(xlsxwriter, inventory, headers, keys)
+
+
+def _xlsx_chunks(xlsxwriter, inventory, headers, keys):
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": os.path.dirname(path)})
+        bold = workbook.add_format({"bold": True})
+        for resource in _sections(inventory):
+            sheet = workbook.add_worksheet(RESOURCE_NAMES.get(resource, resource))
+            sheet.write_row(0, 0, headers[resource], bold)
+            for row, item in enumerate(inventory[resource] or [], start=1):
+                sheet.write_row(row, 0, [flatten_value(item, key) for key in keys[resource]])
+        workbook.close()
+
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""
+Compact, read-only inventory records.
+
+A record behaves like the dict it replaces (``record['name']``,
+``record.get('labels')``, ``{**record}``, iteration in the JSON field order)
+but stores its fields in ``__slots__``:
+
+- strings such as names of namespaces are interned, so every record of a
+  namespace points at the same string;
+- mappings (labels, annotations, capacity) are stored as one tuple
+  ``(keys, value, value, ...)`` whose key tuple is shared by every mapping
+  with the same keys, with interned values;
+- lists of mappings (node conditions) as a tuple of such tuples.
+
+Mappings are rebuilt as dicts when a field is read: a new dict on every read,
+so that callers can never change a record, and a few times slower than
+reading a dict. Records are built once per load and read by a few filters and
+serializers, so this is traded for holding the inventory in a third of the
+memory for as long as it is cached. ``to_dict()`` and ``json_default`` turn
+records back into the current JSON shape.
+"""
+
+import sys
+from collections.abc import Mapping
+
+STRING = "string"
+RAW = "raw"
+MAP = "map"
+MAP_LIST = "map_list"
+
+# Shared key tuples, by key tuple. Every distinct set of label or annotation
+# keys adds an entry, so the table is cleared when it reaches
+# MAX_KEY_TUPLES: records keep the tuples they hold, and the following loads
+# share their keys again.
+MAX_KEY_TUPLES = 65536
+_key_tuples = {}
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _intern_all(values):
+    try:
+        return tuple(map(sys.intern, values))
+    except TypeError:
+        # Not only strings (e.g. a condition without a reason)
+        return tuple(map(_intern, values))
+
+
+def pack_mapping(mapping):
+    if mapping is None:
+        return None
+    keys = tuple(mapping)
+    shared = _key_tuples.get(keys)
+    if shared is None:
+        if len(_key_tuples) >= MAX_KEY_TUPLES:
+            _key_tuples.clear()
+        shared = _intern_all(keys)
+        _key_tuples[shared] = shared
+    return (shared,) + _intern_all(mapping.values())
+
+
+def unpack_mapping(packed):
+    if packed is None:
+        return None
+    return dict(zip(packed[0], packed[1:]))
+
+
+_PACK = {
+    STRING: _intern,
+    RAW: None,
+    MAP: pack_mapping,
+    MAP_LIST: lambda items: None if items is None else tuple(pack_mapping(item) for item in items)
+}
+
+_UNPACK = {
+    STRING: None,
+    RAW: None,
+    MAP: unpack_mapping,
+    MAP_LIST: lambda packed: None if packed is None else [unpack_mapping(item) for item in packed]
+}
+
+
+class InventoryRecord(Mapping):
+    """Base class of the record types created by ``record_type``."""
+
+    __slots__ = ()
+    FIELDS = {}
+
+    _packers = ()
+    _unpackers = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._packers = tuple((field, _PACK[encoding]) for field, encoding in cls.FIELDS.items())
+        cls._unpackers = tuple((field, _UNPACK[encoding]) for field, encoding in cls.FIELDS.items())
+
+    def __init__(self, *args, **values):
+        values.update(zip(self.FIELDS, args))
+        self._fill(values)
+
+    def _fill(self, values):
+        setattr_ = object.__setattr__
+        for field, pack in self._packers:
+            value = values.get(field)
+            setattr_(self, field, value if pack is None else pack(value))
+
+    @classmethod
+    def from_dict(cls, record):
+        self = cls.__new__(cls)
+        self._fill(record)
+        return self
+
+    def __getitem__(self, key):
+        try:
+            encoding = self.FIELDS[key]
+        except KeyError:
+            raise KeyError(key) from None
+        value = object.__getattribute__(self, key)
+        unpack = _UNPACK[encoding]
+        return value if unpack is None else unpack(value)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __reduce__(self):
+        return type(self).from_dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        getattr_ = object.__getattribute__
+        return {
+            field: getattr_(self, field) if unpack is None else unpack(getattr_(self, field))
+            for field, unpack in self._unpackers
+        }
+
+
+def record_type(name, fields):
+    """
+    Create a record class with the ordered ``fields`` (name -> STRING, RAW,
+    MAP or MAP_LIST); it must be bound to ``name`` at module level so that
+    records can be pickled.
+    """
+    return type(name, (InventoryRecord,), {"__slots__": tuple(fields), "FIELDS": dict(fields), "__module__": __name__})
+
+
+class ClusterRecord(Mapping):
+    """
+    A record of a multi-cluster inventory: the record of a member cluster
+    with a "cluster" field after its own, read through without copying it.
+    """
+
+    __slots__ = ("record", "cluster")
+
+    def __init__(self, record, cluster):
+        object.__setattr__(self, "record", record)
+        object.__setattr__(self, "cluster", cluster)
+
+    def __getitem__(self, key):
+        if key == "cluster":
+            return self.cluster
+        return self.record[key]
+
+    def __iter__(self):
+        yield from self.record
+        yield "cluster"
+
+    def __len__(self):
+        return len(self.record) + 1
+
+    def __contains__(self, key):
+        return key == "cluster" or key in self.record
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __reduce__(self):
+        return type(self), (self.record, self.cluster)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {**self.record, "cluster": self.cluster}
+
+
+def json_default(value):
+    """``default`` for json.dumps: records are written as their dicts."""
+    if isinstance(value, (InventoryRecord, ClusterRecord)):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Records built by the web app (app.py)
+WorkloadRecord = record_type("WorkloadRecord", {
+    "name": RAW,
+    "namespace": STRING,
+    "replicas": RAW,
+    "available_replicas": RAW,
+    "creation_timestamp": RAW,
+    "labels": MAP
+})
+
+NodeRecord = record_type("NodeRecord", {
+    "name": RAW,
+    "labels": MAP,
+    "annotations": MAP,
+    "conditions": MAP_LIST,
+    "capacity": MAP,
+    "allocatable": MAP,
+    "creation_timestamp": RAW
+})
+
+# Metadata-only records of the web app (/data?fields=metadata)
+WorkloadMetadataRecord = record_type("WorkloadMetadataRecord", {
+    "name": RAW,
+    "namespace": STRING,
+    "creation_timestamp": RAW,
+    "labels": MAP
+})
+
+NodeMetadataRecord = record_type("NodeMetadataRecord", {
+    "name": RAW,
+    "labels": MAP,
+    "annotations": MAP,
+    "creation_timestamp": RAW
+})
+
+# Records built by the CLI (k8s_inventory.py), in the field order of its JSON file
+CliWorkloadRecord = record_type("CliWorkloadRecord", {
+    "name": RAW,
+    "namespace": STRING,
+    "replicas": RAW,
+    "available_replicas": RAW,
+    "labels": MAP,
+    "creation_timestamp": RAW
+})
+
+CliNodeRecord = record_type("CliNodeRecord", {
+    "name": RAW,
+    "labels": MAP,
+    "annotations": MAP,
+    "status": MAP_LIST,
+    "capacity": MAP,
+    "allocatable": MAP,
+    "creation_timestamp": RAW
+})
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import threading
+
+STREAM_FORMATS = ("ndjson", "array")
+
+# Records are grouped into chunks of about this many bytes before being
+# written or yielded, to avoid one tiny write per record
+CHUNK_SIZE = 64 * 1024
+
+
+def _batched(parts, size=CHUNK_SIZE):
+    buffer = []
+    buffered = 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_ndjson(inventory, kinds, default=None):
+    """Yield one JSON line per record, tagged with its inventory kind."""
+    def parts():
+        for kind in kinds:
+            for record in inventory.get(kind) or []:
+                yield json.dumps({"kind": kind, **record}, default=default) + '\n'
+    return _batched(parts())
+
+
+def iter_json(inventory, kinds, extra=None, default=None):
+    """
+    Yield the inventory as a JSON object with one array per kind, followed by
+    the ``extra`` keys; the same document json.dumps() would produce, without
+    building it in memory first.
+    """
+    def parts():
+        yield '{'
+        for position, kind in enumerate(kinds):
+            yield (', ' if position else '') + json.dumps(kind) + ': ['
+            for index, record in enumerate(inventory.get(kind) or []):
+                yield (', ' if index else '') + json.dumps(record, default=default)
+            yield ']'
+        for key, value in (extra or {}).items():
+            yield ', ' + json.dumps(key) + ': ' + json.dumps(value, default=default)
+        yield '}'
+    return _batched(parts())
+
+
+class RecordStreamWriter:
+    """
+    Thread-safe writer of inventory records to a file, as NDJSON or as a JSON
+    array of records tagged with their kind.
+
+    Records are written to a temporary file in the destination directory as
+    they are produced; ``close()`` renames it over ``path`` atomically, so
+    readers never see a partially written inventory. Writes after ``close()``
+    or ``abort()`` raise ValueError.
+    """
+
+    def __init__(self, path, fmt="ndjson", default=None):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        self._default = default
+        self._lock = threading.Lock()
+        self._closed = False
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        self._file = os.fdopen(fd, 'w', buffering=CHUNK_SIZE)
+        if fmt == "array":
+            self._file.write('[\n')
+
+    def write(self, kind, record):
+        line = json.dumps({"kind": kind, **record}, default=self._default)
+        with self._lock:
+            if self._closed:
+                raise ValueError("Write to a closed RecordStreamWriter")
+            if self.fmt == "array":
+                line = (',\n' if self.count else '') + line
+            else:
+                line += '\n'
+            self._file.write(line)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self.fmt == "array":
+                self._file.write('\n]\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.chmod(self._tmp_path, 0o644)  # mkstemp creates files readable only by the owner
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.close()
+            os.unlink(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_json_atomic(path, chunks):
+    """Write an iterable of text chunks to ``path`` through a temporary file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable only by the owner
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
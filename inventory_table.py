@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import threading
+from collections import OrderedDict
+
+# Column order of the inventory table in templates/index.html
+TABLE_COLUMNS = ["resource_type", "name", "namespace", "replicas", "available_replicas", "creation_timestamp", "labels"]
+
+TABLE_KINDS = {
+    "deployments": "Deployment",
+    "statefulsets": "StatefulSet",
+    "nodes": "Node"
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return '-'
+    return ', '.join(f"{key}: {value}" for key, value in labels.items())
+
+
+def _sort_key(value):
+    # Missing values sort first and never get compared with real values
+    return (value is not None, value if value is not None else 0)
+
+
+class InventoryTableView:
+    """
+    Flattened, sortable rows of one inventory for the DataTables server-side
+    protocol.
+
+    Rows and their lower-cased search text are built once per inventory. Sort
+    indexes are built per column on first use, and the last filtered orderings
+    are kept, so paging through a result only slices a list of row indexes.
+    Views are shared by concurrent requests: the kept orderings are guarded by
+    a lock, and two requests missing the same one both compute it.
+    """
+
+    def __init__(self, inventory, max_filtered=32):
+        self.sources = {kind: inventory.get(kind) for kind in TABLE_KINDS}
+        self.rows = []
+        namespaces = set()
+        for kind, resource_type in TABLE_KINDS.items():
+            for item in inventory.get(kind) or []:
+                self.rows.append((
+                    resource_type,
+                    item.get('name'),
+                    item.get('namespace'),
+                    item.get('replicas'),
+                    item.get('available_replicas'),
+                    item.get('creation_timestamp'),
+                    format_labels(item.get('labels'))
+                ))
+                if item.get('namespace'):
+                    namespaces.add(item['namespace'])
+        self.namespaces = sorted(namespaces)
+        self._search_text = [
+            '\t'.join('' if value is None else str(value) for value in row).lower()
+            for row in self.rows
+        ]
+        self._order = {}
+        self._filtered = OrderedDict()
+        self._max_filtered = max_filtered
+        self._lock = threading.Lock()
+
+    def is_view_of(self, inventory):
+        return all(self.sources[kind] is inventory.get(kind) for kind in TABLE_KINDS)
+
+    def _sorted_index(self, column):
+        index = self._order.get(column)
+        if index is None:
+            index = sorted(range(len(self.rows)), key=lambda i: _sort_key(self.rows[i][column]))
+            self._order[column] = index
+        return index
+
+    def _matching(self, column, descending, search, resource_type, namespace):
+        key = (column, descending, search, resource_type, namespace)
+        with self._lock:
+            matching = self._filtered.get(key)
+            if matching is not None:
+                self._filtered.move_to_end(key)
+                return matching
+
+        index = self._sorted_index(column)
+        if descending:
+            index = index[::-1]
+        if search or resource_type or namespace:
+            search = search.lower()
+            rows = self.rows
+            text = self._search_text
+            matching = [
+                i for i in index
+                if (not resource_type or rows[i][0].lower() == resource_type)
+                and (not namespace or rows[i][2] == namespace)
+                and (not search or search in text[i])
+            ]
+        else:
+            matching = index
+
+        with self._lock:
+            self._filtered[key] = matching
+            self._filtered.move_to_end(key)
+            while len(self._filtered) > self._max_filtered:
+                self._filtered.popitem(last=False)
+        return matching
+
+    def query(self, start=0, length=10, order_column=1, descending=False, search='', resource_type='', namespace=''):
+        """Return ``(records_filtered, rows)`` for one page of the table."""
+        if not 0 <= order_column < len(TABLE_COLUMNS):
+            order_column = 1
+        matching = self._matching(order_column, descending, search, resource_type, namespace)
+        if length < 0:  # DataTables sends -1 for "all rows"
+            page = matching[start:]
+        else:
+            page = matching[start:start + length]
+        return len(matching), [self.rows[i] for i in page]
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import threading
+import time
+from kubernetes import client, config
+from urllib3.util import Retry
+
+_deserialize_time = threading.local()
+
+
+class TimedApiClient(client.ApiClient):
+    """``ApiClient`` that adds up, per thread, the time spent turning responses into models."""
+
+    def deserialize(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().deserialize(*args, **kwargs)
+        finally:
+            add_deserialize_seconds(time.perf_counter() - start)
+
+
+def add_deserialize_seconds(seconds):
+    """Count ``seconds`` of decoding done outside the client, e.g. of raw responses."""
+    _deserialize_time.seconds = getattr(_deserialize_time, 'seconds', 0.0) + seconds
+
+
+def take_deserialize_seconds():
+    """Return the deserialization time of this thread since the previous call, and reset it."""
+    seconds = getattr(_deserialize_time, 'seconds', 0.0)
+    _deserialize_time.seconds = 0.0
+    return seconds
+
+
+class ApiClientPool:
+    """
+    One kubernetes ``ApiClient`` per kubeconfig context.
+
+    Every client gets its own ``Configuration`` and therefore its own urllib3
+    connection pool, so requests for different contexts never share the
+    process-global default configuration. Clients are built on first use and
+    reused afterwards. When the kubeconfig file's mtime changes, all clients
+    are dropped and ``generation`` is incremented, so that long-lived users
+    (such as informers) can notice and rebuild theirs. ``contexts()`` lists the
+    kubeconfig's context names, read once per kubeconfig version; clients are
+    only built for those. ``on_build`` is called as ``on_build(context,
+    seconds)`` after a client has been built.
+    """
+
+    def __init__(self, kubeconfig_path, connection_pool_maxsize=8, on_build=None):
+        self.kubeconfig_path = kubeconfig_path
+        self.connection_pool_maxsize = connection_pool_maxsize
+        self._on_build = on_build
+        self.generation = 0
+
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._build_locks = {}
+        self._context_names = None
+        self._mtime = None
+
+    def get(self, context=None):
+        """
+        Return the ApiClient for ``context`` (None means the current context).
+        Raises ``ConfigException`` for a context that is not in the kubeconfig.
+        """
+        # Checked before a build lock is kept for the context, so names taken
+        # from requests cannot grow the pool (contexts() checks for reloads)
+        if context is None:
+            self._check_reload()
+        elif context not in self.contexts():
+            raise config.ConfigException(f"Context {context!r} not found in {self.kubeconfig_path}")
+        with self._lock:
+            api_client = self._clients.get(context)
+            if api_client is not None:
+                return api_client
+            build_lock = self._build_locks.setdefault(context, threading.Lock())
+            generation = self.generation
+
+        # Loading a context may run exec/OIDC auth plugins, so build clients for
+        # different contexts in parallel and only once per context.
+        with build_lock:
+            with self._lock:
+                api_client = self._clients.get(context)
+            if api_client is None:
+                api_client = self._build(context)
+                with self._lock:
+                    # Do not cache a client built from a kubeconfig that has
+                    # been replaced in the meantime
+                    if self.generation == generation:
+                        self._clients[context] = api_client
+        return api_client
+
+    def contexts(self):
+        """
+        Names of the kubeconfig's contexts (empty when it cannot be read),
+        read again when the kubeconfig changes.
+        """
+        self._check_reload()
+        with self._lock:
+            names = self._context_names
+            generation = self.generation
+        if names is None:
+            try:
+                contexts, _ = config.list_kube_config_contexts(config_file=self.kubeconfig_path)
+                names = frozenset(context['name'] for context in contexts)
+            except Exception as e:
+                logging.error(f"Cannot read the contexts of {self.kubeconfig_path}: {e}")
+                names = frozenset()
+            with self._lock:
+                if self.generation == generation:
+                    self._context_names = names
+        return names
+
+    def _build(self, context):
+        start = time.perf_counter()
+        configuration = client.Configuration()
+        config.load_kube_config(
+            config_file=self.kubeconfig_path,
+            context=context,
+            client_configuration=configuration,
+            persist_config=False
+        )
+        configuration.connection_pool_maxsize = self.connection_pool_maxsize
+        # A request that timed out is not sent again: callers bound list calls
+        # with _request_timeout and retrying would multiply that bound
+        configuration.retries = Retry(total=3, read=0)
+        api_client = TimedApiClient(configuration)
+        logging.debug(f"Built ApiClient for context: {context or '(current)'}")
+        if self._on_build is not None:
+            self._on_build(context, time.perf_counter() - start)
+        return api_client
+
+    def _check_reload(self):
+        try:
+            mtime = os.stat(self.kubeconfig_path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if self._mtime is not None:
+                logging.info(f"{self.kubeconfig_path} changed, dropping cached API clients")
+            # Clients still in use by in-flight requests are released once
+            # those requests drop their references.
+            self._clients = {}
+            self._build_locks = {}
+            self._context_names = None
+            self._mtime = mtime
+            self.generation += 1
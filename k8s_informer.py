@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from k8s_paging import DEFAULT_PAGE_SIZE, list_pages
+
+HTTP_GONE = 410
+
+
+class ResourceGone(Exception):
+    """The watch resourceVersion is too old and the kind must be relisted."""
+
+
+def object_key(metadata):
+    return metadata.get('namespace'), metadata.get('name')
+
+
+class ResourceInformer:
+    """
+    Keeps an in-memory copy of one resource kind.
+
+    The kind is listed once, then followed through a ``watch`` stream starting
+    at the list's resourceVersion. ADDED/MODIFIED/DELETED events are applied to
+    the store, keyed by (namespace, name). When the API server answers 410 Gone
+    the informer relists from scratch.
+    """
+
+    def __init__(self, kind, list_fn, transform, watch_timeout=300, retry_delay=5, page_size=DEFAULT_PAGE_SIZE):
+        self.kind = kind
+        self._list_fn = list_fn
+        self._transform = transform
+        self._page_size = page_size
+        self._watch_timeout = watch_timeout
+        self._retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        self._store = {}
+        self._items = []
+        self._items_version = -1
+        self.version = 0
+        self.resource_version = None
+        self.last_sync = None
+        self.synced = threading.Event()
+        self._watch = None
+
+    def items(self):
+        """Return the current records; the list is rebuilt only after changes."""
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        """Return ``(records, resourceVersion)`` taken under the same lock."""
+        with self._lock:
+            if self._items_version != self.version:
+                self._items = list(self._store.values())
+                self._items_version = self.version
+            return self._items, self.resource_version
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                self._list()
+                while not stop_event.is_set():
+                    self._follow(stop_event)
+            except ResourceGone:
+                logging.info(f"Watch for {self.kind} expired (410 Gone), relisting")
+            except ApiException as e:
+                if e.status == HTTP_GONE:
+                    logging.info(f"Watch for {self.kind} expired (410 Gone), relisting")
+                    continue
+                logging.error(f"Kubernetes API Error while watching {self.kind}: {e}")
+                self._failed(e)
+                stop_event.wait(self._retry_delay)
+            except Exception as e:
+                logging.error(f"Error while watching {self.kind}: {e}")
+                self._failed(e)
+                stop_event.wait(self._retry_delay)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.stop()
+
+    def _failed(self, error):
+        """Called when listing or watching failed; the kind is listed again after ``retry_delay``."""
+
+    def _list(self):
+        store = {}
+        resource_version = None
+        for page in list_pages(self._list_fn, self._page_size):
+            for obj in page.items:
+                store[(obj.metadata.namespace, obj.metadata.name)] = self._transform(obj)
+            resource_version = page.metadata.resource_version
+        with self._lock:
+            self._store = store
+            self.version += 1
+            self.resource_version = resource_version
+            self.last_sync = time.monotonic()
+        self.synced.set()
+        logging.debug(f"Listed {len(store)} {self.kind} at resourceVersion {self.resource_version}")
+
+    def _follow(self, stop_event):
+        self._watch = watch.Watch()
+        stream = self._watch.stream(
+            self._list_fn,
+            resource_version=self.resource_version,
+            timeout_seconds=self._watch_timeout,
+            allow_watch_bookmarks=True
+        )
+        for event in stream:
+            if stop_event.is_set():
+                self._watch.stop()
+                break
+            self.apply_event(event)
+        # The server closed the stream after timeout_seconds: reconnect from
+        # the last resourceVersion we saw.
+        with self._lock:
+            self.last_sync = time.monotonic()
+
+    @staticmethod
+    def _raise_for_error(event_type, raw):
+        if event_type == 'ERROR':
+            if raw.get('code') == HTTP_GONE:
+                raise ResourceGone(raw.get('message'))
+            raise ApiException(status=raw.get('code'), reason=raw.get('message'))
+
+    def apply_event(self, event):
+        event_type = event['type']
+        raw = event.get('raw_object') or {}
+        self._raise_for_error(event_type, raw)
+
+        metadata = raw.get('metadata', {})
+        resource_version = metadata.get('resourceVersion')
+
+        with self._lock:
+            if event_type in ('ADDED', 'MODIFIED'):
+                self._store[object_key(metadata)] = self._transform(event['object'])
+                self.version += 1
+            elif event_type == 'DELETED':
+                self._store.pop(object_key(metadata), None)
+                self.version += 1
+            # BOOKMARK events only move the resourceVersion forward
+            if resource_version:
+                self.resource_version = resource_version
+            self.last_sync = time.monotonic()
+
+
+class GraphKindInformer(ResourceInformer):
+    """
+    Keeps one kind of a ``WorkloadGraph`` (workload_graph.py) instead of a
+    store of records: lists are synced into the graph from raw pages
+    (``raw_list_fn``, see k8s_raw.raw_list), watch events are applied to it
+    as plain JSON, and failures are reported with ``graph.fail``.
+    """
+
+    def __init__(self, graph, kind, list_fn, raw_list_fn, **kwargs):
+        # watch.stream() decodes events into the models named in the list
+        # function's docstring; without one they are left as JSON
+        super().__init__(kind, lambda **kw: list_fn(**kw), None, **kwargs)
+        self._graph = graph
+        self._raw_list_fn = raw_list_fn
+
+    def _failed(self, error):
+        self._graph.fail(self.kind, str(error))
+
+    def _list(self):
+        resource_version = None
+
+        def objects():
+            nonlocal resource_version
+            for page in list_pages(self._raw_list_fn, self._page_size):
+                yield from page.items
+                resource_version = page.metadata.resource_version
+
+        added, updated, removed = self._graph.sync(self.kind, objects())
+        with self._lock:
+            self.version += 1
+            self.resource_version = resource_version
+            self.last_sync = time.monotonic()
+        self.synced.set()
+        logging.debug(f"Listed {self.kind} into the workload graph at resourceVersion {resource_version}: "
+                      f"{added} added, {updated} updated, {removed} removed")
+
+    def apply_event(self, event):
+        event_type = event['type']
+        obj = event.get('raw_object') or {}
+        self._raise_for_error(event_type, obj)
+
+        if event_type in ('ADDED', 'MODIFIED'):
+            self._graph.update(self.kind, obj)
+        elif event_type == 'DELETED':
+            self._graph.remove(self.kind, obj)
+        resource_version = obj.get('metadata', {}).get('resourceVersion')
+        with self._lock:
+            if event_type != 'BOOKMARK':
+                self.version += 1
+            if resource_version:
+                self.resource_version = resource_version
+            self.last_sync = time.monotonic()
+
+
+class InformerGroup:
+    """Runs the informers of one context in background threads."""
+
+    def __init__(self, context, informers, generation=0):
+        self.context = context
+        # ApiClientPool generation the informers' clients were built from
+        self.generation = generation
+        self._informers = informers
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for informer in self._informers.values():
+            thread = threading.Thread(
+                target=informer.run,
+                args=(self._stop_event,),
+                name=f"informer-{self.context}-{informer.kind}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop_event.set()
+        for informer in self._informers.values():
+            informer.stop()
+
+    def wait_for_sync(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for informer in self._informers.values():
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not informer.synced.wait(remaining):
+                return False
+        return True
+
+    def age(self):
+        """Seconds since the least recently confirmed kind was last in sync."""
+        syncs = [informer.last_sync for informer in self._informers.values()]
+        if None in syncs:
+            return None
+        return time.monotonic() - min(syncs)
+
+
+class InventoryInformer(InformerGroup):
+    """Runs one ResourceInformer per inventory kind in background threads."""
+
+    def __init__(self, context, kinds, watch_timeout=300, page_size=DEFAULT_PAGE_SIZE, generation=0):
+        super().__init__(context, {
+            name: ResourceInformer(name, list_fn, transform, watch_timeout=watch_timeout, page_size=page_size)
+            for name, (list_fn, transform) in kinds.items()
+        }, generation)
+        self._inventory_lock = threading.Lock()
+        self._inventory = None
+        self._inventory_key = None
+
+    def inventory(self):
+        """
+        The inventory of every kind. The same dict is returned until a kind
+        changes, so that views derived from it (keyed on its identity) are
+        reused between requests.
+        """
+        snapshots = {name: informer.snapshot() for name, informer in self._informers.items()}
+        # The cached inventory holds the lists, so their ids cannot be reused
+        # while they are part of the key
+        key = tuple((id(items), resource_version) for items, resource_version in snapshots.values())
+        with self._inventory_lock:
+            if key != self._inventory_key:
+                inventory = {name: items for name, (items, _) in snapshots.items()}
+                inventory["resource_versions"] = {name: rv for name, (_, rv) in snapshots.items()}
+                self._inventory, self._inventory_key = inventory, key
+            return self._inventory
+
+
+class WorkloadGraphInformer(InformerGroup):
+    """
+    Keeps ``graph`` up to date with one GraphKindInformer per kind, so that
+    refreshing it costs the changes rather than a relist of every pod.
+    ``kinds`` maps each kind to ``(list_fn, raw_list_fn)``.
+    """
+
+    def __init__(self, context, graph, kinds, watch_timeout=300, page_size=DEFAULT_PAGE_SIZE, generation=0):
+        super().__init__(context, {
+            name: GraphKindInformer(graph, name, list_fn, raw_list_fn, watch_timeout=watch_timeout,
+                                    page_size=page_size)
+            for name, (list_fn, raw_list_fn) in kinds.items()
+        }, generation)
+        self.graph = graph
+
+    def wait_for_sync(self, timeout=None):
+        """Wait until every kind has been listed into the graph or has failed to be; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            errors = self.graph.errors()
+            pending = [informer for informer in self._informers.values()
+                       if not informer.synced.is_set() and informer.kind not in errors]
+            if not pending:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            # Failures are not signalled: look at the errors again shortly
+            pending[0].synced.wait(0.05 if remaining is None else min(0.05, remaining))
@@ -1,149 +1,570 @@
 #!/usr/bin/env python3
 
+import argparse
+import contextlib
 import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
+from urllib3.util import Retry
 from datetime import datetime
+from inventory_diff import DIFF_KINDS, iter_diff
+from inventory_records import CliNodeRecord, CliWorkloadRecord, InventoryRecord
+from inventory_stream import STREAM_FORMATS, RecordStreamWriter, write_json_atomic
+from k8s_paging import DEFAULT_PAGE_SIZE, list_pages
+from k8s_raw import api_timestamp, field, raw_list
+from snapshot_store import SnapshotStore
 
 
 def load_kube_config():
     """
     Carica la configurazione di Kubernetes.
     Prova prima la configurazione in-cluster, poi il file kubeconfig locale.
+    Restituisce il nome del cluster usato per gli snapshot.
     """
     try:
         config.load_incluster_config()
         print("Configurazione in-cluster caricata.")
+        return "in-cluster"
     except config.ConfigException:
         config.load_kube_config()
         print("Configurazione kubeconfig locale caricata.")
+        return config.list_kube_config_contexts()[1]["name"]
 
 
-def get_deployments(api_instance, namespace):
+def namespaced_list(api_instance, namespaced_method, all_namespaces_method, namespace):
+    """
+    Restituisce la funzione di lista e i suoi argomenti: la chiamata
+    *_for_all_namespaces se namespace è None, altrimenti quella del namespace.
+    """
+    if namespace is None:
+        return getattr(api_instance, all_namespaces_method), {}
+    return getattr(api_instance, namespaced_method), {"namespace": namespace}
+
+
+def workload_from_raw(obj, available_field):
+    """
+    Record di un workload costruito dal JSON grezzo dell'oggetto;
+    `available_field` è il campo di status con le repliche disponibili.
+    """
+    metadata = obj["metadata"]
+    return CliWorkloadRecord(
+        name=metadata["name"],
+        namespace=metadata.get("namespace"),
+        replicas=field(obj, "spec", "replicas"),
+        available_replicas=field(obj, "status", available_field),
+        labels=metadata.get("labels"),
+        creation_timestamp=api_timestamp(metadata.get("creationTimestamp"))
+    )
+
+
+def node_from_raw(node):
+    # Le condizioni hanno le stesse chiavi, nello stesso ordine, di V1NodeCondition.to_dict()
+    conditions = [
+        {
+            "last_heartbeat_time": api_timestamp(condition.get("lastHeartbeatTime")),
+            "last_transition_time": api_timestamp(condition.get("lastTransitionTime")),
+            "message": condition.get("message"),
+            "reason": condition.get("reason"),
+            "status": condition.get("status"),
+            "type": condition.get("type")
+        }
+        for condition in field(node, "status", "conditions") or ()
+    ]
+    metadata = node["metadata"]
+    return CliNodeRecord(
+        name=metadata["name"],
+        labels=metadata.get("labels"),
+        annotations=metadata.get("annotations"),
+        status=conditions,
+        capacity=field(node, "status", "capacity"),
+        allocatable=field(node, "status", "allocatable"),
+        creation_timestamp=api_timestamp(metadata.get("creationTimestamp"))
+    )
+
+
+def get_deployments(api_instance, namespace=None, page_size=DEFAULT_PAGE_SIZE, sink=None, raw=False):
     try:
-        deployments = api_instance.list_namespaced_deployment(namespace=namespace)
         deployment_list = []
-        for dep in deployments.items:
-            deployment_list.append({
-                "name": dep.metadata.name,
-                "namespace": dep.metadata.namespace,
-                "replicas": dep.spec.replicas,
-                "available_replicas": dep.status.available_replicas,
-                "labels": dep.metadata.labels,
-                "creation_timestamp": dep.metadata.creation_timestamp.isoformat() if dep.metadata.creation_timestamp else None
-            })
+        emit = deployment_list.append if sink is None else (lambda record: sink("deployments", record))
+        list_fn, kwargs = namespaced_list(api_instance, "list_namespaced_deployment", "list_deployment_for_all_namespaces", namespace)
+        # Una pagina alla volta: ogni pagina viene convertita e poi scartata
+        # Con raw=True gli oggetti restano il JSON della risposta, senza modelli
+        for page in list_pages(raw_list(list_fn) if raw else list_fn, page_size, **kwargs):
+            for dep in page.items:
+                if raw:
+                    emit(workload_from_raw(dep, "availableReplicas"))
+                    continue
+                emit(CliWorkloadRecord(
+                    name=dep.metadata.name,
+                    namespace=dep.metadata.namespace,
+                    replicas=dep.spec.replicas,
+                    available_replicas=dep.status.available_replicas,
+                    labels=dep.metadata.labels,
+                    creation_timestamp=dep.metadata.creation_timestamp.isoformat() if dep.metadata.creation_timestamp else None
+                ))
         return deployment_list
     except ApiException as e:
-        print(f"Errore nel recuperare i Deployments nel namespace {namespace}: {e}")
-        return []
+        print(f"Errore nel recuperare i Deployments nel namespace {namespace or '(tutti)'}: {e}")
+        raise
 
 
-def get_replicasets(api_instance, namespace):
+def get_replicasets(api_instance, namespace=None, page_size=DEFAULT_PAGE_SIZE, sink=None, raw=False):
     try:
-        replicasets = api_instance.list_namespaced_replica_set(namespace=namespace)
         replicaset_list = []
-        for rs in replicasets.items:
-            replicaset_list.append({
-                "name": rs.metadata.name,
-                "namespace": rs.metadata.namespace,
-                "replicas": rs.spec.replicas,
-                "available_replicas": rs.status.available_replicas,
-                "labels": rs.metadata.labels,
-                "creation_timestamp": rs.metadata.creation_timestamp.isoformat() if rs.metadata.creation_timestamp else None
-            })
+        emit = replicaset_list.append if sink is None else (lambda record: sink("replicasets", record))
+        list_fn, kwargs = namespaced_list(api_instance, "list_namespaced_replica_set", "list_replica_set_for_all_namespaces", namespace)
+        # Una pagina alla volta: ogni pagina viene convertita e poi scartata
+        # Con raw=True gli oggetti restano il JSON della risposta, senza modelli
+        for page in list_pages(raw_list(list_fn) if raw else list_fn, page_size, **kwargs):
+            for rs in page.items:
+                if raw:
+                    emit(workload_from_raw(rs, "availableReplicas"))
+                    continue
+                emit(CliWorkloadRecord(
+                    name=rs.metadata.name,
+                    namespace=rs.metadata.namespace,
+                    replicas=rs.spec.replicas,
+                    available_replicas=rs.status.available_replicas,
+                    labels=rs.metadata.labels,
+                    creation_timestamp=rs.metadata.creation_timestamp.isoformat() if rs.metadata.creation_timestamp else None
+                ))
         return replicaset_list
     except ApiException as e:
-        print(f"Errore nel recuperare i ReplicaSets nel namespace {namespace}: {e}")
-        return []
+        print(f"Errore nel recuperare i ReplicaSets nel namespace {namespace or '(tutti)'}: {e}")
+        raise
 
 
-def get_statefulsets(api_instance, namespace):
+def get_statefulsets(api_instance, namespace=None, page_size=DEFAULT_PAGE_SIZE, sink=None, raw=False):
     try:
-        statefulsets = api_instance.list_namespaced_stateful_set(namespace=namespace)
         statefulset_list = []
-        for sts in statefulsets.items:
-            statefulset_list.append({
-                "name": sts.metadata.name,
-                "namespace": sts.metadata.namespace,
-                "replicas": sts.spec.replicas,
-                "available_replicas": sts.status.ready_replicas,
-                "labels": sts.metadata.labels,
-                "creation_timestamp": sts.metadata.creation_timestamp.isoformat() if sts.metadata.creation_timestamp else None
-            })
+        emit = statefulset_list.append if sink is None else (lambda record: sink("statefulsets", record))
+        list_fn, kwargs = namespaced_list(api_instance, "list_namespaced_stateful_set", "list_stateful_set_for_all_namespaces", namespace)
+        # Una pagina alla volta: ogni pagina viene convertita e poi scartata
+        # Con raw=True gli oggetti restano il JSON della risposta, senza modelli
+        for page in list_pages(raw_list(list_fn) if raw else list_fn, page_size, **kwargs):
+            for sts in page.items:
+                if raw:
+                    emit(workload_from_raw(sts, "readyReplicas"))
+                    continue
+                emit(CliWorkloadRecord(
+                    name=sts.metadata.name,
+                    namespace=sts.metadata.namespace,
+                    replicas=sts.spec.replicas,
+                    available_replicas=sts.status.ready_replicas,
+                    labels=sts.metadata.labels,
+                    creation_timestamp=sts.metadata.creation_timestamp.isoformat() if sts.metadata.creation_timestamp else None
+                ))
         return statefulset_list
     except ApiException as e:
-        print(f"Errore nel recuperare i StatefulSets nel namespace {namespace}: {e}")
-        return []
+        print(f"Errore nel recuperare i StatefulSets nel namespace {namespace or '(tutti)'}: {e}")
+        raise
 
 
-def get_nodes(api_instance):
+def get_nodes(api_instance, page_size=DEFAULT_PAGE_SIZE, sink=None, raw=False):
     try:
-        nodes = api_instance.list_node()
         node_list = []
-        for node in nodes.items:
-            node_conditions = [condition.to_dict() for condition in node.status.conditions]  # Converti V1NodeCondition in dict
-            node_list.append({
-                "name": node.metadata.name,
-                "labels": node.metadata.labels,
-                "annotations": node.metadata.annotations,
-                "status": node_conditions,  # Condizioni dei nodi convertite
-                "capacity": node.status.capacity,
-                "allocatable": node.status.allocatable,
-                "creation_timestamp": node.metadata.creation_timestamp.isoformat() if node.metadata.creation_timestamp else None
-            })
+        emit = node_list.append if sink is None else (lambda record: sink("nodes", record))
+        list_fn = raw_list(api_instance.list_node) if raw else api_instance.list_node
+        for page in list_pages(list_fn, page_size):
+            for node in page.items:
+                if raw:
+                    emit(node_from_raw(node))
+                    continue
+                node_conditions = [condition.to_dict() for condition in node.status.conditions]  # Converti V1NodeCondition in dict
+                emit(CliNodeRecord(
+                    name=node.metadata.name,
+                    labels=node.metadata.labels,
+                    annotations=node.metadata.annotations,
+                    status=node_conditions,  # Condizioni dei nodi convertite
+                    capacity=node.status.capacity,
+                    allocatable=node.status.allocatable,
+                    creation_timestamp=node.metadata.creation_timestamp.isoformat() if node.metadata.creation_timestamp else None
+                ))
         return node_list
     except ApiException as e:
         print(f"Errore nel recuperare i nodi: {e}")
-        return []
+        raise
 
 
-# Encoder personalizzato per JSON che gestisce oggetti datetime
+# Encoder personalizzato per JSON che gestisce oggetti datetime e record compatti
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime):
             return obj.isoformat()
+        if isinstance(obj, InventoryRecord):
+            return obj.to_dict()
         return super().default(obj)
 
 
-def main():
-    load_kube_config()
+# Risorse namespaced raccolte dalla CLI: funzione di raccolta e chiamata su tutti i namespace
+NAMESPACED_COLLECTORS = {
+    "deployments": (get_deployments, "list_deployment_for_all_namespaces"),
+    "replicasets": (get_replicasets, "list_replica_set_for_all_namespaces"),
+    "statefulsets": (get_statefulsets, "list_stateful_set_for_all_namespaces"),
+}
 
-    # Inizializza le API
-    apps_v1 = client.AppsV1Api()
-    core_v1 = client.CoreV1Api()
 
-    # Recupera tutti i namespace
+def can_list_all_namespaces(list_fn):
+    """
+    Verifica se l'RBAC consente la lista su tutti i namespace,
+    chiedendo un solo oggetto.
+    """
     try:
-        namespaces = core_v1.list_namespace()
-        namespace_names = [ns.metadata.name for ns in namespaces.items]
+        list_fn(limit=1)
+        return True
     except ApiException as e:
-        print(f"Errore nel recuperare i namespaces: {e}")
+        if e.status in (401, 403):
+            return False
+        raise
+
+
+def collect_inventory(apps_v1, core_v1, concurrency, page_size=DEFAULT_PAGE_SIZE, sink=None, raw=False):
+    """
+    Raccoglie l'inventario del cluster.
+    Per ogni tipo di risorsa usa la chiamata *_for_all_namespaces quando l'RBAC
+    lo consente; altrimenti ripiega su una chiamata per namespace, eseguite in
+    parallelo con al massimo `concurrency` richieste contemporanee.
+    Se è indicato `sink(kind, record)`, i record gli vengono passati pagina per
+    pagina invece di essere accumulati nell'inventario restituito.
+    Con `raw` i record sono costruiti dal JSON delle risposte invece che dai
+    modelli del client, con lo stesso risultato.
+    I tipi di risorsa che non è stato possibile recuperare sono riportati in
+    "errors", con il messaggio d'errore.
+    """
+    inventory = {kind: [] for kind in (*NAMESPACED_COLLECTORS, "nodes")}
+    per_namespace = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for kind, (collector, all_namespaces_method) in NAMESPACED_COLLECTORS.items():
+            if can_list_all_namespaces(getattr(apps_v1, all_namespaces_method)):
+                print(f"Recupero {kind} su tutti i namespace.")
+                futures.append((kind, executor.submit(collector, apps_v1, None, page_size, sink, raw)))
+            else:
+                per_namespace.append(kind)
+
+        print("Recupero nodi del cluster.")
+        nodes_future = executor.submit(get_nodes, core_v1, page_size, sink, raw)
+
+        if per_namespace:
+            print(f"Permessi insufficienti su tutti i namespace per {', '.join(per_namespace)}: recupero per namespace.")
+            namespace_names = [
+                ns.metadata.name
+                for page in list_pages(core_v1.list_namespace, page_size)
+                for ns in page.items
+            ]
+            for ns in namespace_names:
+                for kind in per_namespace:
+                    futures.append((kind, executor.submit(NAMESPACED_COLLECTORS[kind][0], apps_v1, ns, page_size, sink, raw)))
+
+        # I risultati vengono uniti nell'ordine di invio; un tipo di risorsa
+        # in errore viene riportato in "errors" senza scartare gli altri
+        errors = {}
+        for kind, future in (*futures, ("nodes", nodes_future)):
+            try:
+                inventory[kind].extend(future.result())
+            except ApiException as e:
+                errors.setdefault(kind, str(e))
+
+    inventory["errors"] = errors
+    return inventory
+
+
+class DeadlineApiClient(client.ApiClient):
+    """
+    ApiClient le cui richieste devono concludersi entro `deadline` (secondo
+    time.monotonic()): ogni richiesta ha come timeout il tempo rimanente e,
+    superata la scadenza, le nuove richieste falliscono con TimeoutError.
+    """
+
+    def __init__(self, configuration, deadline):
+        super().__init__(configuration)
+        self.deadline = deadline
+
+    def call_api(self, *args, _request_timeout=None, **kwargs):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Scadenza delle richieste superata")
+        return super().call_api(*args, _request_timeout=remaining, **kwargs)
+
+
+def new_api_client(context, concurrency, deadline=None):
+    """
+    Crea un ApiClient dedicato al contesto indicato del kubeconfig,
+    senza modificare la configurazione globale.
+    Con `deadline` le richieste sono limitate come in DeadlineApiClient.
+    """
+    configuration = client.Configuration()
+    config.load_kube_config(context=context, client_configuration=configuration, persist_config=False)
+    configuration.connection_pool_maxsize = max(configuration.connection_pool_maxsize, concurrency)
+    if deadline is not None:
+        # Una lettura scaduta non viene ripetuta: userebbe altro tempo oltre la scadenza
+        configuration.retries = Retry(total=3, read=0)
+        return DeadlineApiClient(configuration, deadline)
+    return client.ApiClient(configuration)
+
+
+def default_api_client(concurrency):
+    # ApiClient della configurazione caricata da load_kube_config(), con un
+    # pool di connessioni adeguato alla concorrenza
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = max(configuration.connection_pool_maxsize, concurrency)
+    return client.ApiClient(configuration)
+
+
+def collect_fleet_inventory(contexts, concurrency, page_size=DEFAULT_PAGE_SIZE, cluster_timeout=120, sink=None,
+                            raw=False):
+    """
+    Raccoglie l'inventario di più cluster in parallelo, al massimo
+    `concurrency` cluster alla volta.
+    Ogni record viene marcato con il campo "cluster"; i cluster in errore o che
+    superano `cluster_timeout` secondi sono riportati in "errors" senza
+    bloccare gli altri, e nessuno dei loro record viene passato a `sink`.
+    I tipi di risorsa in errore di un cluster sono riportati come
+    "CONTESTO/tipo".
+    """
+    def worker(context):
+        # Il tempo massimo decorre da quando il cluster viene preso in carico:
+        # i cluster in coda dietro a quelli in corso non vengono penalizzati
+        deadline = time.monotonic() + cluster_timeout
+        # Con `sink` i record del cluster restano qui finché il cluster non è
+        # completo, così un cluster in errore non lascia record a metà
+        buffered = []
+        cluster_sink = None
+        if sink is not None:
+            cluster_sink = lambda kind, record: buffered.append((kind, record))
+        try:
+            api_client = new_api_client(context, concurrency, deadline)
+            inventory = collect_inventory(
+                client.AppsV1Api(api_client), client.CoreV1Api(api_client), concurrency, page_size, cluster_sink, raw
+            )
+            return inventory, buffered
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timeout dopo {cluster_timeout}s") from e
+            raise
+
+    inventory = {kind: [] for kind in (*NAMESPACED_COLLECTORS, "nodes")}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(contexts)))) as executor:
+        futures = [(context, executor.submit(worker, context)) for context in contexts]
+        for context, future in futures:
+            try:
+                result, buffered = future.result()
+            except Exception as e:
+                errors[context] = str(e)
+                print(f"Errore nel recuperare l'inventario del contesto {context}: {errors[context]}")
+                continue
+            for kind, record in buffered:
+                sink(kind, {**record, "cluster": context})
+            for kind, message in result.pop("errors").items():
+                errors[f"{context}/{kind}"] = message
+            for kind, records in result.items():
+                inventory[kind].extend({**record, "cluster": context} for record in records)
+
+    inventory["errors"] = errors
+    return inventory
+
+
+def write_inventory(inventory, path="k8s_inventory.json"):
+    # Scrivi l'inventario in un file JSON usando l'encoder personalizzato,
+    # passando da un file temporaneo rinominato al termine
+    write_json_atomic(path, DateTimeEncoder(indent=4).iterencode(inventory))
+
+    print(f"Inventario salvato in {path}")
+
+
+def load_diff_source(source, args):
+    """
+    Restituisce l'inventario indicato da `source`: un file (JSON, NDJSON o
+    array di record), "snapshot:CLUSTER[@ISTANTE]" dal database degli
+    snapshot, oppure "live[:CONTESTO]" per il cluster.
+    I file vengono letti in streaming durante il confronto.
+    """
+    if source.startswith("snapshot:"):
+        if not args.snapshot_db:
+            raise SystemExit("Per usare uno snapshot serve --snapshot-db")
+        cluster, _, at = source[len("snapshot:"):].partition("@")
+        inventory = SnapshotStore(args.snapshot_db).inventory_at(cluster, args.kinds, at or None)
+        if inventory is None:
+            raise SystemExit(f"Nessuno snapshot di {cluster} a {at or 'adesso'}")
+        return inventory
+    if source == "live" or source.startswith("live:"):
+        context = source[len("live:"):] or None
+        if context:
+            api_client = new_api_client(context, args.concurrency)
+        else:
+            load_kube_config()
+            api_client = default_api_client(args.concurrency)
+        return collect_inventory(client.AppsV1Api(api_client), client.CoreV1Api(api_client),
+                                 args.concurrency, args.page_size, raw=args.decode == "raw")
+    return source
+
+
+def format_changes(changes):
+    parts = []
+    for field, change in changes.items():
+        if isinstance(change, list):
+            parts.append(f"{field} {change[0]} -> {change[1]}")
+            continue
+        items = [f"+{key}={value}" for key, value in change.get("added", {}).items()]
+        items += [f"-{key}" for key in change.get("removed", {})]
+        items += [f"{key} {old} -> {new}" for key, (old, new) in change.get("changed", {}).items()]
+        parts.append(f"{field} [{', '.join(items)}]")
+    return "; ".join(parts)
+
+
+def diff_main(argv):
+    parser = argparse.ArgumentParser(prog="k8s_inventory.py diff",
+                                     description="Confronta due inventari: oggetti aggiunti, rimossi e modificati")
+    parser.add_argument("old", help="inventario di partenza: file, snapshot:CLUSTER[@ISTANTE] o live[:CONTESTO]")
+    parser.add_argument("new", help="inventario da confrontare, nelle stesse forme")
+    parser.add_argument("--snapshot-db", metavar="PATH", help="database SQLite degli snapshot")
+    parser.add_argument("--kinds", type=lambda value: tuple(value.split(",")), default=DIFF_KINDS,
+                        help="tipi di risorsa da confrontare, separati da virgola (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="stampa le differenze come NDJSON")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help="numero di oggetti richiesti per pagina alle API di Kubernetes")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="numero massimo di richieste contemporanee alle API di Kubernetes")
+    parser.add_argument("--decode", choices=("raw", "models"), default="raw",
+                        help="costruisce i record dal JSON delle risposte (raw) o dai modelli del client "
+                             "(models); il risultato è lo stesso, raw è più veloce e usa meno memoria")
+    args = parser.parse_args(argv)
+
+    # I messaggi di avanzamento vanno su stderr, per non mescolarli alle differenze
+    with contextlib.redirect_stdout(sys.stderr):
+        old = load_diff_source(args.old, args)
+        new = load_diff_source(args.new, args)
+
+    symbols = {"added": "+", "removed": "-", "changed": "~"}
+    counts = {change: 0 for change in symbols}
+    for entry in iter_diff(old, new, args.kinds):
+        counts[entry["change"]] += 1
+        if args.json:
+            print(json.dumps(entry))
+            continue
+        name = "/".join(part for part in (entry.get("cluster"), entry["namespace"], entry["name"]) if part)
+        line = f"{symbols[entry['change']]} {entry['kind']} {name}"
+        if entry["change"] == "changed":
+            line += f": {format_changes(entry['changes'])}"
+        print(line)
+
+    if not args.json:
+        print(f"Aggiunti: {counts['added']}, rimossi: {counts['removed']}, modificati: {counts['changed']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inventario delle risorse di un cluster Kubernetes "
+                                                 "(\"k8s_inventory.py diff -h\" per confrontare due inventari)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help="numero di oggetti richiesti per pagina alle API di Kubernetes")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="numero massimo di richieste contemporanee alle API di Kubernetes per cluster, "
+                             "e di cluster inventariati in parallelo")
+    parser.add_argument("--decode", choices=("raw", "models"), default="raw",
+                        help="costruisce i record dal JSON delle risposte (raw) o dai modelli del client "
+                             "(models); il risultato è lo stesso, raw è più veloce e usa meno memoria")
+    parser.add_argument("--context", action="append", dest="contexts", metavar="CONTEXT",
+                        help="contesto del kubeconfig da inventariare (ripetibile per più cluster)")
+    parser.add_argument("--all-contexts", action="store_true",
+                        help="inventaria tutti i contesti del kubeconfig in parallelo")
+    parser.add_argument("--cluster-timeout", type=float, default=120,
+                        help="secondi massimi per l'inventario di ciascun cluster")
+    parser.add_argument("--output", default="k8s_inventory.json",
+                        help="file in cui salvare l'inventario")
+    parser.add_argument("--stream", choices=STREAM_FORMATS,
+                        help="scrive i record man mano che vengono raccolti, come NDJSON "
+                             "o come array JSON di record marcati con il campo \"kind\"")
+    parser.add_argument("--snapshot-db", metavar="PATH",
+                        help="salva anche uno snapshot dell'inventario nel database SQLite indicato")
+    return parser.parse_args()
+
+
+def main():
+    if sys.argv[1:2] == ["diff"]:
+        diff_main(sys.argv[2:])
         return
 
-    # Inizializza l'inventario
-    inventory = {
-        "deployments": [],
-        "replicasets": [],
-        "statefulsets": [],
-        "nodes": []
-    }
-
-    # Recupera Deployments, ReplicaSets e StatefulSets per ogni namespace
-    for ns in namespace_names:
-        print(f"Recupero risorse nel namespace: {ns}")
-        inventory["deployments"].extend(get_deployments(apps_v1, ns))
-        inventory["replicasets"].extend(get_replicasets(apps_v1, ns))
-        inventory["statefulsets"].extend(get_statefulsets(apps_v1, ns))
-
-    # Recupera i nodi
-    print("Recupero nodi del cluster.")
-    inventory["nodes"] = get_nodes(core_v1)
-
-    # Scrivi l'inventario in un file JSON usando l'encoder personalizzato
-    with open("k8s_inventory.json", "w") as f:
-        json.dump(inventory, f, indent=4, cls=DateTimeEncoder)
-
-    print("Inventario salvato in k8s_inventory.json")
+    args = parse_args()
+
+    contexts = args.contexts
+    if args.all_contexts:
+        contexts = [c["name"] for c in config.list_kube_config_contexts()[0]]
+
+    kinds = (*NAMESPACED_COLLECTORS, "nodes")
+    cluster = None
+    if not contexts:
+        cluster = load_kube_config()
+
+    recorder = None
+    if args.snapshot_db:
+        store = SnapshotStore(args.snapshot_db, default=DateTimeEncoder().default)
+        recorder = store.recorder(source="cli", kinds=kinds)
+        if cluster:
+            recorder.begin(cluster)
+
+    writer = None
+    sink = None
+    if args.stream:
+        # In modalità streaming i record vanno direttamente su file e
+        # l'inventario in memoria resta vuoto
+        writer = RecordStreamWriter(args.output, args.stream, default=DateTimeEncoder().default)
+        if recorder:
+            def sink(kind, record):
+                writer.write(kind, record)
+                recorder.add(kind, record, cluster)
+        else:
+            sink = writer.write
+
+    try:
+        if contexts:
+            print(f"Recupero inventario da {len(contexts)} contesti: {', '.join(contexts)}")
+            inventory = collect_fleet_inventory(contexts, args.concurrency, args.page_size, args.cluster_timeout, sink,
+                                                raw=args.decode == "raw")
+        else:
+            api_client = default_api_client(args.concurrency)
+            apps_v1 = client.AppsV1Api(api_client)
+            core_v1 = client.CoreV1Api(api_client)
+
+            inventory = collect_inventory(apps_v1, core_v1, args.concurrency, args.page_size, sink, raw=args.decode == "raw")
+    except BaseException as e:
+        # Qualunque errore, anche un'interruzione, scarta il file temporaneo
+        # e la transazione dello snapshot
+        if writer:
+            writer.abort()
+        if recorder:
+            recorder.rollback()
+        if not isinstance(e, ApiException):
+            raise
+        print(f"Errore nel recuperare l'inventario: {e}")
+        return
+
+    if writer:
+        writer.close()
+        print(f"{writer.count} record salvati in {args.output}")
+    else:
+        write_inventory(inventory, args.output)
+
+    if recorder:
+        # In modalità fleet i record portano il campo "cluster": i cluster in
+        # errore non ricevono record e quindi nessuno snapshot. I tipi di
+        # risorsa in errore restano fuori dallo snapshot, altrimenti i loro
+        # oggetti risulterebbero eliminati
+        errors = inventory["errors"]
+        for name in contexts or (cluster,):
+            prefix = f"{name}/" if contexts else ""
+            recorder.fail(name, [kind for kind in kinds if f"{prefix}{kind}" in errors])
+        if not writer:
+            for kind in kinds:
+                for record in inventory[kind]:
+                    recorder.add(kind, record, cluster)
+        snapshot_ids = recorder.commit()
+        print(f"Snapshot salvati in {args.snapshot_db}: " +
+              ', '.join(f"{name} (#{snapshot_id})" for name, snapshot_id in snapshot_ids.items()))
 
 
 if __name__ == "__main__":
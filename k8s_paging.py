@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def list_pages(list_fn, page_size=DEFAULT_PAGE_SIZE, **kwargs):
+    """
+    Yield the pages of a Kubernetes list call, following ``_continue`` tokens.
+
+    Only one page is requested at a time, so callers that transform each page
+    and drop it keep peak memory proportional to ``page_size`` rather than to
+    the number of objects in the cluster.
+    """
+    _continue = None
+    while True:
+        page = list_fn(limit=page_size, _continue=_continue, **kwargs)
+        yield page
+        _continue = page.metadata._continue
+        if not _continue:
+            break
+
+
+def list_all(list_fn, transform, page_size=DEFAULT_PAGE_SIZE, **kwargs):
+    """Return ``transform(obj)`` for every object of a paginated list call."""
+    records = []
+    for page in list_pages(list_fn, page_size, **kwargs):
+        records.extend(transform(obj) for obj in page.items)
+    return records
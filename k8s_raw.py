@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+List calls decoded straight from the response JSON.
+
+The kubernetes client turns every listed object into a tree of models (pod
+templates, managed fields and all) before the inventory reads half a dozen
+fields from it. ``raw_list`` instead asks for the undecoded response
+(``_preload_content=False``) and returns pages whose items are the plain JSON
+dicts, so record builders only touch the fields they need.
+
+With ``metadata_only`` the API server is asked for a
+``PartialObjectMetadataList``: every item is just ``{"metadata": {...}}``,
+without spec and status, which makes responses several times smaller.
+
+Pages look like the client's list models as far as ``k8s_paging`` is
+concerned: ``page.items`` and ``page.metadata._continue`` /
+``page.metadata.resource_version``.
+"""
+
+import functools
+import json
+import time
+
+from k8s_client_pool import add_deserialize_seconds
+
+# Content negotiation for metadata-only lists (meta.k8s.io/v1), with a plain
+# list as the fallback for API servers that do not support it
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+
+
+class RawListMetadata:
+    __slots__ = ("resource_version", "_continue", "remaining_item_count")
+
+    def __init__(self, metadata):
+        self.resource_version = metadata.get('resourceVersion')
+        self._continue = metadata.get('continue')
+        self.remaining_item_count = metadata.get('remainingItemCount')
+
+
+class RawListPage:
+    __slots__ = ("items", "metadata")
+
+    def __init__(self, body):
+        self.items = body.get('items') or []
+        self.metadata = RawListMetadata(body.get('metadata') or {})
+
+
+def raw_list(list_fn, metadata_only=False):
+    """Wrap a kubernetes list function so that it returns ``RawListPage`` objects."""
+    if metadata_only:
+        list_fn = functools.partial(list_fn, _headers={"Accept": METADATA_ACCEPT})
+
+    def call(**kwargs):
+        response = list_fn(_preload_content=False, **kwargs)
+        try:
+            data = response.data
+        finally:
+            response.release_conn()
+        start = time.perf_counter()
+        page = RawListPage(json.loads(data))
+        add_deserialize_seconds(time.perf_counter() - start)
+        return page
+
+    return call
+
+
+def api_timestamp(value):
+    """
+    An RFC 3339 timestamp of the API ("2024-09-25T09:55:11Z") written the way
+    ``datetime.isoformat()`` writes the parsed value ("2024-09-25T09:55:11+00:00").
+    """
+    if value and value.endswith('Z'):
+        return value[:-1] + '+00:00'
+    return value
+
+
+def field(obj, *path):
+    """``obj[path[0]][path[1]]...``, or None when a level is missing."""
+    for key in path:
+        if obj is None:
+            return None
+        obj = obj.get(key)
+    return obj
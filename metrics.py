@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Counters, gauges and histograms in the Prometheus text exposition format.
+
+A small dependency-free subset of prometheus_client: metrics have a fixed
+set of label names, values are kept per label combination, and
+``Registry.exposition()`` renders every registered metric. Callback metrics
+read their samples at scrape time from counters kept elsewhere, such as the
+hit counts of the inventory and PDF caches.
+
+    REQUESTS = REGISTRY.counter("app_requests_total", "Requests.", ["endpoint"])
+    REQUESTS.inc(endpoint="/data")
+    with LATENCY.time(stage="filter"):
+        ...
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a cached response to a PDF of a large cluster
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, key, (), value
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then the sum
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield self.name + "_bucket", key, (("le", _format_value(float(bound))),), cumulative
+            yield self.name + "_count", key, (), cumulative
+            yield self.name + "_sum", key, (), state[-1]
+
+
+class CallbackMetric(_Metric):
+    """
+    A counter or gauge whose samples are read at scrape time: ``callback``
+    returns ``{label values tuple: value}``.
+    """
+
+    def __init__(self, name, documentation, labelnames, callback, type="gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self._callback = callback
+
+    def _samples(self):
+        for key, value in sorted(self._callback().items()):
+            yield self.name, tuple(str(v) for v in key), (), value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, callback, type="gauge"):
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, type))
+
+    def exposition(self):
+        """All metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.exposition() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
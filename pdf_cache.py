@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+SUFFIX = '.pdf'
+
+
+def _key_default(value):
+    # Record types hash like the dicts they stand for, anything else by its text
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def report_key(template_path, template_data, *options):
+    """
+    Content address of a report: the hash of the template source, of the
+    data it is rendered with and of the rendering ``options``, so a template
+    change never serves an old PDF.
+    """
+    digest = hashlib.sha256()
+    with open(template_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(b'\0')
+    digest.update(json.dumps([template_data, options], sort_keys=True, separators=(',', ':'), default=_key_default).encode())
+    return digest.hexdigest()
+
+
+class PdfCache:
+    """
+    Directory of rendered PDFs named after their content key, bounded to
+    ``max_bytes`` by evicting the least recently used files first.
+
+    The LRU order is rebuilt from file modification times on start-up and
+    kept in memory afterwards; reads touch the file so the order survives
+    restarts.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith('.tmp'):
+                # Left over by a write interrupted by a crash
+                os.unlink(os.path.join(directory, name))
+            elif name.endswith(SUFFIX):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name[:-len(SUFFIX)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def open(self, key):
+        """
+        Return the cached PDF for ``key`` opened for reading, or None. An open
+        file stays readable even if it is evicted meanwhile.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            f = open(self.path(key), 'rb')
+        except FileNotFoundError:
+            # Removed behind our back
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        os.utime(f.fileno())
+        return f
+
+    def put(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates files readable only by the owner
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._size += len(data)
+            evicted = []
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.unlink(self.path(old_key))
+            except FileNotFoundError:
+                pass
+            logging.debug(f"PDF cache evicted {old_key}")
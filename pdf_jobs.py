@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+
+"""
+Background PDF rendering on a bounded pool of worker processes.
+
+Reports are submitted as jobs and rendered by at most ``max_workers``
+processes, so several reports use several cores and never block a web worker.
+Workers are reused between jobs; a job that is cancelled or runs past its
+timeout has its worker process terminated, and a fresh worker is started for
+the next job.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED_STATES = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+
+def _worker_main(conn, render, stats=None):
+    # Runs in the worker process: render one job at a time until told to stop
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        job_id, args = message
+        try:
+            result = (job_id, True, render(*args))
+        except Exception as e:
+            result = (job_id, False, f"{type(e).__name__}: {e}")
+        conn.send(result + (stats() if stats is not None else None,))
+    conn.close()
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class PdfJob:
+    __slots__ = ("id", "args", "key", "status", "error", "result", "size", "stats", "submitted_at", "started_at",
+                 "finished_at", "_done")
+
+    def __init__(self, args, key=None):
+        self.id = uuid.uuid4().hex
+        self.args = args
+        self.key = key
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.size = None
+        self.stats = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "size": self.size,
+            "stats": self.stats
+        }
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "job")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.job = None
+
+
+class PdfJobManager:
+    """
+    Queue of PDF jobs rendered by up to ``max_workers`` processes.
+
+    ``render`` must be a module-level function (it is sent to the workers) that
+    takes the job arguments and returns bytes. Jobs running longer than
+    ``timeout`` seconds are killed. Finished jobs are kept for ``result_ttl``
+    seconds, and at most ``max_jobs`` jobs are tracked at once. ``on_done`` is
+    called as ``on_done(job, result)`` for every successful job, from the
+    dispatcher thread, before the job is marked done. It takes over the
+    result: the job then keeps only ``job.size``, not the bytes, and fails if
+    ``on_done`` raises. Without ``on_done`` the result is kept as
+    ``job.result``. ``stats``, also a module-level function, is called in the
+    worker after every job and its return value is kept as ``job.stats``.
+    """
+
+    def __init__(self, render, max_workers=2, timeout=300, result_ttl=600, max_jobs=100, start_method='spawn',
+                 on_done=None, stats=None):
+        self._render = render
+        self._on_done = on_done
+        self._stats = stats
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self._mp = multiprocessing.get_context(start_method)
+
+        self._jobs = OrderedDict()
+        self._queue = deque()
+        self._workers = []
+        self._stopping = []  # (worker, kill) left to stop outside the lock
+        self._lock = threading.Lock()
+        self._wakeup_recv, self._wakeup_send = multiprocessing.Pipe(duplex=False)
+        self._closed = False
+        self._dispatcher = None
+
+    def submit(self, *args, key=None):
+        """Queue a job for ``render(*args)`` and return it; ``key`` is kept on the job."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("PDF job manager is shut down")
+            self._expire()
+            if len(self._jobs) >= self.max_jobs:
+                raise JobQueueFull(f"Too many PDF jobs ({self.max_jobs}), retry later")
+            job = PdfJob(args, key)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name='pdf-jobs', daemon=True)
+                self._dispatcher.start()
+            self._wakeup()
+        return job
+
+    def add_done(self, result=None, key=None):
+        """Record a job whose result is already available, e.g. from a cache."""
+        with self._lock:
+            self._expire()
+            job = PdfJob((), key)
+            self._finish(job, DONE, result=result)
+            job.started_at = job.finished_at
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status_counts(self):
+        """Number of tracked jobs per status."""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            if job.status == QUEUED:
+                self._queue.remove(job)
+            self._finish(job, CANCELLED, error="Cancelled")
+            # A running job's worker is terminated by the dispatcher
+            self._wakeup()
+        return job
+
+    def remove(self, job_id):
+        """Cancel ``job_id`` if needed and forget it."""
+        job = self.cancel(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            for job in self._queue:
+                self._finish(job, CANCELLED, error="Shut down")
+            self._queue.clear()
+            self._wakeup()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+
+    def _wakeup(self):
+        # Called with self._lock held
+        try:
+            self._wakeup_send.send_bytes(b'')
+        except OSError:
+            pass
+
+    def _finish(self, job, status, result=None, error=None):
+        # Called with self._lock held
+        job.status = status
+        job.result = result
+        if result is not None:
+            job.size = len(result)
+        job.error = error
+        job.finished_at = time.time()
+        job._done.set()
+
+    def _expire(self):
+        # Called with self._lock held
+        cutoff = time.time() - self.result_ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.status in FINISHED_STATES and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._mp.Pipe()
+        process = self._mp.Process(target=_worker_main, args=(child_conn, self._render, self._stats),
+                                   name='pdf-worker', daemon=True)
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker, kill=False):
+        # Called with self._lock held: the worker is stopped later by
+        # _stop_workers(), once the lock is released
+        self._workers.remove(worker)
+        self._stopping.append((worker, kill))
+
+    def _stop_workers(self, wait=False):
+        # Called without self._lock: waiting for a process to exit must not
+        # block submit(), get() or status_counts() (and so /metrics), nor the
+        # dispatcher, so workers are stopped from a separate thread unless
+        # ``wait`` is set
+        with self._lock:
+            stopping, self._stopping = self._stopping, []
+        if not stopping:
+            return
+        if wait:
+            self._stop(stopping)
+        else:
+            threading.Thread(target=self._stop, args=(stopping,), name='pdf-worker-stop', daemon=True).start()
+
+    @staticmethod
+    def _stop(stopping):
+        for worker, kill in stopping:
+            if kill:
+                worker.process.terminate()
+            else:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+            worker.process.join(5)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+
+    def _assign(self):
+        # Called with self._lock held: hand queued jobs to idle workers
+        idle = [w for w in self._workers if w.job is None]
+        while self._queue:
+            if idle:
+                worker = idle.pop()
+            elif len(self._workers) < self.max_workers:
+                worker = self._start_worker()
+            else:
+                break
+            job = self._queue.popleft()
+            job.status = RUNNING
+            job.started_at = time.time()
+            worker.job = job
+            worker.conn.send((job.id, job.args))
+
+    def _reap(self):
+        # Called with self._lock held: kill workers whose job was cancelled or took too long
+        for worker in list(self._workers):
+            job = worker.job
+            if job is None:
+                continue
+            if job.status == CANCELLED:
+                logging.info(f"PDF job {job.id} cancelled, terminating its worker")
+                self._retire(worker, kill=True)
+            elif time.time() - job.started_at > self.timeout:
+                logging.warning(f"PDF job {job.id} timed out after {self.timeout}s")
+                self._finish(job, TIMED_OUT, error=f"Timed out after {self.timeout}s")
+                self._retire(worker, kill=True)
+
+    @staticmethod
+    def _receive(worker):
+        # Called without self._lock: a large PDF takes a while to come through
+        # the pipe. Only the dispatcher thread reads from the workers.
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            return None
+
+    def _received(self, worker, message):
+        # Called with self._lock held; returns (job, result) for a successful job
+        job = worker.job
+        if message is None:
+            self._retire(worker, kill=True)
+            worker.process.is_alive()  # Collects the exit code if the process is gone
+            if job is not None and job.status == RUNNING:
+                self._finish(job, FAILED, error=f"Worker process exited (code {worker.process.exitcode})")
+            return
+        job_id, ok, value, stats = message
+        worker.job = None
+        if job is None or job.id != job_id or job.status != RUNNING:
+            return
+        job.stats = stats
+        if ok:
+            logging.info(f"PDF job {job.id} done in {time.time() - job.started_at:.1f}s ({len(value)} bytes)")
+            return job, value
+        else:
+            self._finish(job, FAILED, error=value)
+            logging.error(f"PDF job {job.id} failed: {value}")
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    break
+                self._expire()
+                self._reap()
+                self._assign()
+                busy = {w.conn: w for w in self._workers if w.job is not None}
+                deadlines = [w.job.started_at + self.timeout for w in busy.values()]
+            self._stop_workers()
+
+            # Wake up for the next job deadline, and now and then to expire old results
+            timeout = min([60.0] + [max(0.0, deadline - time.time()) for deadline in deadlines])
+            ready = wait([self._wakeup_recv, *busy], timeout)
+
+            if self._wakeup_recv in ready:
+                while self._wakeup_recv.poll():
+                    self._wakeup_recv.recv_bytes()
+            messages = [(busy[conn], self._receive(busy[conn])) for conn in ready if conn is not self._wakeup_recv]
+
+            completed = []
+            with self._lock:
+                for worker, message in messages:
+                    if worker in self._workers:
+                        result = self._received(worker, message)
+                        if result is not None:
+                            completed.append(result)
+            self._stop_workers()
+
+            # The callback runs before waiters are released, without holding the lock
+            for job, value in completed:
+                error = None
+                if self._on_done is not None:
+                    try:
+                        self._on_done(job, value)
+                    except Exception as e:
+                        logging.error(f"PDF job {job.id} completion callback failed: {e}")
+                        error = f"Could not store the result: {e}"
+                with self._lock:
+                    if job.status != RUNNING:
+                        continue
+                    if error is not None:
+                        self._finish(job, FAILED, error=error)
+                    elif self._on_done is not None:
+                        job.size = len(value)
+                        self._finish(job, DONE)
+                    else:
+                        self._finish(job, DONE, result=value)
+
+        with self._lock:
+            for worker in list(self._workers):
+                if worker.job is not None and worker.job.status == RUNNING:
+                    self._finish(worker.job, CANCELLED, error="Shut down")
+                self._retire(worker, kill=worker.job is not None)
+        self._stop_workers(wait=True)
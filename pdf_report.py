@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+PDF rendering of inventory reports with Jinja and WeasyPrint.
+
+Small reports are laid out as a single document. Larger ones are rendered in
+slices of ``chunk_rows`` table rows, one document at a time, and the slices
+are merged with pypdf, so WeasyPrint never holds the layout of the whole
+report in memory. Page numbers continue across slices: every slice starts its
+page counter where the previous one stopped.
+"""
+
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+_jinja_env = None
+
+# Seconds per rendering stage ("template", "layout", "write", "merge") since
+# the last take_render_timings() call
+_render_timings = {}
+
+
+@contextmanager
+def _timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _render_timings[stage] = _render_timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def take_render_timings():
+    """Return the time spent in each rendering stage since the previous call, and reset it."""
+    timings = dict(_render_timings)
+    _render_timings.clear()
+    return timings
+
+
+def _render_html(template_name, template_data):
+    global _jinja_env
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    if _jinja_env is None:
+        _jinja_env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=select_autoescape(['html']))
+    return _jinja_env.get_template(template_name).render(**template_data)
+
+
+def report_slices(template_data, chunk_rows):
+    """
+    Split report data into template data for slices of at most ``chunk_rows``
+    rows of a single resource, in report order.
+    """
+    first = True
+    for resource, items in template_data["inventory"].items():
+        for start in range(0, len(items or []), chunk_rows):
+            yield {
+                **template_data,
+                "inventory": {resource: items[start:start + chunk_rows]},
+                "show_title": first,
+                "continued": start > 0
+            }
+            first = False
+
+
+def render_report_pdf(template_name, template_data, base_url=None, chunk_rows=0):
+    """
+    Render a report template to PDF bytes, without a Flask app context.
+    Reports with more than ``chunk_rows`` rows are rendered in slices.
+    """
+    from weasyprint import HTML
+
+    total_rows = sum(len(items or []) for items in template_data["inventory"].values())
+    if not chunk_rows or total_rows <= chunk_rows:
+        with _timed("template"):
+            html = _render_html(template_name, template_data)
+        with _timed("layout"):
+            document = HTML(string=html, base_url=base_url).render()
+        with _timed("write"):
+            return document.write_pdf()
+
+    from pypdf import PdfWriter
+
+    page_offset = 0
+    with tempfile.TemporaryDirectory(prefix='k8s-report-') as tmp_dir:
+        paths = []
+        for index, slice_data in enumerate(report_slices(template_data, chunk_rows)):
+            with _timed("template"):
+                html = _render_html(template_name, dict(slice_data, page_offset=page_offset))
+            with _timed("layout"):
+                document = HTML(string=html, base_url=base_url).render()
+            page_offset += len(document.pages)
+            path = os.path.join(tmp_dir, f"{index:05d}.pdf")
+            with _timed("write"):
+                document.write_pdf(path)
+            del document, html
+            paths.append(path)
+
+        with _timed("merge"):
+            writer = PdfWriter()
+            for path in paths:
+                writer.append(path)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+    return buffer.getvalue()
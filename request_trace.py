@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+Per-request stage breakdown, on-demand profiling and the slow-request log.
+
+A ``RequestTrace`` is installed in a context variable for the duration of a
+request; code on the request path adds stage timings and object counts to
+``current_trace()``. Work handed to thread pools keeps the trace when it is
+submitted through ``contextvars.copy_context().run``.
+
+Requests slower than the threshold are written to a ``SlowRequestLog`` with
+their trace. Profiled requests run under cProfile and their statistics are
+kept in a ``ProfileStore`` for later download. The profile of a request is
+carried by its trace, so work submitted to thread pools through
+``run_profiled`` is profiled too and added to the request's statistics.
+"""
+
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+
+_current = contextvars.ContextVar('request_trace', default=None)
+
+
+class RequestTrace:
+    def __init__(self, method, path, args=None):
+        self.method = method
+        self.path = path
+        self.args = dict(args or {})
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}   # "stage" or "stage/kind" -> seconds
+        self.objects = {}  # kind -> objects listed from the API
+        self.records = {}  # kind -> records in the response
+        self.contexts = set()
+        self.profile = None  # RequestProfile of a profiled request
+
+    def add_stage(self, stage, seconds, context=None, kind=''):
+        key = f"{stage}/{kind}" if kind else stage
+        with self._lock:
+            self.stages[key] = self.stages.get(key, 0.0) + seconds
+            if context:
+                self.contexts.add(context)
+
+    def add_objects(self, kind, count):
+        with self._lock:
+            self.objects[kind] = self.objects.get(kind, 0) + count
+
+    def set_records(self, records):
+        with self._lock:
+            self.records = dict(records)
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_dict(self, status=None, duration=None):
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "method": self.method,
+                "path": self.path,
+                "args": self.args,
+                "status": status,
+                "duration_seconds": round(self.elapsed() if duration is None else duration, 4),
+                "contexts": sorted(self.contexts),
+                "stages": {stage: round(seconds, 4) for stage, seconds in sorted(self.stages.items())},
+                "objects": dict(self.objects),
+                "records": dict(self.records)
+            }
+
+
+def start_trace(trace):
+    """Install ``trace`` as the current trace; returns the token for ``end_trace``."""
+    return _current.set(trace)
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+def current_trace():
+    return _current.get()
+
+
+def run_profiled(fn, *args, **kwargs):
+    """Call ``fn``, under its own profiler when the current request is being profiled."""
+    trace = _current.get()
+    if trace is None or trace.profile is None:
+        return fn(*args, **kwargs)
+    return trace.profile.run(fn, *args, **kwargs)
+
+
+class SlowRequestLog:
+    """
+    The last ``max_entries`` requests that took longer than ``threshold``
+    seconds, also appended as JSON lines to ``path`` when it is set.
+    """
+
+    def __init__(self, threshold, path=None, max_entries=100):
+        self.threshold = threshold
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=max_entries)
+
+    def record(self, trace, status, duration):
+        if not self.threshold or duration < self.threshold:
+            return False
+        entry = trace.to_dict(status, duration)
+        logging.warning(
+            f"Slow request {entry['method']} {entry['path']} took {duration:.2f}s "
+            f"(contexts: {', '.join(entry['contexts']) or '-'}, stages: {entry['stages']}, "
+            f"records: {entry['records']})"
+        )
+        with self._lock:
+            self._entries.append(entry)
+            if self.path:
+                try:
+                    with open(self.path, 'a') as f:
+                        f.write(json.dumps(entry) + '\n')
+                except OSError as e:
+                    logging.error(f"Cannot write the slow request log {self.path}: {e}")
+        return True
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+
+class RequestProfile:
+    """
+    cProfile statistics of one request: the profiler of the request's thread
+    and one per call made through ``run()`` on other threads, merged when the
+    request ends.
+    """
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def run(self, fn, *args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # One profiler per process (Python 3.12+), which already sees this thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._workers.append(profiler)
+
+    def stats(self):
+        stats = pstats.Stats(self.profiler)
+        with self._lock:
+            workers = list(self._workers)
+        if workers:
+            stats.add(*workers)
+        return stats
+
+
+class ProfileStore:
+    """
+    cProfile statistics of profiled requests, saved as ``<id>.prof`` files in
+    ``directory`` (readable with pstats or snakeviz); the oldest files beyond
+    ``max_profiles`` are removed. One request is profiled at a time.
+    """
+
+    def __init__(self, directory, max_profiles=20):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Return a ``RequestProfile`` profiling this thread, or None if another request is being profiled."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            self._busy.release()
+            return None
+        return RequestProfile(profiler)
+
+    def stop(self, profile):
+        """Stop ``profile``, save its merged statistics and return the profile id."""
+        profile.profiler.disable()
+        self._busy.release()
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profile.stats().dump_stats(self.path(profile_id))
+        self._prune()
+        return profile_id
+
+    def path(self, profile_id):
+        return os.path.join(self.directory, os.path.basename(profile_id) + '.prof')
+
+    def report(self, profile_id, sort='cumulative', limit=50):
+        """The pstats text report of a saved profile; raises FileNotFoundError if it is gone."""
+        output = io.StringIO()
+        stats = pstats.Stats(self.path(profile_id), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def _prune(self):
+        profiles = sorted(
+            (entry.stat().st_mtime, entry.path) for entry in os.scandir(self.directory) if entry.name.endswith('.prof')
+        )
+        for _, path in profiles[:max(0, len(profiles) - self.max_profiles)]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+"""
+History of inventories in a SQLite database.
+
+Every CLI run or web refresh is recorded as one snapshot per cluster. Object
+bodies are stored once per distinct content (``objects``, keyed by hash) and
+``versions`` records for which snapshots each object had that content: a
+version is valid from the snapshot that first saw it until the snapshot that
+saw it change or disappear. An unchanged object therefore costs nothing in a
+new snapshot, and "the deployments of namespace X at time T" is an indexed
+range lookup instead of a scan of old JSON files.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    cluster TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    source TEXT,
+    kinds TEXT NOT NULL,
+    object_count INTEGER NOT NULL DEFAULT 0,
+    changed_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS snapshots_cluster_time ON snapshots (cluster, taken_at);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (taken_at);
+
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    body TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    cluster TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    object_id INTEGER NOT NULL REFERENCES objects (id),
+    valid_from INTEGER NOT NULL REFERENCES snapshots (id),
+    valid_to INTEGER REFERENCES snapshots (id)
+);
+CREATE INDEX IF NOT EXISTS versions_key ON versions (cluster, kind, namespace, name, valid_from);
+CREATE INDEX IF NOT EXISTS versions_open ON versions (cluster, valid_to);
+"""
+
+# Fields added to records by the tools rather than read from the cluster
+VOLATILE_FIELDS = ("cluster", "kind")
+
+# Node condition fields that change on every kubelet status report; the
+# conditions of web records are in "conditions", those of CLI records in "status"
+CONDITION_FIELDS = ("conditions", "status")
+VOLATILE_CONDITION_FIELDS = ("last_heartbeat_time",)
+
+
+def stored_body(record):
+    """
+    The part of ``record`` that is stored and hashed: without the fields added
+    by the tools and without condition heartbeats, so that a node whose
+    conditions did not change keeps its version.
+    """
+    body = {}
+    for key, value in record.items():
+        if key in VOLATILE_FIELDS:
+            continue
+        if key in CONDITION_FIELDS and isinstance(value, list):
+            value = [
+                {k: v for k, v in condition.items() if k not in VOLATILE_CONDITION_FIELDS}
+                if isinstance(condition, dict) else condition
+                for condition in value
+            ]
+        body[key] = value
+    return body
+
+
+def utc_timestamp(value=None):
+    """Normalize a datetime or ISO 8601 string (default: now) to a sortable UTC string."""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+class SnapshotStore:
+    """
+    SQLite snapshot database at ``path``; safe to share between threads.
+    ``default`` is passed to json.dumps for values such as datetimes.
+    """
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self._default = default
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def recorder(self, source=None, kinds=None):
+        """
+        Start recording snapshots; records can be added one by one (e.g. from
+        a streaming collector) and are committed by ``SnapshotRecorder.commit``.
+        The store runs one transaction at a time, so use one recorder at a time.
+        """
+        return SnapshotRecorder(self, source, kinds)
+
+    def save_inventory(self, inventory, cluster, kinds, source=None):
+        """Record ``inventory[kind]`` for each of ``kinds`` as a snapshot of ``cluster``; returns its id."""
+        recorder = self.recorder(source, kinds)
+        try:
+            recorder.begin(cluster)
+            for kind in kinds:
+                for record in inventory.get(kind) or []:
+                    recorder.add(kind, record, cluster)
+            return recorder.commit().get(cluster)
+        except BaseException:
+            # The connection is shared: no transaction is left open for the next snapshot
+            recorder.rollback()
+            raise
+
+    def snapshots(self, cluster=None, limit=100):
+        query = "SELECT * FROM snapshots"
+        params = []
+        if cluster:
+            query += " WHERE cluster = ?"
+            params.append(cluster)
+        query += " ORDER BY taken_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, params)]
+
+    def snapshot_at(self, cluster, at=None):
+        """The last snapshot of ``cluster`` taken at or before ``at`` (default: now), or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM snapshots WHERE cluster = ? AND taken_at <= ? ORDER BY taken_at DESC LIMIT 1",
+                (cluster, utc_timestamp(at))
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def objects(self, cluster, kind, at=None, namespace=None, snapshot_id=None):
+        """Records of ``kind`` in ``cluster`` as of ``at`` (or of snapshot ``snapshot_id``)."""
+        if snapshot_id is None:
+            snapshot = self.snapshot_at(cluster, at)
+            if snapshot is None:
+                return []
+            snapshot_id = snapshot["id"]
+        query = """
+            SELECT o.body FROM versions v JOIN objects o ON o.id = v.object_id
+            WHERE v.cluster = ? AND v.kind = ?{namespace}
+              AND v.valid_from <= ? AND (v.valid_to IS NULL OR v.valid_to > ?)
+            ORDER BY v.namespace, v.name
+        """
+        params = [cluster, kind]
+        if namespace is not None:
+            params.append(namespace)
+        params += [snapshot_id, snapshot_id]
+        query = query.format(namespace=" AND v.namespace = ?" if namespace is not None else "")
+        with self._lock:
+            return [json.loads(row[0]) for row in self._db.execute(query, params)]
+
+    def inventory_at(self, cluster, kinds, at=None, snapshot_id=None):
+        """The inventory of ``cluster`` as of ``at``, as a dict of record lists per kind."""
+        if snapshot_id is None:
+            snapshot = self.snapshot_at(cluster, at)
+            if snapshot is None:
+                return None
+            snapshot_id = snapshot["id"]
+        return {kind: self.objects(cluster, kind, snapshot_id=snapshot_id) for kind in kinds}
+
+
+class SnapshotRecorder:
+    """
+    Records added records into one snapshot per cluster. For every cluster
+    that received at least one record, ``commit`` closes the versions of the
+    recorded kinds that were not seen again, except for the kinds marked with
+    ``fail``.
+    """
+
+    def __init__(self, store, source=None, kinds=None):
+        self._store = store
+        self._source = source
+        self._kinds = set(kinds or ())
+        self._lock = threading.Lock()
+        self._clusters = {}  # cluster -> _ClusterSnapshot
+        self._failed = {}    # cluster -> kinds that failed to load
+
+    def begin(self, cluster):
+        """Open the snapshot of ``cluster`` even if no record is added to it."""
+        with self._lock, self._store._lock:
+            self._cluster_snapshot(cluster)
+
+    def _cluster_snapshot(self, cluster):
+        # Called with both locks held
+        snapshot = self._clusters.get(cluster)
+        if snapshot is None:
+            snapshot = self._clusters[cluster] = _ClusterSnapshot(self._store._db, cluster, self._source)
+        return snapshot
+
+    def add(self, kind, record, cluster=None):
+        cluster = cluster or record.get("cluster") or ""
+        body = stored_body(record)
+        text = json.dumps(body, sort_keys=True, separators=(',', ':'), default=self._store._default)
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        key = (kind, body.get("namespace") or "", body.get("name") or "")
+
+        with self._lock, self._store._lock:
+            self._kinds.add(kind)
+            self._cluster_snapshot(cluster).add(self._store._db, key, digest, text)
+
+    def fail(self, cluster, kinds):
+        """
+        Mark ``kinds`` of ``cluster`` as failed to load: the snapshot does not
+        record them, so their objects are not closed as deleted.
+        """
+        with self._lock:
+            self._failed.setdefault(cluster, set()).update(kinds)
+
+    def commit(self):
+        """Finish every cluster snapshot; returns ``{cluster: snapshot_id}``."""
+        with self._lock, self._store._lock:
+            db = self._store._db
+            ids = {}
+            for cluster, snapshot in self._clusters.items():
+                ids[cluster] = snapshot.finish(db, self._kinds - self._failed.get(cluster, set()))
+            db.commit()
+            self._clusters = {}
+            self._failed = {}
+        return ids
+
+    def rollback(self):
+        with self._lock, self._store._lock:
+            self._store._db.rollback()
+            self._clusters = {}
+            self._failed = {}
+
+
+class _ClusterSnapshot:
+    # Called with the store lock held
+
+    def __init__(self, db, cluster, source):
+        self.cluster = cluster
+        self.id = db.execute(
+            "INSERT INTO snapshots (cluster, taken_at, source, kinds) VALUES (?, ?, ?, '')",
+            (cluster, utc_timestamp(), source)
+        ).lastrowid
+        # Versions still open for this cluster: (kind, namespace, name) -> (version id, hash)
+        self.open = {
+            (row[0], row[1], row[2]): (row[3], row[4])
+            for row in db.execute(
+                "SELECT v.kind, v.namespace, v.name, v.id, o.hash FROM versions v "
+                "JOIN objects o ON o.id = v.object_id WHERE v.cluster = ? AND v.valid_to IS NULL",
+                (cluster,)
+            )
+        }
+        self.seen = set()
+        self.changed = 0
+
+    def add(self, db, key, digest, text):
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        current = self.open.get(key)
+        if current is not None and current[1] == digest:
+            return
+        if current is not None:
+            db.execute("UPDATE versions SET valid_to = ? WHERE id = ?", (self.id, current[0]))
+        db.execute("INSERT OR IGNORE INTO objects (hash, body) VALUES (?, ?)", (digest, text))
+        object_id = db.execute("SELECT id FROM objects WHERE hash = ?", (digest,)).fetchone()[0]
+        db.execute(
+            "INSERT INTO versions (cluster, kind, namespace, name, object_id, valid_from) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.cluster, key[0], key[1], key[2], object_id, self.id)
+        )
+        self.changed += 1
+
+    def finish(self, db, kinds):
+        gone = [
+            (self.id, version_id)
+            for key, (version_id, _) in self.open.items()
+            if key[0] in kinds and key not in self.seen
+        ]
+        db.executemany("UPDATE versions SET valid_to = ? WHERE id = ?", gone)
+        db.execute(
+            "UPDATE snapshots SET kinds = ?, object_count = ?, changed_count = ? WHERE id = ?",
+            (','.join(sorted(kinds)), len(self.seen), self.changed + len(gone), self.id)
+        )
+        return self.id
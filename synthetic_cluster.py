@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic cluster inventories for benchmarks and load tests.
+
+Generates Deployments, StatefulSets and Nodes shaped like the ones in
+k8s_inventory.json: team namespaces next to system ones, workloads with a
+bare "app" label, a couple of custom labels or the full set of Helm labels,
+and EKS-style nodes with their annotations and conditions. The output has the
+layout of the CLI inventory file, so it can seed fake_apiserver.py or be read
+by any tool that reads k8s_inventory.json. Generation is deterministic for a
+given size and seed.
+
+    python synthetic_cluster.py --size 10k --output /tmp/cluster-10k.json
+    python fake_apiserver.py --synthetic 10k --kubeconfig /tmp/fake-kubeconfig.yaml
+"""
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+# Named sizes: total number of objects
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+# Share of each kind in a cluster of a given size
+KIND_SHARES = {"deployments": 0.85, "statefulsets": 0.10, "nodes": 0.05}
+
+SYSTEM_NAMESPACES = ["kube-system", "cattle-system", "cattle-fleet-system", "monitoring", "ingress-nginx", "cert-manager"]
+ORGANIZATIONS = ["sbeavmc", "acme", "globex"]
+COMPONENTS = ["api", "web", "worker", "consumer", "scheduler", "gateway", "cache", "db"]
+CUSTOMER_BASES = ["retail", "business", "public"]
+TIERS = ["frontend", "backend", "data"]
+CHARTS = ["nginx", "redis", "postgresql", "kafka", "elasticsearch", "grafana", "prometheus"]
+INSTANCE_TYPES = ["t3.xlarge", "m5.2xlarge", "r5.xlarge", "c5.4xlarge"]
+NODE_CAPACITY = {
+    "t3.xlarge": ("4", "16181724Ki", "58"),
+    "m5.2xlarge": ("8", "32386732Ki", "58"),
+    "r5.xlarge": ("4", "32386732Ki", "58"),
+    "c5.4xlarge": ("16", "32386732Ki", "234")
+}
+CONDITIONS = [
+    ("MemoryPressure", "False", "KubeletHasSufficientMemory", "kubelet has sufficient memory available"),
+    ("DiskPressure", "False", "KubeletHasNoDiskPressure", "kubelet has no disk pressure"),
+    ("PIDPressure", "False", "KubeletHasSufficientPID", "kubelet has sufficient PID available"),
+    ("Ready", "True", "KubeletReady", "kubelet is posting ready status")
+]
+
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_size(value):
+    """Number of objects for a named size ("10k") or a plain number."""
+    if value in SIZES:
+        return SIZES[value]
+    if value.lower().endswith("k"):
+        return int(float(value[:-1]) * 1000)
+    return int(value)
+
+
+def kind_counts(size):
+    """Split ``size`` objects between the kinds, with at least one of each."""
+    counts = {kind: max(1, int(size * share)) for kind, share in KIND_SHARES.items()}
+    # Deployments take the rest, so rounding and the minimums add up to size
+    counts["deployments"] = max(1, size - counts["statefulsets"] - counts["nodes"])
+    return counts
+
+
+def _timestamp(rng):
+    return (EPOCH + timedelta(seconds=rng.randrange(600 * 24 * 3600))).isoformat()
+
+
+def _namespaces(rng, count):
+    namespaces = list(SYSTEM_NAMESPACES)
+    while len(namespaces) < count:
+        code = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(3))
+        namespace = f"{rng.choice(ORGANIZATIONS)}-{code}"
+        if namespace not in namespaces:
+            namespaces.append(namespace)
+    return namespaces
+
+
+def _workload_labels(rng, name, namespace):
+    style = rng.random()
+    if style < 0.55:
+        return {"app": name}
+    if style < 0.70:
+        return {"app": name, "customerBase": rng.choice(CUSTOMER_BASES), "tier": rng.choice(TIERS)}
+    if style < 0.72:
+        return None
+    chart = rng.choice(CHARTS)
+    version = f"{rng.randint(1, 9)}.{rng.randint(0, 20)}.{rng.randint(0, 9)}"
+    return {
+        "app.kubernetes.io/component": rng.choice(COMPONENTS),
+        "app.kubernetes.io/instance": namespace,
+        "app.kubernetes.io/managed-by": "Helm",
+        "app.kubernetes.io/name": name,
+        "app.kubernetes.io/part-of": namespace.split('-')[0],
+        "app.kubernetes.io/version": version,
+        "helm.sh/chart": f"{chart}-{version}"
+    }
+
+
+def _workload(rng, name, namespace):
+    replicas = rng.choice([1, 1, 1, 2, 2, 3, 5])
+    available = replicas if rng.random() < 0.95 else rng.randint(0, replicas - 1) or None
+    return {
+        "name": name,
+        "namespace": namespace,
+        "replicas": replicas,
+        "available_replicas": available,
+        "labels": _workload_labels(rng, name, namespace),
+        "creation_timestamp": _timestamp(rng)
+    }
+
+
+def _node(rng, index):
+    zone = f"eu-south-1{'abc'[index % 3]}"
+    address = f"10.{62 + index // 65536}.{index // 256 % 256}.{index % 256}"
+    hostname = f"ip-{address.replace('.', '-')}.eu-south-1.compute.internal"
+    instance_type = rng.choice(INSTANCE_TYPES)
+    cpu, memory, pods = NODE_CAPACITY[instance_type]
+    heartbeat = _timestamp(rng)
+    return {
+        "name": hostname,
+        "labels": {
+            "beta.kubernetes.io/arch": "amd64",
+            "beta.kubernetes.io/instance-type": instance_type,
+            "beta.kubernetes.io/os": "linux",
+            "eks.amazonaws.com/capacityType": rng.choice(["ON_DEMAND", "SPOT"]),
+            "eks.amazonaws.com/nodegroup": f"Node-group-{index % 4 + 1}",
+            "kubernetes.io/arch": "amd64",
+            "kubernetes.io/hostname": hostname,
+            "kubernetes.io/os": "linux",
+            "node.kubernetes.io/instance-type": instance_type,
+            "topology.kubernetes.io/region": "eu-south-1",
+            "topology.kubernetes.io/zone": zone
+        },
+        "annotations": {
+            "alpha.kubernetes.io/provided-node-ip": address,
+            "node.alpha.kubernetes.io/ttl": "0",
+            "volumes.kubernetes.io/controller-managed-attach-detach": "true"
+        },
+        "status": [
+            {
+                "last_heartbeat_time": heartbeat,
+                "last_transition_time": heartbeat,
+                "message": message,
+                "reason": reason,
+                "status": status,
+                "type": condition
+            }
+            for condition, status, reason, message in CONDITIONS
+        ],
+        "capacity": {"cpu": cpu, "ephemeral-storage": "20959212Ki", "memory": memory, "pods": pods},
+        "allocatable": {"cpu": f"{int(cpu) * 1000 - 80}m", "ephemeral-storage": "18242267924", "memory": memory,
+                        "pods": pods},
+        "creation_timestamp": _timestamp(rng)
+    }
+
+
+def generate_inventory(deployments, statefulsets, nodes, namespaces=None, seed=0):
+    """Return a synthetic inventory with the given number of objects per kind."""
+    rng = random.Random(seed)
+    namespace_names = _namespaces(rng, namespaces or max(len(SYSTEM_NAMESPACES), (deployments + statefulsets) // 25))
+    inventory = {"deployments": [], "statefulsets": [], "nodes": []}
+    for kind, count in (("deployments", deployments), ("statefulsets", statefulsets)):
+        prefix = "sts" if kind == "statefulsets" else "app"
+        for index in range(count):
+            namespace = rng.choice(namespace_names)
+            name = f"{namespace.split('-')[-1]}-{rng.choice(COMPONENTS)}-{prefix}-{index}"
+            inventory[kind].append(_workload(rng, name, namespace))
+    inventory["nodes"] = [_node(rng, index) for index in range(nodes)]
+    return inventory
+
+
+def generate_cluster(size, seed=0):
+    """Return a synthetic inventory of ``size`` objects (a number or a name such as "10k")."""
+    if isinstance(size, str):
+        size = parse_size(size)
+    return generate_inventory(**kind_counts(size), seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='1k', help=f"total objects: {', '.join(SIZES)} or a number")
+    parser.add_argument('--deployments', type=int, help="number of Deployments (overrides --size)")
+    parser.add_argument('--statefulsets', type=int, help="number of StatefulSets (overrides --size)")
+    parser.add_argument('--nodes', type=int, help="number of Nodes (overrides --size)")
+    parser.add_argument('--namespaces', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='synthetic_inventory.json')
+    args = parser.parse_args()
+
+    counts = kind_counts(parse_size(args.size))
+    for kind in counts:
+        if getattr(args, kind) is not None:
+            counts[kind] = getattr(args, kind)
+    inventory = generate_inventory(**counts, namespaces=args.namespaces, seed=args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(inventory, f)
+    print(f"Wrote {', '.join(f'{len(inventory[k])} {k}' for k in counts)} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
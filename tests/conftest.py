@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_apiserver import FakeCluster, serve  # noqa: E402
+
+
+def node_record(name):
+    return {
+        "name": name,
+        "labels": {"kubernetes.io/hostname": name},
+        "conditions": [{"type": "Ready", "status": "True", "reason": "KubeletReady"}],
+        "capacity": {"cpu": "4", "memory": "16Gi", "pods": "110"},
+        "allocatable": {"cpu": "3920m", "memory": "15Gi", "pods": "110"},
+        "creation_timestamp": "2024-09-01T00:00:00+00:00"
+    }
+
+
+def write_kubeconfig(path, servers):
+    # One context per fake API server, named after it
+    kubeconfig = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [{"name": name, "cluster": {"server": f"http://127.0.0.1:{server.server_address[1]}"}}
+                     for name, server in servers.items()],
+        "users": [{"name": "fake", "user": {"token": "fake"}}],
+        "contexts": [{"name": name, "context": {"cluster": name, "user": "fake"}} for name in servers],
+        "current-context": next(iter(servers))
+    }
+    with open(path, "w") as f:
+        json.dump(kubeconfig, f)
+
+
+@pytest.fixture
+def fake_fleet(tmp_path):
+    """Two fake API servers, "a" and "b", with nodes "<context>-node-<n>"; yields (kubeconfig path, clusters)."""
+    clusters, servers = {}, {}
+    for name in ("a", "b"):
+        clusters[name] = FakeCluster()
+        clusters[name].load_inventory({"nodes": [node_record(f"{name}-node-{i}") for i in range(3)]})
+        servers[name] = serve(clusters[name])
+    path = str(tmp_path / "kubeconfig")
+    write_kubeconfig(path, servers)
+    yield path, clusters
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
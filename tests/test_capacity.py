@@ -0,0 +1,87 @@
+import pytest
+
+from capacity import NO_VALUE, CapacityIndex, parse_quantity
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    ("0", 0.0),
+    ("110", 110.0),
+    ("3920m", 3.92),
+    ("100n", 1e-7),
+    ("250u", 2.5e-4),
+    ("1.5", 1.5),
+    (".5", 0.5),
+    ("1.", 1.0),
+    ("+2", 2.0),
+    ("-500m", -0.5),
+    (" 4 ", 4.0),
+    ("16Ki", 16384.0),
+    ("16069348Ki", 16069348 * 1024.0),
+    ("1.5Gi", 1.5 * 2 ** 30),
+    ("2Ei", 2.0 * 2 ** 60),
+    ("1k", 1000.0),
+    ("128M", 128e6),
+    ("1e3", 1000.0),
+    ("1E-3", 0.001),
+    ("5e+2", 500.0),
+    # "E" alone is the exa suffix, not an exponent
+    ("1E", 1e18),
+])
+def test_parse_quantity(quantity, expected):
+    assert parse_quantity(quantity) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("quantity", ["", " ", "Ki", "m", ".", "1.2.3", "1KiB", "1ki", "1K", "1 Ki", "1e", "1e3Ki",
+                                      "0x10", "one", "--1"])
+def test_parse_quantity_rejects_invalid_quantities(quantity):
+    with pytest.raises(ValueError):
+        parse_quantity(quantity)
+
+
+def node(name, cpu, memory, zone=None, role=None, cluster=None):
+    labels = {}
+    if zone:
+        labels["topology.kubernetes.io/zone"] = zone
+    if role:
+        labels[f"node-role.kubernetes.io/{role}"] = ""
+    record = {
+        "name": name,
+        "labels": labels,
+        "capacity": {"cpu": cpu, "memory": memory, "pods": "110"},
+        "allocatable": {"cpu": "3920m", "memory": "15Gi"}
+    }
+    if cluster:
+        record["cluster"] = cluster
+    return record
+
+
+NODES = [
+    node("node-1", "4", "16Gi", zone="eu-1b", role="worker", cluster="a"),
+    node("node-2", "4", "16Gi", zone="eu-1a", role="control-plane", cluster="a"),
+    node("node-3", "8", "32Gi", zone="eu-1a", cluster="b"),
+    node("node-4", "bogus", None, role="worker", cluster="b"),
+]
+
+
+def test_totals_skip_missing_and_invalid_quantities():
+    index = CapacityIndex(NODES)
+
+    assert index.totals() == {
+        "nodes": 4,
+        "capacity": {"cpu": 16.0, "memory": 64 * 2 ** 30, "pods": 440, "ephemeral-storage": 0},
+        "allocatable": {"cpu": 15.68, "memory": 60 * 2 ** 30, "pods": 0, "ephemeral-storage": 0}
+    }
+    assert index.invalid == 1
+
+
+def test_group_by_label_alias_role_and_cluster():
+    index = CapacityIndex(NODES)
+
+    zones = index.group_by("zone")
+    assert [(group["key"], group["nodes"], group["capacity"]["cpu"]) for group in zones] == [
+        ("eu-1a", 2, 12.0), ("eu-1b", 1, 4.0), (NO_VALUE, 1, 0.0)]
+    assert index.group_by("topology.kubernetes.io/zone") == zones
+    assert [(group["key"], group["nodes"]) for group in index.group_by("role")] == [
+        ("control-plane", 1), ("worker", 2), (NO_VALUE, 1)]
+    assert [(group["key"], group["capacity"]["memory"]) for group in index.group_by("cluster")] == [
+        ("a", 32 * 2 ** 30), ("b", 32 * 2 ** 30)]
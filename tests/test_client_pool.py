@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from kubernetes import client, config
+
+import app
+from k8s_client_pool import ApiClientPool
+
+
+def node_names(api_client):
+    return sorted(node.metadata.name for node in client.CoreV1Api(api_client).list_node().items)
+
+
+def test_concurrent_contexts_get_their_own_clients(fake_fleet):
+    kubeconfig, _ = fake_fleet
+    pool = ApiClientPool(kubeconfig)
+
+    def fetch(context):
+        api_client = pool.get(context)
+        return context, api_client, node_names(api_client)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(fetch, ["a", "b"] * 32))
+
+    for context, _, names in results:
+        assert names == [f"{context}-node-{i}" for i in range(3)]
+    # One client per context, shared by every request of that context
+    clients = {context: {id(api_client) for c, api_client, _ in results if c == context} for context in ("a", "b")}
+    assert all(len(ids) == 1 for ids in clients.values())
+    assert clients["a"] != clients["b"]
+    assert pool.generation == 1
+
+
+def test_api_nodes_mixed_contexts(fake_fleet, monkeypatch):
+    kubeconfig, _ = fake_fleet
+    monkeypatch.setattr(app, "api_client_pool", ApiClientPool(kubeconfig))
+    monkeypatch.setattr(app, "INVENTORY_MODE", "cache")
+
+    def fetch(context):
+        response = app.app.test_client().get(f"/api/nodes?context={context}")
+        return context, response.status_code, sorted(node["name"] for node in response.get_json())
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(fetch, ["a", "b"] * 16))
+
+    for context, status, names in results:
+        assert status == 200
+        assert names == [f"{context}-node-{i}" for i in range(3)]
+
+
+def test_kubeconfig_change_rebuilds_clients(fake_fleet):
+    kubeconfig, _ = fake_fleet
+    pool = ApiClientPool(kubeconfig)
+    first = pool.get("a")
+    assert pool.get("a") is first
+    generation = pool.generation
+
+    mtime = os.stat(kubeconfig).st_mtime + 10
+    os.utime(kubeconfig, (mtime, mtime))
+
+    rebuilt = pool.get("a")
+    assert pool.generation == generation + 1
+    assert rebuilt is not first
+    assert node_names(rebuilt) == ["a-node-0", "a-node-1", "a-node-2"]
+    assert pool.get("a") is rebuilt
+
+
+def test_unknown_context_is_rejected_before_loading(fake_fleet, monkeypatch):
+    kubeconfig, _ = fake_fleet
+    pool = ApiClientPool(kubeconfig)
+    loaded = []
+    load_kube_config = config.load_kube_config
+    monkeypatch.setattr(config, "load_kube_config",
+                        lambda **kwargs: loaded.append(kwargs["context"]) or load_kube_config(**kwargs))
+
+    for i in range(100):
+        with pytest.raises(config.ConfigException, match="not found"):
+            pool.get(f"bogus-{i}")
+    assert loaded == []
+
+    assert node_names(pool.get("a")) == ["a-node-0", "a-node-1", "a-node-2"]
+    assert node_names(pool.get()) == ["a-node-0", "a-node-1", "a-node-2"]
+    assert loaded == ["a", None]
@@ -0,0 +1,70 @@
+import json
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+from inventory_cache import InventoryCache
+from inventory_records import json_default
+from k8s_client_pool import ApiClientPool
+
+QUERY = {"namespace": '', "kinds": app.ALL_KINDS, "label_selector": '', "field_selector": '', "metadata_only": False}
+
+
+@pytest.fixture
+def fleet_app(fake_fleet, monkeypatch):
+    kubeconfig, clusters = fake_fleet
+    monkeypatch.setattr(app, "api_client_pool", ApiClientPool(kubeconfig))
+    monkeypatch.setattr(app, "INVENTORY_MODE", "cache")
+    monkeypatch.setattr(app, "snapshot_store", None)
+    monkeypatch.setattr(app, "inventory_cache", InventoryCache(app.load_cached_inventory, ttl=60, stale_ttl=300))
+    monkeypatch.setattr(app, "fleet_inventories", app.OrderedDict())
+    return clusters
+
+
+def test_unresponsive_cluster_fails_on_request_timeout(fleet_app, monkeypatch):
+    fleet_app["b"].latency = 3
+    monkeypatch.setattr(app, "K8S_REQUEST_TIMEOUT", 0.3)
+    monkeypatch.setattr(app, "FLEET_CLUSTER_TIMEOUT", 10)
+
+    start = time.monotonic()
+    inventory, _ = app.load_fleet_inventory(["a", "b"], **QUERY)
+
+    assert time.monotonic() - start < 2
+    assert sorted(node["name"] for node in inventory["nodes"]) == ["a-node-0", "a-node-1", "a-node-2"]
+    assert "timed out" in inventory["errors"]["b"]
+
+
+def test_queued_cluster_times_out_at_fleet_deadline(fleet_app, monkeypatch):
+    fleet_app["a"].latency = 3
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app, "fleet_executor", executor)
+    monkeypatch.setattr(app, "FLEET_TIMEOUT", 1)
+    monkeypatch.setattr(app, "FLEET_CLUSTER_TIMEOUT", 10)
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError) as excinfo:
+        app.load_fleet_inventory(["a", "b"], **QUERY)
+
+    assert time.monotonic() - start < 2
+    assert "'a': 'Fleet request timed out after 1s'" in str(excinfo.value)
+    assert "'b': 'Timed out after 1s waiting for a worker'" in str(excinfo.value)
+    executor.shutdown(wait=False)
+
+
+def test_merged_records_wrap_the_cluster_records(fleet_app):
+    inventory, _ = app.load_fleet_inventory(["a", "b"], **QUERY)
+    members = {context: app.inventory_cache.get((context, '', app.ALL_KINDS, '', '', False))[0]
+               for context in ("a", "b")}
+
+    nodes = inventory["nodes"]
+    assert [node["cluster"] for node in nodes] == ["a"] * 3 + ["b"] * 3
+    assert all(node.record is members[node["cluster"]]["nodes"][i % 3] for i, node in enumerate(nodes))
+    assert json.loads(json.dumps(nodes[0], default=json_default)) == {
+        **json.loads(json.dumps(members["a"]["nodes"][0], default=json_default)), "cluster": "a"}
+    assert list(nodes[0])[-1] == "cluster"
+    assert pickle.loads(pickle.dumps(nodes[0])) == nodes[0]
+    # The same member inventories give back the same merged inventory
+    assert app.load_fleet_inventory(["a", "b"], **QUERY)[0] is inventory
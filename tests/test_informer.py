@@ -0,0 +1,75 @@
+import functools
+import time
+
+from kubernetes import client
+
+from k8s_client_pool import ApiClientPool
+from k8s_informer import InventoryInformer
+
+
+def deployment(name, replicas):
+    return {
+        "metadata": {"name": name, "namespace": "default", "labels": {"app": name}},
+        "spec": {
+            "replicas": replicas,
+            "selector": {"matchLabels": {"app": name}},
+            "template": {"metadata": {"labels": {"app": name}},
+                         "spec": {"containers": [{"name": name, "image": "registry.local/app:latest"}]}}
+        },
+        "status": {"replicas": replicas, "availableReplicas": replicas}
+    }
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.05)
+
+
+def test_informer_follows_scripted_events_and_relists_after_compaction(fake_fleet):
+    kubeconfig, clusters = fake_fleet
+    cluster = clusters["a"]
+    for name in ("web", "api"):
+        cluster.apply("deployments", "ADDED", deployment(name, 1))
+
+    list_fn = client.AppsV1Api(ApiClientPool(kubeconfig).get("a")).list_deployment_for_all_namespaces
+    lists = []
+
+    @functools.wraps(list_fn)
+    def counted_list(**kwargs):
+        if not kwargs.get("watch"):
+            lists.append(kwargs)
+        return list_fn(**kwargs)
+
+    informer = InventoryInformer("a", {
+        "deployments": (counted_list, lambda dep: {"name": dep.metadata.name, "replicas": dep.spec.replicas})
+    }, watch_timeout=30)
+    informer.start()
+    try:
+        assert informer.wait_for_sync(10)
+
+        def store():
+            return {record["name"]: record["replicas"] for record in informer.inventory()["deployments"]}
+
+        assert store() == {"web": 1, "api": 1}
+        relists = len(lists)
+
+        cluster.play([
+            {"type": "ADDED", "resource": "deployments", "object": deployment("worker", 2)},
+            {"type": "MODIFIED", "resource": "deployments", "object": deployment("web", 3)},
+            {"type": "DELETED", "resource": "deployments", "object": deployment("api", 1)}
+        ])
+        wait_until(lambda: store() == {"web": 3, "worker": 2})
+        assert len(lists) == relists
+
+        # A change the watch never sees, then a compaction: only the relist
+        # that follows 410 Gone can pick it up
+        cluster.update("deployments", deployment("worker", 7))
+        cluster.play([{"type": "COMPACT"}])
+
+        wait_until(lambda: store() == {"web": 3, "worker": 7})
+        assert len(lists) > relists
+    finally:
+        informer.stop()
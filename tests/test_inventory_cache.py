@@ -0,0 +1,167 @@
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import inventory_cache
+from inventory_cache import DerivedViews, InventoryCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(inventory_cache, "time", types.SimpleNamespace(monotonic=clock))
+    return clock
+
+
+class Loader:
+    """Returns ``(key, n)`` for the n-th load; loads block while ``gate`` is cleared."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.lock = threading.Lock()
+
+    def __call__(self, key):
+        self.gate.wait(10)
+        with self.lock:
+            self.calls.append(key)
+            return key, len(self.calls)
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_fresh_entries_are_served_from_the_cache(clock):
+    loader = Loader()
+    cache = InventoryCache(loader, ttl=60, stale_ttl=300)
+
+    assert cache.get("a") == (("a", 1), 0.0)
+    clock.now += 59
+    assert cache.get("a") == (("a", 1), 59)
+    assert cache.peek("a") == (("a", 1), 59)
+    assert loader.calls == ["a"]
+    assert (cache.hits, cache.stale_hits, cache.misses) == (2, 0, 1)
+
+
+def test_stale_entries_are_served_while_revalidating(clock):
+    loader = Loader()
+    cache = InventoryCache(loader, ttl=60, stale_ttl=300)
+    cache.get("a")
+
+    clock.now += 120
+    loader.gate.clear()
+    # Returned at once, although the refresh is blocked
+    assert cache.get("a") == (("a", 1), 120)
+    assert cache.peek("a") is None
+    # Only one refresh runs per key
+    assert cache.get("a") == (("a", 1), 120)
+    loader.gate.set()
+
+    wait_until(lambda: cache.peek("a") is not None)
+    assert cache.get("a") == (("a", 2), 0.0)
+    assert loader.calls == ["a", "a"]
+    assert cache.stale_hits == 2
+
+
+def test_failed_refresh_keeps_the_stale_entry(clock):
+    failed = threading.Event()
+
+    def loader(key):
+        if clock.now > 1000:
+            failed.set()
+            raise RuntimeError("API server unreachable")
+        return {"nodes": []}
+
+    cache = InventoryCache(loader, ttl=60, stale_ttl=300)
+    first, _ = cache.get("a")
+    clock.now += 120
+    assert cache.get("a")[0] is first
+    assert failed.wait(10)
+    assert cache.get("a")[0] is first
+    # Past the stale window the error reaches the caller
+    clock.now += 300
+    with pytest.raises(RuntimeError):
+        cache.get("a")
+
+
+def test_entries_past_the_stale_window_are_reloaded_synchronously(clock):
+    loader = Loader()
+    cache = InventoryCache(loader, ttl=60, stale_ttl=300)
+    cache.get("a")
+
+    clock.now += 360
+    assert cache.get("a") == (("a", 2), 0.0)
+    assert cache.misses == 2
+
+
+def test_concurrent_misses_load_once():
+    loader = Loader()
+    loader.gate.clear()
+    cache = InventoryCache(loader)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = [executor.submit(cache.get, "a") for _ in range(8)]
+        time.sleep(0.1)
+        loader.gate.set()
+        values = {future.result()[0] for future in results}
+
+    assert values == {("a", 1)}
+    assert loader.calls == ["a"]
+
+
+def test_failed_load_is_raised_and_retried():
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise RuntimeError("Unknown context")
+        return key
+
+    cache = InventoryCache(loader)
+    with pytest.raises(RuntimeError):
+        cache.get("a")
+    assert cache.get("a") == ("a", 0.0)
+    assert calls == ["a", "a"]
+
+
+def test_least_recently_used_entry_is_evicted():
+    loader = Loader()
+    cache = InventoryCache(loader, max_entries=2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+
+    assert cache.peek("a") is not None
+    assert cache.peek("b") is None
+    assert cache.peek("c") is not None
+
+
+def test_derived_views_are_rebuilt_for_new_inventories():
+    builds = []
+    views = DerivedViews(lambda inventory: builds.append(inventory) or len(builds))
+    first, second = {"nodes": []}, {"nodes": []}
+
+    assert views.get("a", first) == 1
+    assert views.get("a", first) == 1
+    # An equal but different inventory is a new load
+    assert views.get("a", second) == 2
+    assert builds == [first, second]
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+import inventory_diff
+from inventory_diff import diff_inventories, iter_diff, iter_records
+from inventory_stream import RecordStreamWriter, iter_json, iter_ndjson
+
+
+def workload(name, replicas=2, labels=None, namespace="shop"):
+    return {
+        "name": name,
+        "namespace": namespace,
+        "replicas": replicas,
+        "available_replicas": replicas,
+        "creation_timestamp": "2024-09-01T00:00:00+00:00",
+        "labels": labels
+    }
+
+
+def node(name, ready="True"):
+    return {"name": name, "labels": {"kubernetes.io/os": "linux"}, "conditions": [{"type": "Ready", "status": ready}]}
+
+
+OLD = {
+    "deployments": [workload("web", labels={"app": "web", "tier": "frontend"}), workload("api")],
+    "statefulsets": [workload("db", 3)],
+    "nodes": [node("node-1"), node("node-2")]
+}
+
+NEW = {
+    "deployments": [workload("web", 3, labels={"app": "web", "track": "stable"}), workload("worker")],
+    "statefulsets": [workload("db", 3)],
+    "nodes": [node("node-1", ready="False"), node("node-2")]
+}
+
+
+def test_added_removed_and_changed_objects():
+    diff = diff_inventories(OLD, NEW)
+
+    assert diff["summary"] == {"added": 1, "removed": 1, "changed": 2}
+    assert diff["added"] == [{"change": "added", "kind": "deployments", "namespace": "shop", "name": "worker"}]
+    assert diff["removed"] == [{"change": "removed", "kind": "deployments", "namespace": "shop", "name": "api"}]
+    web, node_1 = diff["changed"]
+    assert web["name"] == "web"
+    assert web["changes"] == {
+        "replicas": [2, 3],
+        "available_replicas": [2, 3],
+        "labels": {"added": {"track": "stable"}, "removed": {"tier": "frontend"}}
+    }
+    assert node_1 == {"change": "changed", "kind": "nodes", "namespace": None, "name": "node-1",
+                      "changes": {"conditions": {"changed": {"Ready": ["True", "False"]}}}}
+
+
+def test_equal_inventories_have_no_differences():
+    assert diff_inventories(OLD, json.loads(json.dumps(OLD)))["summary"] == {"added": 0, "removed": 0, "changed": 0}
+
+
+def test_cli_and_web_app_shapes_compare_equal():
+    # The CLI keeps node conditions under "status" and a missing availableReplicas as None
+    old = {"deployments": [{**workload("web"), "available_replicas": None}],
+           "nodes": [{"name": "node-1", "status": [{"type": "Ready", "status": "True"}]}]}
+    new = {"deployments": [{**workload("web"), "available_replicas": 0}], "nodes": [node("node-1")]}
+    new["nodes"][0]["labels"] = None
+
+    assert list(iter_diff(old, new)) == []
+
+
+def test_same_name_in_other_namespace_or_cluster_is_another_object():
+    old = {"deployments": [{**workload("web"), "cluster": "a"}]}
+    new = {"deployments": [{**workload("web"), "cluster": "b"}, {**workload("web", namespace="blog"), "cluster": "a"}]}
+
+    changes = [(entry["change"], entry.get("cluster"), entry["namespace"]) for entry in iter_diff(old, new)]
+    assert changes == [("added", "b", "shop"), ("added", "a", "blog"), ("removed", "a", "shop")]
+
+
+def test_kinds_limit_the_diff():
+    diff = diff_inventories(OLD, NEW, kinds=("nodes",))
+    assert diff["summary"] == {"added": 0, "removed": 0, "changed": 1}
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson", "array"])
+def test_inventory_files_are_read_incrementally(tmp_path, monkeypatch, fmt):
+    # Small reads so records and numbers straddle chunk boundaries
+    monkeypatch.setattr(inventory_diff, "READ_SIZE", 7)
+    path = str(tmp_path / f"inventory.{fmt}")
+    kinds = list(NEW)
+    if fmt == "json":
+        with open(path, "w") as f:
+            f.writelines(iter_json(NEW, kinds, extra={"errors": {"pods": "Forbidden"}}))
+    elif fmt == "ndjson":
+        with open(path, "w") as f:
+            f.writelines(iter_ndjson(NEW, kinds))
+    else:
+        with RecordStreamWriter(path, fmt="array") as writer:
+            for kind in kinds:
+                for record in NEW[kind]:
+                    writer.write(kind, record)
+
+    assert list(iter_records(path)) == list(iter_records(NEW))
+    assert diff_inventories(OLD, path) == diff_inventories(OLD, NEW)
+
+
+def test_truncated_json_inventory_is_an_error(tmp_path):
+    path = tmp_path / "inventory.json"
+    path.write_text(json.dumps(NEW)[:-20])
+
+    with pytest.raises(ValueError):
+        list(iter_records(str(path)))
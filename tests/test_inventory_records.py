@@ -0,0 +1,66 @@
+import json
+import pickle
+import sys
+
+import inventory_records
+from inventory_records import NodeRecord, WorkloadRecord, json_default
+
+RESPONSE = json.dumps({
+    "name": "web",
+    "namespace": "team-payments",
+    "replicas": 3,
+    "available_replicas": 3,
+    "creation_timestamp": "2024-09-01T00:00:00+00:00",
+    "labels": {"app.kubernetes.io/name": "web", "app.kubernetes.io/part-of": "payments"}
+})
+
+
+def packed(record, field):
+    return object.__getattribute__(record, field)
+
+
+def test_records_from_separate_responses_share_interned_keys():
+    # Two decodes of the same response hold equal but distinct strings, neither
+    # of them the interned one
+    interned = sys.intern("".join(["app.kubernetes.io/", "name"]))
+    first, second = json.loads(RESPONSE), json.loads(RESPONSE)
+    assert first["namespace"] is not second["namespace"]
+    assert next(iter(first["labels"])) is not next(iter(second["labels"]))
+
+    record_a, record_b = WorkloadRecord.from_dict(first), WorkloadRecord.from_dict(second)
+
+    keys_a, keys_b = packed(record_a, "labels")[0], packed(record_b, "labels")[0]
+    assert keys_a is keys_b
+    assert keys_a[0] is keys_b[0]
+    assert keys_a[0] is interned
+    assert packed(record_a, "labels")[2] is packed(record_b, "labels")[2]
+    assert record_a["namespace"] is record_b["namespace"]
+
+
+def test_cleared_key_table_still_interns_keys(monkeypatch):
+    monkeypatch.setattr(inventory_records, "MAX_KEY_TUPLES", 1)
+    record_a = WorkloadRecord.from_dict(json.loads(RESPONSE))
+    NodeRecord.from_dict({"name": "node-1", "labels": {"kubernetes.io/os": "linux"}})
+    record_b = WorkloadRecord.from_dict(json.loads(RESPONSE))
+
+    assert packed(record_a, "labels")[0][0] is packed(record_b, "labels")[0][0]
+
+
+def test_record_reads_and_serializes_like_its_dict():
+    record = json.loads(RESPONSE)
+    node = {
+        "name": "node-1",
+        "labels": {"kubernetes.io/os": "linux"},
+        "annotations": None,
+        "conditions": [{"type": "Ready", "status": "True", "reason": None}],
+        "capacity": {"cpu": "4"},
+        "allocatable": {"cpu": "3920m"},
+        "creation_timestamp": "2024-09-01T00:00:00+00:00"
+    }
+
+    for value, record_type in ((record, WorkloadRecord), (node, NodeRecord)):
+        compact = record_type.from_dict(value)
+        assert compact.to_dict() == value
+        assert {**compact} == value
+        assert json.dumps(compact, default=json_default) == json.dumps(value)
+        assert pickle.loads(pickle.dumps(compact)) == compact
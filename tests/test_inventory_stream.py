@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+
+import pytest
+
+from inventory_stream import CHUNK_SIZE, RecordStreamWriter, iter_json, iter_ndjson, write_json_atomic
+
+KINDS = ["deployments", "nodes"]
+INVENTORY = {
+    "deployments": [{"name": f"app-{i}", "namespace": "shop", "labels": {"app": f"app-{i}"}} for i in range(50)],
+    "nodes": [{"name": "node-1", "conditions": [{"type": "Ready", "status": "True"}]}],
+    "pods": [{"name": "left-out"}]
+}
+
+
+def test_json_stream_matches_json_dumps():
+    large = {**INVENTORY, "deployments": INVENTORY["deployments"] * 100}
+    chunks = list(iter_json(large, KINDS, extra={"errors": {}}))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) < 2 * CHUNK_SIZE for chunk in chunks)
+    assert ''.join(chunks) == json.dumps({"deployments": large["deployments"], "nodes": large["nodes"], "errors": {}})
+    assert ''.join(iter_json({}, KINDS)) == '{"deployments": [], "nodes": []}'
+
+
+def test_ndjson_stream_tags_records_with_their_kind():
+    lines = ''.join(iter_ndjson(INVENTORY, KINDS)).splitlines()
+
+    assert len(lines) == 51
+    assert json.loads(lines[0]) == {"kind": "deployments", **INVENTORY["deployments"][0]}
+    assert json.loads(lines[-1]) == {"kind": "nodes", **INVENTORY["nodes"][0]}
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "array"])
+def test_writer_replaces_the_file_on_close(tmp_path, fmt):
+    path = tmp_path / f"inventory.{fmt}"
+    path.write_text("previous")
+
+    with RecordStreamWriter(str(path), fmt=fmt) as writer:
+        threads = [threading.Thread(target=lambda kind=kind: [writer.write(kind, record) for record in INVENTORY[kind]])
+                   for kind in KINDS]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert path.read_text() == "previous"
+
+    text = path.read_text()
+    records = json.loads(text) if fmt == "array" else [json.loads(line) for line in text.splitlines()]
+    assert writer.count == len(records) == 51
+    assert sorted(record["name"] for record in records if record["kind"] == "deployments") == \
+        sorted(record["name"] for record in INVENTORY["deployments"])
+    assert os.listdir(tmp_path) == [path.name]
+
+
+def test_writer_leaves_the_file_alone_on_error(tmp_path):
+    path = tmp_path / "inventory.ndjson"
+    path.write_text("previous")
+
+    with pytest.raises(RuntimeError):
+        with RecordStreamWriter(str(path)) as writer:
+            writer.write("nodes", {"name": "node-1"})
+            raise RuntimeError("cluster unreachable")
+
+    assert path.read_text() == "previous"
+    assert os.listdir(tmp_path) == [path.name]
+    with pytest.raises(ValueError):
+        writer.write("nodes", {"name": "node-2"})
+
+
+def test_unknown_stream_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RecordStreamWriter(str(tmp_path / "inventory"), fmt="xml")
+
+
+def test_write_json_atomic_cleans_up_on_error(tmp_path):
+    path = tmp_path / "inventory.json"
+
+    def chunks():
+        yield '{"nodes": ['
+        raise OSError("No space left on device")
+
+    with pytest.raises(OSError):
+        write_json_atomic(str(path), chunks())
+    assert os.listdir(tmp_path) == []
+
+    write_json_atomic(str(path), iter_json(INVENTORY, KINDS))
+    assert json.loads(path.read_text())["nodes"] == INVENTORY["nodes"]
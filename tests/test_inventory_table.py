@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+from inventory_table import InventoryTableView
+
+
+def workload(name, namespace, replicas=1, labels=None):
+    return {
+        "name": name,
+        "namespace": namespace,
+        "replicas": replicas,
+        "available_replicas": replicas,
+        "creation_timestamp": f"2024-09-{replicas:02d}T00:00:00+00:00",
+        "labels": labels
+    }
+
+
+class SlowOrderedDict(OrderedDict):
+    # Lets other threads run between a lookup and what follows it
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        time.sleep(0.0001)
+        return value
+
+
+def test_concurrent_queries_share_one_view():
+    inventory = {"deployments": [workload(f"app-{i}", f"ns-{i % 7}") for i in range(50)]}
+    # Three orderings over two slots: queries keep hitting orderings that
+    # other threads are evicting
+    view = InventoryTableView(inventory, max_filtered=2)
+    view._filtered = SlowOrderedDict()
+    errors = []
+
+    def query(worker):
+        try:
+            for i in range(300):
+                search = f"app-{(worker + i) % 3}"
+                _, rows = view.query(0, 10, search=search)
+                assert all(search in row[1] for row in rows)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=query, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(view._filtered) <= 2
+
+
+def table_inventory():
+    return {
+        "deployments": [
+            workload("web", "shop", 3, {"app": "web"}),
+            workload("api", "shop", 2, {"app": "api", "tier": "backend"}),
+            workload("batch", "jobs", 1),
+        ],
+        "statefulsets": [workload("db", "shop", 4)],
+        "nodes": [{"name": "node-1", "labels": {"kubernetes.io/os": "linux"}}]
+    }
+
+
+def names(rows):
+    return [row[1] for row in rows]
+
+
+def test_rows_follow_the_table_columns():
+    view = InventoryTableView(table_inventory())
+
+    total, rows = view.query(0, -1, order_column=1)
+    assert total == 5
+    assert rows[0] == ("Deployment", "api", "shop", 2, 2, "2024-09-02T00:00:00+00:00", "app: api, tier: backend")
+    assert ("Node", "node-1", None, None, None, None, "kubernetes.io/os: linux") in rows
+    assert view.namespaces == ["jobs", "shop"]
+
+
+def test_pages_slice_the_sorted_rows():
+    view = InventoryTableView(table_inventory())
+
+    assert view.query(0, 2) == (5, view.query(0, -1)[1][:2])
+    assert names(view.query(0, 2)[1]) == ["api", "batch"]
+    assert names(view.query(2, 2)[1]) == ["db", "node-1"]
+    assert names(view.query(4, 2)[1]) == ["web"]
+    assert view.query(10, 2) == (5, [])
+
+
+def test_sorting_by_column_and_direction():
+    view = InventoryTableView(table_inventory())
+
+    assert names(view.query(0, -1, order_column=3)[1]) == ["node-1", "batch", "api", "web", "db"]
+    assert names(view.query(0, -1, order_column=3, descending=True)[1]) == ["db", "web", "api", "batch", "node-1"]
+    # Unknown columns sort by name
+    assert names(view.query(0, -1, order_column=42)[1]) == ["api", "batch", "db", "node-1", "web"]
+
+
+def test_search_and_filters():
+    view = InventoryTableView(table_inventory())
+
+    # Case-insensitive, over every column including labels
+    assert names(view.query(0, -1, search="BACKEND")[1]) == ["api"]
+    assert names(view.query(0, -1, search="shop")[1]) == ["api", "db", "web"]
+    assert names(view.query(0, -1, resource_type="statefulset")[1]) == ["db"]
+    assert names(view.query(0, -1, namespace="shop", search="2024-09-0")[1]) == ["api", "db", "web"]
+    assert names(view.query(0, -1, namespace="jobs", search="2024-09-0")[1]) == ["batch"]
+    total, rows = view.query(0, 1, namespace="shop", descending=True)
+    assert (total, names(rows)) == (3, ["web"])
+    assert view.query(0, 10, search="missing") == (0, [])
+
+
+def test_view_belongs_to_its_inventory():
+    inventory = table_inventory()
+    view = InventoryTableView(inventory)
+
+    assert view.is_view_of(inventory)
+    assert view.is_view_of({**inventory, "pods": []})
+    assert not view.is_view_of({**inventory, "nodes": list(inventory["nodes"])})
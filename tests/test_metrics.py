@@ -0,0 +1,35 @@
+import pytest
+
+import app
+from inventory_cache import InventoryCache
+from k8s_client_pool import ApiClientPool
+from metrics import REGISTRY
+
+
+@pytest.fixture
+def metrics_app(fake_fleet, monkeypatch):
+    kubeconfig, _ = fake_fleet
+    monkeypatch.setattr(app, "api_client_pool", ApiClientPool(kubeconfig))
+    monkeypatch.setattr(app, "INVENTORY_MODE", "cache")
+    monkeypatch.setattr(app, "snapshot_store", None)
+    monkeypatch.setattr(app, "inventory_cache", InventoryCache(app.load_cached_inventory, ttl=60, stale_ttl=300))
+    monkeypatch.setattr(app, "fleet_inventories", app.OrderedDict())
+    return app.app.test_client()
+
+
+def context_labels():
+    return {line.split('context="', 1)[1].split('"', 1)[0]
+            for line in REGISTRY.exposition().splitlines() if 'context="' in line}
+
+
+def test_context_labels_are_kubeconfig_contexts(metrics_app):
+    assert metrics_app.get("/data?context=a,b").status_code == 200
+    assert metrics_app.get("/data?context=b,a").status_code == 200
+    metrics_app.get("/data?context=not-a-context-1")
+    metrics_app.get("/data?context=not-a-context-2")
+
+    labels = context_labels()
+    assert {"a", "b", "fleet"} <= labels
+    assert not any("," in label or label.startswith("not-a-context") for label in labels)
+    assert [app.metric_context(c) for c in (None, "a", "*", "a,b", "not-a-context")] == ['', "a", "fleet", "fleet",
+                                                                                        "unknown"]
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from inventory_records import NodeRecord
+from pdf_cache import PdfCache, report_key
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "report.html"
+    path.write_text("<h1>{{ title }}</h1>")
+    return path
+
+
+def test_report_key_follows_template_data_and_options(template):
+    data = {"inventory": {"nodes": [{"name": "node-1", "labels": {"b": "2", "a": "1"}}]}}
+    key = report_key(str(template), data, 2000)
+
+    assert key == report_key(str(template), {"inventory": {"nodes": [{"labels": {"a": "1", "b": "2"}, "name": "node-1"}]}},
+                             2000)
+    assert key != report_key(str(template), data, 500)
+    assert key != report_key(str(template), {"inventory": {"nodes": []}}, 2000)
+    template.write_text("<h2>{{ title }}</h2>")
+    assert key != report_key(str(template), data, 2000)
+
+
+def test_records_hash_like_their_dicts(template):
+    node = {"name": "node-1", "labels": {"kubernetes.io/os": "linux"}, "annotations": None, "conditions": [],
+            "capacity": {}, "allocatable": {}, "creation_timestamp": None}
+
+    assert report_key(str(template), {"nodes": [NodeRecord.from_dict(node)]}) == \
+        report_key(str(template), {"nodes": [node]})
+
+
+def test_put_and_open(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"))
+
+    assert "report" not in cache
+    assert cache.open("report") is None
+    cache.put("report", b"%PDF-1")
+    assert "report" in cache
+    with cache.open("report") as f:
+        assert f.read() == b"%PDF-1"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert os.listdir(tmp_path / "cache") == ["report.pdf"]
+
+
+def test_least_recently_used_reports_are_evicted(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=20)
+    cache.put("a", b"x" * 8)
+    cache.put("b", b"x" * 8)
+    # An open file stays readable after its eviction
+    opened = cache.open("b")
+    cache.open("a").close()
+    cache.put("c", b"x" * 8)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert sorted(os.listdir(tmp_path)) == ["a.pdf", "c.pdf"]
+    assert opened.read() == b"x" * 8
+    opened.close()
+
+
+def test_cache_is_rebuilt_from_disk(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=20)
+    cache.put("old", b"x" * 8)
+    cache.put("new", b"x" * 8)
+    os.utime(tmp_path / "old.pdf", (1, 1))
+    (tmp_path / "interrupted.tmp").write_bytes(b"partial")
+
+    restarted = PdfCache(str(tmp_path), max_bytes=20)
+    assert not (tmp_path / "interrupted.tmp").exists()
+    restarted.put("newest", b"x" * 8)
+    assert "old" not in restarted
+    assert "new" in restarted and "newest" in restarted
+
+
+def test_file_removed_behind_the_cache_is_a_miss(tmp_path):
+    cache = PdfCache(str(tmp_path))
+    cache.put("report", b"%PDF-1")
+    os.unlink(cache.path("report"))
+
+    assert cache.open("report") is None
+    assert "report" not in cache
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import pytest
+
+import app
+from pdf_cache import PdfCache
+from pdf_jobs import DONE, FAILED, PdfJobManager
+
+
+def render_bytes(size):
+    return b"%PDF-" + b"x" * size
+
+
+class SlowReceiveManager(PdfJobManager):
+    """Holds each worker message in the pipe until ``release`` is set."""
+
+    receiving = threading.Event()
+    release = threading.Event()
+
+    @classmethod
+    def _receive(cls, worker):
+        cls.receiving.set()
+        cls.release.wait(10)
+        return PdfJobManager._receive(worker)
+
+
+@pytest.fixture
+def manager_factory():
+    managers = []
+
+    def factory(cls=PdfJobManager, **kwargs):
+        managers.append(cls(render_bytes, max_workers=1, start_method='fork', **kwargs))
+        return managers[-1]
+
+    yield factory
+    for manager in managers:
+        manager.shutdown()
+
+
+def test_job_with_on_done_keeps_only_its_size(manager_factory):
+    stored = {}
+    manager = manager_factory(on_done=lambda job, result: stored.setdefault(job.key, result))
+
+    job = manager.submit(1000, key="report")
+    assert job.wait(30)
+
+    assert job.status == DONE
+    assert job.result is None
+    assert job.size == len(stored["report"]) == 1005
+    assert job.to_dict()["size"] == 1005
+
+
+def test_job_fails_when_on_done_cannot_store_the_result(manager_factory):
+    def on_done(job, result):
+        raise OSError("No space left on device")
+
+    manager = manager_factory(on_done=on_done)
+    job = manager.submit(10)
+    assert job.wait(30)
+
+    assert job.status == FAILED
+    assert "No space left on device" in job.error
+
+
+def test_results_are_received_outside_the_lock(manager_factory):
+    manager = manager_factory(cls=SlowReceiveManager)
+    job = manager.submit(10)
+    try:
+        assert SlowReceiveManager.receiving.wait(30)
+        # The dispatcher is reading the result: the manager still answers
+        counts = []
+        reader = threading.Thread(target=lambda: counts.append(manager.status_counts()))
+        reader.start()
+        reader.join(2)
+        assert counts == [{"running": 1}]
+    finally:
+        SlowReceiveManager.release.set()
+    assert job.wait(30)
+    assert job.status == DONE
+    assert job.result == render_bytes(10)
+
+
+def test_download_serves_the_cached_pdf(manager_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "pdf_cache", PdfCache(str(tmp_path)))
+    monkeypatch.setattr(app, "pdf_jobs", manager_factory(on_done=app.cache_rendered_pdf))
+    test_client = app.app.test_client()
+
+    job = app.pdf_jobs.submit(100, key="report")
+    assert job.wait(30) and job.status == DONE
+    assert job.result is None
+
+    response = test_client.get(f"/pdf_jobs/{job.id}/pdf")
+    assert response.status_code == 200
+    assert response.data == render_bytes(100)
+    assert response.headers["ETag"] == '"report"'
+
+    os.unlink(app.pdf_cache.path("report"))
+    response = test_client.get(f"/pdf_jobs/{job.id}/pdf")
+    assert response.status_code == 410
@@ -0,0 +1,97 @@
+import io
+import re
+import sys
+import types
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+import pdf_report
+
+PAGES_PER_SLICE = 3
+
+
+def report_data(rows):
+    return {
+        "inventory": {"nodes": [{"name": f"node-{i}"} for i in range(rows)]},
+        "headers": {"nodes": ["Name"]},
+        "keys": {"nodes": ["name"]}
+    }
+
+
+def first_page_rule(html):
+    return re.search(r"@page :first \{([^}]*)\}", html).group(1)
+
+
+def page_numbers(html, pages):
+    # WeasyPrint's rule for @page styles: the page counter is only incremented
+    # implicitly when the style does not touch it; reset comes before increment
+    rule = first_page_rule(html)
+    reset = re.search(r"counter-reset: page (\d+)", rule)
+    number = int(reset.group(1)) if reset else 0
+    number += 1 if "counter-increment: page" in rule or not reset else 0
+    return [number + i for i in range(pages)]
+
+
+class FakeDocument:
+    def __init__(self, html):
+        self.html = html
+        self.pages = [None] * PAGES_PER_SLICE
+
+    def write_pdf(self, target=None):
+        writer = PdfWriter()
+        for _ in self.pages:
+            writer.add_blank_page(width=842, height=595)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        if target is None:
+            return buffer.getvalue()
+        with open(target, "wb") as f:
+            f.write(buffer.getvalue())
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Replace WeasyPrint with a layout of PAGES_PER_SLICE pages per document; yields the rendered HTML."""
+    documents = []
+
+    class HTML:
+        def __init__(self, string, base_url=None):
+            self.string = string
+
+        def render(self):
+            documents.append(FakeDocument(self.string))
+            return documents[-1]
+
+    monkeypatch.setitem(sys.modules, "weasyprint", types.SimpleNamespace(HTML=HTML))
+    yield documents
+
+
+def test_slices_number_pages_without_gaps_or_repeats(rendered):
+    pdf = pdf_report.render_report_pdf("report.html", report_data(25), chunk_rows=10)
+
+    assert len(rendered) == 3
+    numbers = [n for document in rendered for n in page_numbers(document.html, len(document.pages))]
+    assert numbers == list(range(1, 3 * PAGES_PER_SLICE + 1))
+    assert len(PdfReader(io.BytesIO(pdf)).pages) == 3 * PAGES_PER_SLICE
+
+
+def test_single_document_starts_at_page_one(rendered):
+    pdf_report.render_report_pdf("report.html", report_data(5), chunk_rows=10)
+
+    assert len(rendered) == 1
+    assert page_numbers(rendered[0].html, 2) == [1, 2]
+
+
+def test_weasyprint_footer_numbers_run_across_slices():
+    try:
+        import weasyprint  # noqa: F401
+    except OSError as e:
+        pytest.skip(f"WeasyPrint libraries not available: {e}")
+
+    data = report_data(120)
+    pdf = pdf_report.render_report_pdf("report.html", data, chunk_rows=40)
+
+    pages = PdfReader(io.BytesIO(pdf)).pages
+    numbers = [int(re.search(r"Pagina (\d+)", page.extract_text()).group(1)) for page in pages]
+    assert numbers == list(range(1, len(pages) + 1))
@@ -0,0 +1,47 @@
+import pstats
+
+import pytest
+
+import app
+from inventory_cache import InventoryCache
+from k8s_client_pool import ApiClientPool
+from request_trace import ProfileStore
+
+
+@pytest.fixture
+def profiled_app(fake_fleet, tmp_path, monkeypatch):
+    kubeconfig, _ = fake_fleet
+    monkeypatch.setattr(app, "api_client_pool", ApiClientPool(kubeconfig))
+    monkeypatch.setattr(app, "INVENTORY_MODE", "cache")
+    monkeypatch.setattr(app, "snapshot_store", None)
+    monkeypatch.setattr(app, "inventory_cache", InventoryCache(app.load_cached_inventory, ttl=60, stale_ttl=300))
+    monkeypatch.setattr(app, "fleet_inventories", app.OrderedDict())
+    monkeypatch.setattr(app, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(app, "profile_store", ProfileStore(str(tmp_path / "profiles")))
+    return app.app.test_client()
+
+
+def profiled_functions(profile_id):
+    stats = pstats.Stats(app.profile_store.path(profile_id))
+    return {name for _, _, name in stats.stats}
+
+
+@pytest.mark.parametrize("context", ["a", "a,b"])
+def test_profile_covers_pool_threads(profiled_app, context):
+    response = profiled_app.get(f"/data?context={context}&profile=secret")
+
+    assert response.status_code == 200
+    functions = profiled_functions(response.headers["X-Profile-Id"])
+    # Kinds are listed and decoded on fetch_executor, clusters loaded on fleet_executor
+    assert "fetch_kind" in functions
+    assert "deployment_from_raw" in functions or "node_from_raw" in functions
+    if "," in context:
+        assert "load_fleet_inventory" in functions and "load" in functions
+
+
+def test_slow_requests_need_the_profile_token(profiled_app):
+    assert profiled_app.get("/debug/slow_requests").status_code == 403
+    assert profiled_app.get("/debug/slow_requests?profile=wrong").status_code == 403
+    response = profiled_app.get("/debug/slow_requests", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    assert "requests" in response.get_json()
@@ -0,0 +1,85 @@
+import pytest
+
+from snapshot_store import SnapshotStore
+
+
+def node(heartbeat, status="True", transition="2024-09-25T09:55:11+00:00"):
+    return {
+        "name": "node-1",
+        "labels": {"kubernetes.io/os": "linux"},
+        "conditions": [{
+            "type": "Ready",
+            "status": status,
+            "last_heartbeat_time": heartbeat,
+            "last_transition_time": transition,
+            "reason": "KubeletReady",
+            "message": "kubelet is posting ready status"
+        }],
+        "capacity": {"cpu": "4"},
+        "allocatable": {"cpu": "3920m"},
+        "creation_timestamp": "2024-09-01T00:00:00+00:00"
+    }
+
+
+def versions(store):
+    return store._db.execute("SELECT object_id, valid_from, valid_to FROM versions").fetchall()
+
+
+def test_heartbeat_only_changes_share_one_version(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    first = store.save_inventory({"nodes": [node("2024-10-01T10:00:00+00:00")]}, "c1", ["nodes"])
+    second = store.save_inventory({"nodes": [node("2024-10-01T10:00:40+00:00")]}, "c1", ["nodes"])
+
+    assert len(versions(store)) == 1
+    assert store._db.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 1
+    assert [tuple(row) for row in versions(store)] == [(1, first, None)]
+    assert store.snapshots("c1")[0]["changed_count"] == 0
+    stored = store.objects("c1", "nodes", snapshot_id=second)[0]
+    assert "last_heartbeat_time" not in stored["conditions"][0]
+    assert stored["conditions"][0]["last_transition_time"] == "2024-09-25T09:55:11+00:00"
+
+
+def test_condition_transition_is_a_new_version(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    first = store.save_inventory({"nodes": [node("2024-10-01T10:00:00+00:00")]}, "c1", ["nodes"])
+    second = store.save_inventory(
+        {"nodes": [node("2024-10-01T10:05:00+00:00", status="False", transition="2024-10-01T10:04:00+00:00")]},
+        "c1", ["nodes"]
+    )
+
+    assert sorted(tuple(row)[1:] for row in versions(store)) == [(first, second), (second, None)]
+    assert store.objects("c1", "nodes", snapshot_id=first)[0]["conditions"][0]["status"] == "True"
+    assert store.objects("c1", "nodes", snapshot_id=second)[0]["conditions"][0]["status"] == "False"
+
+
+def test_failed_kinds_keep_their_versions(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    deployment = {"name": "web", "namespace": "default", "replicas": 2}
+    store.save_inventory({"deployments": [deployment], "nodes": [node("2024-10-01T10:00:00+00:00")]},
+                         "c1", ["deployments", "nodes"])
+
+    # The node list failed: its records are missing but the node was not deleted
+    recorder = store.recorder(kinds=["deployments", "nodes"])
+    recorder.add("deployments", deployment, "c1")
+    recorder.fail("c1", ["nodes"])
+    snapshot_id = recorder.commit()["c1"]
+
+    assert len(store.objects("c1", "nodes", snapshot_id=snapshot_id)) == 1
+    assert store.snapshots("c1")[0]["kinds"] == "deployments"
+
+
+def test_failed_save_leaves_no_open_transaction(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    unserializable = {"name": "web", "namespace": "default", "replicas": object()}
+
+    with pytest.raises(TypeError):
+        store.save_inventory({"deployments": [{"name": "api", "namespace": "default"}, unserializable]},
+                             "c1", ["deployments"])
+
+    assert not store._db.in_transaction
+    assert store.snapshots("c1") == []
+    snapshot_id = store.save_inventory({"nodes": [node("2024-10-01T10:00:00+00:00")]}, "c1", ["nodes"])
+    assert [snapshot["id"] for snapshot in store.snapshots("c1")] == [snapshot_id]
+    # Another connection sees the snapshot: it was committed, not left pending
+    other = SnapshotStore(str(tmp_path / "snapshots.db"))
+    assert len(other.objects("c1", "nodes")) == 1
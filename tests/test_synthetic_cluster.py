@@ -0,0 +1,59 @@
+import pytest
+from kubernetes import client
+
+from capacity import CapacityIndex
+from fake_apiserver import FakeCluster, serve
+from synthetic_cluster import SYSTEM_NAMESPACES, generate_cluster, kind_counts, parse_size
+
+
+@pytest.mark.parametrize("value, expected", [("1k", 1000), ("100k", 100000), ("2.5k", 2500), ("2.5K", 2500),
+                                             ("750", 750)])
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("size", [3, 10, 1000, 12345])
+def test_kind_counts_add_up_to_the_size(size):
+    counts = kind_counts(size)
+    assert sum(counts.values()) == size
+    assert min(counts.values()) >= 1
+
+
+def test_generation_is_deterministic_per_seed():
+    assert generate_cluster("1k") == generate_cluster(1000)
+    assert generate_cluster(200, seed=1) != generate_cluster(200, seed=2)
+
+
+def test_generated_objects_look_like_a_cluster():
+    inventory = generate_cluster(1000)
+
+    assert {kind: len(records) for kind, records in inventory.items()} == kind_counts(1000)
+    for kind in ("deployments", "statefulsets"):
+        keys = [(record["namespace"], record["name"]) for record in inventory[kind]]
+        assert len(set(keys)) == len(keys)
+    namespaces = {record["namespace"] for record in inventory["deployments"]}
+    assert namespaces & set(SYSTEM_NAMESPACES) and namespaces - set(SYSTEM_NAMESPACES)
+    assert len({record["name"] for record in inventory["nodes"]}) == len(inventory["nodes"])
+    # Node quantities are valid Kubernetes quantities
+    assert CapacityIndex(inventory["nodes"]).invalid == 0
+
+
+def test_fake_api_server_serves_a_synthetic_cluster():
+    inventory = generate_cluster(300)
+    cluster = FakeCluster()
+    cluster.load_inventory(inventory)
+    server = serve(cluster)
+    try:
+        configuration = client.Configuration()
+        configuration.host = f"http://127.0.0.1:{server.server_address[1]}"
+        api_client = client.ApiClient(configuration)
+
+        deployments = client.AppsV1Api(api_client).list_deployment_for_all_namespaces().items
+        nodes = client.CoreV1Api(api_client).list_node().items
+        assert sorted(d.metadata.name for d in deployments) == sorted(r["name"] for r in inventory["deployments"])
+        assert len(nodes) == len(inventory["nodes"])
+        assert {c.type for c in nodes[0].status.conditions} == {"MemoryPressure", "DiskPressure", "PIDPressure",
+                                                                "Ready"}
+    finally:
+        server.shutdown()
+        server.server_close()
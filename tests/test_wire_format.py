@@ -0,0 +1,107 @@
+import gzip
+import json
+
+import pytest
+
+import wire_format
+from wire_format import COMPACT_FORMAT, compact_inventory, compress, expand_compact, inventory_etag, negotiate_encoding
+
+KINDS = ["deployments", "statefulsets", "nodes"]
+
+
+def workload(name, namespace, labels):
+    return {
+        "name": name,
+        "namespace": namespace,
+        "replicas": 2,
+        "available_replicas": 1,
+        "creation_timestamp": "2024-09-01T00:00:00+00:00",
+        "labels": labels
+    }
+
+
+def inventory():
+    return {
+        "deployments": [
+            workload("web", "shop", {"app": "web", "tier": "frontend"}),
+            workload("api", "shop", {"app": "api", "tier": ""}),
+        ],
+        "statefulsets": [workload("db", None, None)],
+        "nodes": [{
+            "name": "node-1",
+            "creation_timestamp": "2024-09-01T00:00:00+00:00",
+            "labels": {"kubernetes.io/os": "linux"},
+            "conditions": [{"type": "Ready", "status": "True"}, {"type": None, "status": "Unknown"}],
+            "capacity": {"cpu": "4", "memory": "16Gi"},
+            "allocatable": None
+        }]
+    }
+
+
+def round_trip(value, kinds=KINDS):
+    return expand_compact(json.loads(json.dumps(compact_inventory(value, kinds))))
+
+
+def test_compact_inventory_round_trips():
+    assert round_trip(inventory()) == inventory()
+
+
+def test_repeated_strings_are_sent_once():
+    payload = compact_inventory(inventory(), KINDS)
+
+    assert payload["format"] == COMPACT_FORMAT
+    assert len(payload["strings"]) == len(set(payload["strings"]))
+    assert payload["deployments"]["namespace"] == [0, 0]
+    assert payload["statefulsets"]["namespace"] == [-1]
+    assert payload["statefulsets"]["labels"] == [None]
+
+
+def test_node_annotations_and_condition_details_are_left_out():
+    nodes = inventory()["nodes"]
+    nodes[0]["annotations"] = {"note": "x" * 1000}
+    nodes[0]["conditions"][0]["reason"] = "KubeletReady"
+
+    node = round_trip({"nodes": nodes}, ["nodes"])["nodes"][0]
+    assert "annotations" not in node
+    assert node["conditions"][0] == {"type": "Ready", "status": "True"}
+
+
+def test_cluster_field_round_trips_and_missing_kinds_are_skipped():
+    fleet = {"deployments": [{**record, "cluster": cluster}
+                             for cluster in ("a", "b") for record in inventory()["deployments"]]}
+
+    expanded = round_trip(fleet, ["deployments"])
+    assert expanded == fleet
+    assert set(expanded) == {"deployments"}
+    assert round_trip({}, ["nodes"]) == {"nodes": []}
+
+
+def test_etag_follows_resource_versions_and_options():
+    versions = {"deployments": "10", "nodes": "7"}
+    etag = inventory_etag(versions, "compact", "default")
+
+    assert etag == inventory_etag({"nodes": "7", "deployments": "10"}, "compact", "default")
+    assert etag != inventory_etag({**versions, "nodes": "8"}, "compact", "default")
+    assert etag != inventory_etag(versions, "json", "default")
+    assert inventory_etag({**versions, "nodes": None}, "compact") is None
+    assert inventory_etag({}, "compact") is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0, identity", None),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip;q=oops", None),
+    ("", None),
+    (None, None),
+])
+def test_negotiate_encoding(monkeypatch, header, expected):
+    monkeypatch.setattr(wire_format, "brotli", None)
+    assert negotiate_encoding(header) == expected
+
+
+def test_compress_gzip():
+    body = json.dumps(compact_inventory(inventory(), KINDS)).encode()
+
+    assert gzip.decompress(compress(body, "gzip")) == body
+    assert compress(body, None) is body
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import app
+from fake_apiserver import deployment_object
+from k8s_client_pool import ApiClientPool
+from metrics import REGISTRY
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.05)
+
+
+def list_calls(kind):
+    prefix = f'k8s_inventory_k8s_list_calls_total{{context="a",kind="{kind}",outcome="ok"}} '
+    return sum(float(line[len(prefix):]) for line in REGISTRY.exposition().splitlines() if line.startswith(prefix))
+
+
+@pytest.fixture
+def graph_app(fake_fleet, monkeypatch):
+    kubeconfig, clusters = fake_fleet
+    monkeypatch.setattr(app, "api_client_pool", ApiClientPool(kubeconfig))
+    monkeypatch.setattr(app, "workload_graphs", {})
+    yield app.app.test_client(), clusters
+    for informer in app.workload_graphs.values():
+        informer.stop()
+
+
+def test_unknown_context_is_404_and_leaves_no_graph(graph_app):
+    test_client, _ = graph_app
+
+    assert test_client.get("/api/workloads?context=bogus").status_code == 404
+    assert test_client.get("/api/workloads/default/web?context=bogus").status_code == 404
+    assert app.workload_graphs == {}
+
+    response = test_client.get("/api/workloads?context=a")
+    assert response.status_code == 200
+    assert response.get_json()["errors"] == {}
+    assert list(app.workload_graphs) == ["a"]
+
+
+def test_graph_follows_pod_changes_without_relisting(graph_app):
+    test_client, clusters = graph_app
+    cluster = clusters["a"]
+    cluster.apply("deployments", "ADDED", deployment_object(
+        {"name": "web", "namespace": "default", "replicas": 2, "available_replicas": 1}))
+    cluster.link_workloads()
+
+    def web():
+        return test_client.get("/api/workloads/default/web?context=a").get_json()
+
+    assert web()["pod_phases"] == {"Running": 1, "Pending": 1}
+    pod_lists = list_calls("pods")
+    assert pod_lists >= 1
+
+    pending = next(pod for pod in cluster.objects["pods"].values() if pod["status"]["phase"] == "Pending")
+    cluster.apply("pods", "MODIFIED", {**pending, "status": {"phase": "Running"}})
+    wait_until(lambda: web()["pod_phases"] == {"Running": 2})
+
+    cluster.apply("pods", "DELETED", pending)
+    wait_until(lambda: web()["pod_phases"] == {"Running": 1})
+
+    # Later requests reuse the context's informer and its graph
+    informer = app.workload_graphs["a"]
+    for _ in range(5):
+        assert test_client.get("/api/workloads?context=a").status_code == 200
+    assert app.workload_graphs["a"] is informer
+    assert list_calls("pods") == pod_lists
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""
+Compact wire format, compression and ETags for inventory responses.
+
+The compact format is columnar: every kind becomes an object of parallel
+arrays, one per field, and repeated strings (namespaces, label keys and values,
+node condition types) are replaced by indexes into a shared ``strings`` table.
+Node annotations are left out because no view uses them.
+
+    {
+      "format": "compact-v1",
+      "strings": ["default", "app", "grafana", ...],
+      "deployments": {
+        "name": ["grafana", ...],
+        "namespace": [0, ...],
+        "replicas": [1, ...],
+        "available_replicas": [1, ...],
+        "creation_timestamp": ["2024-09-25T09:55:11+00:00", ...],
+        "labels": [[1, 2], ...]          # flat key/value index pairs, or null
+      },
+      "nodes": {..., "conditions": [[type, status, ...], ...]}
+    }
+
+expand_compact() turns it back into the regular inventory shape.
+"""
+
+import gzip
+import hashlib
+import json
+
+COMPACT_FORMAT = "compact-v1"
+
+# field -> how it is encoded: "raw" values, "string" table index, or "pairs"
+# of table indexes for mappings
+COMPACT_FIELDS = {
+    "deployments": {
+        "name": "raw",
+        "namespace": "string",
+        "replicas": "raw",
+        "available_replicas": "raw",
+        "creation_timestamp": "raw",
+        "labels": "pairs"
+    },
+    "statefulsets": {
+        "name": "raw",
+        "namespace": "string",
+        "replicas": "raw",
+        "available_replicas": "raw",
+        "creation_timestamp": "raw",
+        "labels": "pairs"
+    },
+    "nodes": {
+        "name": "raw",
+        "creation_timestamp": "raw",
+        "labels": "pairs",
+        "conditions": "conditions",
+        "capacity": "pairs",
+        "allocatable": "pairs"
+    }
+}
+
+# Extra fields added to records by multi-cluster requests
+OPTIONAL_FIELDS = {"cluster": "string"}
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def intern(self, value):
+        if value is None:
+            return -1
+        index = self._index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self._index[value] = index
+            self.strings.append(value)
+        return index
+
+
+def compact_inventory(inventory, kinds):
+    table = StringTable()
+    intern = table.intern
+    payload = {"format": COMPACT_FORMAT, "strings": table.strings}
+    for kind in kinds:
+        records = inventory.get(kind) or []
+        fields = dict(COMPACT_FIELDS[kind])
+        if records:
+            fields.update({f: enc for f, enc in OPTIONAL_FIELDS.items() if f in records[0]})
+        columns = {}
+        for field, encoding in fields.items():
+            if encoding == "raw":
+                columns[field] = [record.get(field) for record in records]
+            elif encoding == "string":
+                columns[field] = [intern(record.get(field)) for record in records]
+            elif encoding == "pairs":
+                columns[field] = [
+                    None if record.get(field) is None else
+                    [i for key, value in record[field].items() for i in (intern(key), intern(value))]
+                    for record in records
+                ]
+            elif encoding == "conditions":
+                columns[field] = [
+                    [i for c in record.get(field) or [] for i in (intern(c.get('type')), intern(c.get('status')))]
+                    for record in records
+                ]
+        payload[kind] = columns
+    return payload
+
+
+def expand_compact(payload):
+    """Rebuild the regular inventory from a compact payload (without annotations)."""
+    strings = payload["strings"]
+
+    def lookup(index):
+        return None if index < 0 else strings[index]
+
+    inventory = {}
+    for kind, fields in COMPACT_FIELDS.items():
+        columns = payload.get(kind)
+        if columns is None:
+            continue
+        encodings = {**fields, **{f: enc for f, enc in OPTIONAL_FIELDS.items() if f in columns}}
+        count = len(columns["name"])
+        records = [{} for _ in range(count)]
+        for field, encoding in encodings.items():
+            for record, value in zip(records, columns[field]):
+                if encoding == "raw":
+                    record[field] = value
+                elif encoding == "string":
+                    record[field] = lookup(value)
+                elif encoding == "pairs":
+                    record[field] = None if value is None else {
+                        strings[value[i]]: lookup(value[i + 1]) for i in range(0, len(value), 2)
+                    }
+                elif encoding == "conditions":
+                    record[field] = [
+                        {"type": lookup(value[i]), "status": lookup(value[i + 1])}
+                        for i in range(0, len(value), 2)
+                    ]
+        inventory[kind] = records
+    return inventory
+
+
+def inventory_etag(resource_versions, *parts):
+    """
+    Strong ETag for a response built from lists at ``resource_versions``;
+    ``parts`` are the request options that change the response body.
+    Returns None when a resourceVersion is missing.
+    """
+    if not resource_versions or None in resource_versions.values():
+        return None
+    key = json.dumps([sorted(resource_versions.items()), parts], separators=(',', ':'))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header."""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+"""
+Owner-reference graph of Deployments, their ReplicaSets and their Pods.
+
+Objects are kept by UID, with one index from each owner UID to the UIDs of
+its children, built in a single pass over the listed objects. ``sync()``
+takes the complete list of one kind (raw API objects, e.g. the pages of
+k8s_raw.raw_list) and only re-indexes the objects whose resourceVersion
+changed, then drops the ones that are gone; refreshing an unchanged cluster
+is a dictionary lookup per object. ``update()`` and ``remove()`` apply single
+objects from watch events (see k8s_informer.WorkloadGraphInformer), so that
+after the first list the graph follows the cluster without relisting it.
+
+Per-Deployment rollups (current ReplicaSet, stale ReplicaSets, pod phases)
+are computed from the index on demand and cached until the Deployment or one
+of its descendants changes.
+
+    graph = WorkloadGraph()
+    for kind, list_fn in (("deployments", ...), ("replicasets", ...), ("pods", ...)):
+        graph.sync(kind, objects)
+    graph.rollup("default", "web")
+"""
+
+import threading
+from collections import Counter
+
+REVISION_ANNOTATION = "deployment.kubernetes.io/revision"
+
+# Kinds in the order they are synced: owners before their children
+GRAPH_KINDS = ("deployments", "replicasets", "pods")
+
+
+def _revision(metadata):
+    try:
+        return int((metadata.get('annotations') or {}).get(REVISION_ANNOTATION))
+    except (TypeError, ValueError):
+        return None
+
+
+def _controller_uid(metadata):
+    for reference in metadata.get('ownerReferences') or ():
+        if reference.get('controller'):
+            return reference.get('uid')
+    return None
+
+
+class DeploymentNode:
+    __slots__ = ("uid", "namespace", "name", "resource_version", "revision", "replicas", "available_replicas")
+
+    def __init__(self, obj):
+        metadata = obj['metadata']
+        self.uid = metadata['uid']
+        self.namespace = metadata.get('namespace')
+        self.name = metadata['name']
+        self.resource_version = metadata.get('resourceVersion')
+        self.revision = _revision(metadata)
+        self.replicas = (obj.get('spec') or {}).get('replicas')
+        self.available_replicas = (obj.get('status') or {}).get('availableReplicas') or 0
+
+
+class ReplicaSetNode:
+    __slots__ = ("uid", "namespace", "name", "resource_version", "owner", "revision", "created",
+                 "replicas", "ready_replicas", "available_replicas")
+
+    def __init__(self, obj):
+        metadata = obj['metadata']
+        status = obj.get('status') or {}
+        self.uid = metadata['uid']
+        self.namespace = metadata.get('namespace')
+        self.name = metadata['name']
+        self.resource_version = metadata.get('resourceVersion')
+        self.owner = _controller_uid(metadata)
+        self.revision = _revision(metadata)
+        self.created = metadata.get('creationTimestamp') or ''
+        self.replicas = (obj.get('spec') or {}).get('replicas') or 0
+        self.ready_replicas = status.get('readyReplicas') or 0
+        self.available_replicas = status.get('availableReplicas') or 0
+
+
+class PodNode:
+    __slots__ = ("uid", "resource_version", "owner", "phase")
+
+    def __init__(self, obj):
+        metadata = obj['metadata']
+        self.uid = metadata['uid']
+        self.resource_version = metadata.get('resourceVersion')
+        self.owner = _controller_uid(metadata)
+        self.phase = (obj.get('status') or {}).get('phase') or 'Unknown'
+
+
+NODE_TYPES = {
+    "deployments": DeploymentNode,
+    "replicasets": ReplicaSetNode,
+    "pods": PodNode
+}
+
+
+class WorkloadGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.objects = {kind: {} for kind in GRAPH_KINDS}
+        self.children = {}    # owner uid -> set of child uids
+        self._names = {}      # (namespace, name) -> Deployment uid
+        self._rollups = {}    # Deployment uid -> cached rollup
+        self._errors = {}     # kind -> error of its last sync
+
+    def sync(self, kind, objects, page_size=500):
+        """
+        Bring ``kind`` in line with ``objects``, its complete current list.
+        Changes are applied ``page_size`` objects at a time, so queries during
+        a sync may see part of it. Returns (added, updated, removed).
+        """
+        node_type = NODE_TYPES[kind]
+        nodes = self.objects[kind]
+        seen = set()
+        added = updated = 0
+        batch = []
+
+        def apply(batch):
+            with self._lock:
+                for obj in batch:
+                    node = node_type(obj)
+                    old = nodes.get(node.uid)
+                    if old is not None:
+                        self._unlink(kind, old)
+                    nodes[node.uid] = node
+                    self._link(kind, node)
+
+        for obj in objects:
+            metadata = obj['metadata']
+            uid = metadata['uid']
+            seen.add(uid)
+            old = nodes.get(uid)
+            if old is not None and old.resource_version == metadata.get('resourceVersion'):
+                continue
+            if old is None:
+                added += 1
+            else:
+                updated += 1
+            batch.append(obj)
+            if len(batch) >= page_size:
+                apply(batch)
+                batch = []
+        apply(batch)
+
+        with self._lock:
+            gone = nodes.keys() - seen
+            for uid in gone:
+                self._unlink(kind, nodes.pop(uid))
+            self._errors.pop(kind, None)
+        return added, updated, len(gone)
+
+    def update(self, kind, obj):
+        """Add or replace one object of ``kind`` (a raw API object)."""
+        node = NODE_TYPES[kind](obj)
+        with self._lock:
+            nodes = self.objects[kind]
+            old = nodes.get(node.uid)
+            if old is not None:
+                self._unlink(kind, old)
+            nodes[node.uid] = node
+            self._link(kind, node)
+
+    def remove(self, kind, obj):
+        """Drop one object of ``kind`` (a raw API object), if it is known."""
+        with self._lock:
+            node = self.objects[kind].pop(obj['metadata']['uid'], None)
+            if node is not None:
+                self._unlink(kind, node)
+
+    def fail(self, kind, error):
+        """Record that syncing ``kind`` failed; its objects are kept as they were."""
+        with self._lock:
+            self._errors[kind] = error
+
+    def errors(self):
+        """Errors of the kinds whose last sync failed, by kind."""
+        with self._lock:
+            return dict(self._errors)
+
+    def _link(self, kind, node):
+        if kind == "deployments":
+            self._names[(node.namespace, node.name)] = node.uid
+        elif node.owner is not None:
+            self.children.setdefault(node.owner, set()).add(node.uid)
+        self._invalidate(kind, node)
+
+    def _unlink(self, kind, node):
+        if kind == "deployments":
+            if self._names.get((node.namespace, node.name)) == node.uid:
+                del self._names[(node.namespace, node.name)]
+        elif node.owner is not None:
+            siblings = self.children.get(node.owner)
+            if siblings is not None:
+                siblings.discard(node.uid)
+                if not siblings:
+                    del self.children[node.owner]
+        self._invalidate(kind, node)
+
+    def _invalidate(self, kind, node):
+        # Drop the cached rollup of the Deployment above ``node``
+        if kind == "pods":
+            node = self.objects["replicasets"].get(node.owner)
+            if node is None:
+                return
+        self._rollups.pop(node.uid if kind == "deployments" else node.owner, None)
+
+    def _phases(self, rs_uid):
+        pods = self.objects["pods"]
+        return dict(Counter(pods[uid].phase for uid in self.children.get(rs_uid, ()) if uid in pods))
+
+    def _replicaset_summary(self, rs):
+        return {
+            "name": rs.name,
+            "revision": rs.revision,
+            "replicas": rs.replicas,
+            "ready_replicas": rs.ready_replicas,
+            "available_replicas": rs.available_replicas,
+            "pod_phases": self._phases(rs.uid)
+        }
+
+    def _rollup(self, deployment):
+        rollup = self._rollups.get(deployment.uid)
+        if rollup is not None:
+            return rollup
+        replicasets = self.objects["replicasets"]
+        owned = [replicasets[uid] for uid in self.children.get(deployment.uid, ()) if uid in replicasets]
+        # The current ReplicaSet has the Deployment's revision, as for kubectl;
+        # without revisions the newest one is taken
+        owned.sort(key=lambda rs: (rs.revision or 0, rs.created), reverse=True)
+        current = next((rs for rs in owned if rs.revision is not None and rs.revision == deployment.revision), None)
+        if current is None and owned:
+            current = owned[0]
+        stale = [self._replicaset_summary(rs) for rs in owned if rs is not current]
+        current = self._replicaset_summary(current) if current is not None else None
+
+        phases = Counter(current["pod_phases"] if current else {})
+        for rs in stale:
+            phases.update(rs["pod_phases"])
+        rollup = self._rollups[deployment.uid] = {
+            "namespace": deployment.namespace,
+            "name": deployment.name,
+            "revision": deployment.revision,
+            "replicas": deployment.replicas,
+            "available_replicas": deployment.available_replicas,
+            "current_replicaset": current,
+            "stale_replicasets": stale,
+            # ReplicaSets scaled down to 0 are kept for rollbacks; the others still run pods
+            "stale_active": sum(1 for rs in stale if rs["replicas"]),
+            "pod_phases": dict(phases)
+        }
+        return rollup
+
+    def rollup(self, namespace, name):
+        """The rollup of one Deployment, or None if it is unknown."""
+        with self._lock:
+            uid = self._names.get((namespace, name))
+            if uid is None:
+                return None
+            return self._rollup(self.objects["deployments"][uid])
+
+    def rollups(self, namespace=''):
+        """Rollups of every Deployment (of ``namespace`` if given), by namespace and name."""
+        with self._lock:
+            deployments = sorted(
+                (d for d in self.objects["deployments"].values() if not namespace or d.namespace == namespace),
+                key=lambda d: (d.namespace or '', d.name)
+            )
+            return [self._rollup(d) for d in deployments]
+
+    def counts(self):
+        with self._lock:
+            return {kind: len(nodes) for kind, nodes in self.objects.items()}